@@ -1,9 +1,22 @@
 import time
 import ujson
 import _thread
+import machine
+import ubinascii
 from board.board import BLEWifiBoard
 from protocol.protocol import WebsocketProtocol
+from protocol.connection import ConnectionManager
+from micropython_websocket_client import WebSocketClient
 from iot.things import ThingManager
+from audio.jitter import JitterBuffer, PlayoutScheduler
+from audio.resampler import Resampler
+from utils.ticks import ticks_ms, ticks_add, ticks_diff
+from utils.persist import (get_transport, get_mqtt_config, get_websocket_url, get_access_token,
+                           get_device_id)
+
+# Servers that predate the descriptor cache may not answer hello at all: report IoT anyway
+IOT_HELLO_TIMEOUT_MS = 3000
+
 
 class Application:
     _instance = None
@@ -25,18 +38,32 @@ class Application:
         self.clock_ticks = 0
         self.aborted = False
         self.voice_detected = False
+        self.speaker = None
+        self.speaker_sample_rate = 16000
+        self.jitter_buffer = None
+        self.playout = None
+        self.iot_report_deadline = None
 
     def start(self):
         self.board = BLEWifiBoard()
         self.set_device_state("starting")
 
-        # Initialize protocol
-        self.protocol = WebsocketProtocol(None)
+        # Initialize protocol: WebSocket by default, MQTT + UDP when configured
+        mqtt_config = get_mqtt_config() if get_transport() == "mqtt" else None
+        if mqtt_config:
+            # Imported only here: keeps the MQTT client and cryptolib out of RAM on WebSocket devices
+            from protocol.mqtt_protocol import MqttUdpProtocol
+            self.protocol = MqttUdpProtocol(mqtt_config)
+        else:
+            self.protocol = WebsocketProtocol(None, self._connection_manager())
         self.protocol.on_network_error(self.on_network_error)
         self.protocol.on_incoming_audio(self.on_incoming_audio)
         self.protocol.on_audio_channel_opened(self.on_audio_channel_opened)
         self.protocol.on_audio_channel_closed(self.on_audio_channel_closed)
         self.protocol.on_incoming_json(self.on_incoming_json)
+        self.protocol.on_json_message("iot", self.on_iot_message)
+        self.protocol.on_server_hello(self.on_server_hello)
+        self.protocol.on_iot_descriptors_hash(self.thing_manager.get_descriptors_hash)
         self.protocol.start()
 
         # Start main loop
@@ -45,9 +72,30 @@ class Application:
         # Start clock timer
         _thread.start_new_thread(self.clock_timer, ())
 
+        # Start microphone capture and the VAD-gated audio uplink
+        self.start_audio_uplink()
+
         # Set device to idle state
         self.set_device_state("idle")
 
+    def _connection_manager(self):
+        # DNS cache, reconnect with backoff after a network error, and a warm connection
+        # opened while idle so the first utterance does not pay for TCP and the handshake
+        url = get_websocket_url()
+        if not url:
+            print("No WebSocket URL configured")
+            return None
+        access_token = get_access_token()
+        device_mac = ubinascii.hexlify(machine.unique_id()).decode()
+        device_uuid = get_device_id()
+
+        def client_factory(u):
+            return WebSocketClient(u, access_token, device_mac, device_uuid)
+
+        manager = ConnectionManager(url, client_factory, warm=True)
+        manager.prewarm()
+        return manager
+
     def set_device_state(self, state):
         if self.device_state == state:
             return
@@ -72,35 +120,122 @@ class Application:
             self.clock_ticks += 1
             if self.clock_ticks % 10 == 0:
                 print("Clock tick: ", self.clock_ticks)
+            self._check_iot_report()
             time.sleep(1)
 
+    def get_rtt_stats(self):
+        # WebSocket ping/pong RTT (smoothed, percentiles, histogram) for server-side
+        # tuning and for picking the uplink audio frame duration
+        if self.protocol is None:
+            return None
+        return self.protocol.get_rtt_stats()
+
+    def get_protocol_metrics(self):
+        # Messages/bytes per direction and type, plus how long the incoming audio and
+        # JSON callbacks block the receive path; a plain dict, ready for ujson.dumps
+        if self.protocol is None:
+            return None
+        return self.protocol.get_metrics()
+
     def on_network_error(self, message):
         self.set_device_state("idle")
         print(f"Network error: {message}")
 
+    def set_speaker(self, sink, sample_rate=16000):
+        # sink: I2S TX (mode=I2S.TX) or any object with write(buf)
+        self.speaker = sink
+        self.speaker_sample_rate = sample_rate
+
+    def _start_playout(self):
+        # Server audio params are only known after the hello exchange, so playout starts lazily
+        rate = self.protocol.server_sample_rate
+        frame_ms = self.protocol.server_frame_duration
+        frame_bytes = rate * frame_ms // 1000 * 2
+        self.jitter_buffer = JitterBuffer(frame_ms, frame_bytes)
+        resampler = None
+        if rate != self.speaker_sample_rate:
+            resampler = Resampler(rate, self.speaker_sample_rate, max_block=frame_bytes // 2)
+        self.playout = PlayoutScheduler(self.jitter_buffer, self.speaker, rate, resampler)
+        self.playout.start()
+
+    def _stop_playout(self):
+        if self.playout:
+            self.playout.stop()
+            print("Playout stats:", self.playout.get_stats())
+        self.playout = None
+        self.jitter_buffer = None
+
     def on_incoming_audio(self, data):
-        print("Incoming audio data received")
+        if self.speaker is None:
+            print("Incoming audio data received")
+            return
+        jitter_buffer = self.jitter_buffer
+        if jitter_buffer is None:
+            self._start_playout()
+            jitter_buffer = self.jitter_buffer
+        jitter_buffer.push(data, ticks_ms())
 
     def on_audio_channel_opened(self):
         print("Audio channel opened")
-        descriptors = self.thing_manager.get_descriptors_json()
-        self.protocol.send_iot_descriptors(descriptors)
-        states, _ = self.thing_manager.get_states_json(delta=False)
+        self.iot_report_deadline = ticks_add(ticks_ms(), IOT_HELLO_TIMEOUT_MS)
+
+    def _check_iot_report(self):
+        deadline = self.iot_report_deadline
+        if deadline is None or ticks_diff(ticks_ms(), deadline) < 0:
+            return
+        self.iot_report_deadline = None
+        if not self.protocol.server_hello_received:
+            print("No server hello, reporting IoT descriptors and states anyway")
+            self.schedule(self.report_iot)
+
+    def on_server_hello(self):
+        self.iot_report_deadline = None
+        self.report_iot()
+
+    def report_iot(self):
+        # The hello offered the descriptors hash: resend the (cached) descriptors only
+        # when the server has none cached for it, then report the full states. Without
+        # a server hello iot_descriptors_known stays False and everything is sent.
+        if not self.protocol.iot_descriptors_known:
+            self.protocol.send_iot_descriptors(self.thing_manager.get_descriptors(),
+                                               self.thing_manager.get_descriptors_hash())
+        states, _ = self.thing_manager.get_states(delta=False)
         self.protocol.send_iot_states(states)
 
     def on_audio_channel_closed(self):
         print("Audio channel closed")
+        self.iot_report_deadline = None
+        self._stop_playout()
         self.set_device_state("idle")
 
     def on_incoming_json(self, data):
         print("Incoming JSON data:", data)
-        if data.get("type") == "iot":
-            commands = data.get("commands", [])
-            for command in commands:
-                self.thing_manager.invoke(command)
+
+    def on_iot_message(self, data):
+        for command in data.get("commands", []):
+            self.thing_manager.invoke(command)
+
+    def start_audio_uplink(self):
+        # The reader owns I2S capture, DSP and the VAD; it calls bind_vad(self) so speech
+        # start/end reach on_speech_start/on_speech_end and drive voice_detected
+        import inmp441_reader2
+        _thread.start_new_thread(inmp441_reader2.main, (self,))
+
+    def bind_vad(self, vad):
+        vad.on_speech_start(self.on_speech_start)
+        vad.on_speech_end(self.on_speech_end)
+
+    def on_speech_start(self):
+        self.voice_detected = True
+        print("Voice detected")
+
+    def on_speech_end(self):
+        # Playout belongs to the audio channel and is torn down by _stop_playout on close
+        self.voice_detected = False
+        print("Voice ended")
 
     def update_iot_states(self):
-        states, changed = self.thing_manager.get_states_json(delta=True)
+        states, changed = self.thing_manager.get_states(delta=True)
         if changed:
             self.protocol.send_iot_states(states)
 
@@ -0,0 +1,284 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import sys
+from micropython_websocket_client import (FrameWriter, SendQueue, parse_url, handshake_request, _unmask,
+                                          OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG,
+                                          LANE_PROTOCOL, LANE_AUDIO, LANE_CONTROL)
+
+_MICROPYTHON = sys.implementation.name == "micropython"
+
+if hasattr(asyncio, "ThreadSafeFlag"):
+    class _Wakeup:
+        # MicroPython：ThreadSafeFlag 可在其他线程/中断中 set，wait 返回后自动清除
+        def __init__(self):
+            self._flag = asyncio.ThreadSafeFlag()
+
+        def set(self):
+            self._flag.set()
+
+        async def wait(self):
+            await self._flag.wait()
+else:
+    class _Wakeup:
+        # CPython：Event 只能在事件循环线程中 set，跨线程时经 call_soon_threadsafe 转发
+        def __init__(self):
+            self._event = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+
+        def set(self):
+            self._loop.call_soon_threadsafe(self._event.set)
+
+        async def wait(self):
+            await self._event.wait()
+            self._event.clear()
+
+
+class AsyncWebSocketClient:
+    """
+    基于 uasyncio（CPython 下为 asyncio）的 WebSocket 客户端。
+    - connect 时非阻塞建立 TCP 连接并完成握手（DNS 解析在 MicroPython 上仍是阻塞的）；
+    - 读任务：按帧读取、拼接分片，ping 自动回 pong，消息回调在事件循环中执行，
+      回调返回协程时作为新任务调度，不阻塞后续读取；
+    - 写任务：send/send_binary 只把数据放入 SendQueue 并唤醒写任务，可在其他线程（如音频采集线程）调用，
+      写任务按优先级取批，复用 FrameWriter 编码带掩码的帧、合并小帧后写入流并 drain。
+    上行音频、下行音频与 IoT 消息因此可以复用同一个连接，互不阻塞。
+    """
+
+    def __init__(self, url, access_token, device_mac, device_uuid, max_message=32768):
+        self.url = url
+        self.access_token = access_token
+        self.device_mac = device_mac
+        self.device_uuid = device_uuid
+        self.max_message = max_message
+        self.reader = None
+        self.stream = None
+        self.writer = None
+        self.connected = False
+        self.queue = None
+        self._wakeup = None
+        self._tasks = []
+        self._closing = False
+        self.on_message_callback = None
+        self.on_binary_callback = None
+        self.on_close_callback = None
+        self.on_error_callback = None
+        self.on_pong_callback = None
+        self.messages_received = 0
+        self.messages_sent = 0
+
+    def on_message(self, callback):
+        # callback(message)：文本消息为 str，二进制消息为 bytes（未注册 on_binary 时）
+        self.on_message_callback = callback
+
+    def on_binary(self, callback):
+        # callback(data)：二进制消息按操作码直接分发到这里，不经过 on_message
+        self.on_binary_callback = callback
+
+    def on_close(self, callback):
+        self.on_close_callback = callback
+
+    def on_error(self, callback):
+        self.on_error_callback = callback
+
+    def on_pong(self, callback):
+        # callback(payload)
+        self.on_pong_callback = callback
+
+    def ping(self, payload=b""):
+        self._enqueue(OP_PING, payload, LANE_PROTOCOL)
+
+    async def connect(self, timeout=10):
+        host, port, path = parse_url(self.url)
+        self.reader, self.stream = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        self.stream.write(handshake_request(host, port, path, self.access_token, self.device_mac, self.device_uuid))
+        await self.stream.drain()
+        await asyncio.wait_for(self._read_handshake(), timeout)
+        if _MICROPYTHON:
+            write = self.stream.write  # uasyncio 的 Stream.write 会把数据拷入自己的输出缓冲区
+        else:
+            write = self._write_copy
+        self.writer = FrameWriter(self.stream, write=write)
+        self._wakeup = _Wakeup()
+        self.queue = SendQueue()
+        self.queue.on_ready = self._wakeup.set
+        self._closing = False
+        self.connected = True
+        self._tasks = [asyncio.create_task(self._read_loop()), asyncio.create_task(self._write_loop())]
+
+    def _write_copy(self, data):
+        # CPython 的传输层可能保留传入的缓冲区引用，而 FrameWriter 会复用输出缓冲区
+        self.stream.write(bytes(data))
+
+    async def _read_handshake(self):
+        status = await self.reader.readline()
+        if b" 101 " not in status:
+            raise OSError("WebSocket 握手失败: %s" % status)
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise OSError("WebSocket 握手响应不完整")
+            if line == b"\r\n":
+                return
+
+    def send(self, message, lane=LANE_CONTROL):
+        # str 按文本帧发送，字节类数据按二进制帧发送；只入队，不阻塞，返回 False 表示因背压被拒绝
+        if isinstance(message, str):
+            return self._enqueue(OP_TEXT, message.encode("utf-8"), lane)
+        return self._enqueue(OP_BINARY, message, lane)
+
+    def send_binary(self, data, lane=LANE_AUDIO, copy=True):
+        return self._enqueue(OP_BINARY, data, lane, copy)
+
+    def _enqueue(self, opcode, data, lane, copy=True):
+        if not self.connected:
+            raise OSError("WebSocket 未连接")
+        # 非 bytes 数据（如 PacketBuilder.payload）在入队时拷贝，调用方可立即复用缓冲区；
+        # copy=False 时调用方移交所有权，不拷贝
+        return self.queue.put(opcode, data, lane, copy=copy)
+
+    def get_send_stats(self):
+        return self.queue.get_stats() if self.queue else None
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                while True:
+                    batch = self.queue.get_batch()
+                    if not batch:
+                        break
+                    self.writer.send_frames(batch)
+                    self.messages_sent += len(batch)
+                    await self.stream.drain()
+                if self._closing:
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._fail(e)
+
+    async def _read_exactly(self, n):
+        data = await self.reader.readexactly(n)
+        if len(data) < n:
+            raise EOFError  # 部分 uasyncio 版本在 EOF 时返回短数据
+        return data
+
+    async def _read_frame(self):
+        head = await self._read_exactly(2)
+        length = head[1] & 0x7F
+        if length == 126:
+            ext = await self._read_exactly(2)
+            length = (ext[0] << 8) | ext[1]
+        elif length == 127:
+            ext = await self._read_exactly(8)
+            length = int.from_bytes(ext, "big")
+        mask = None
+        if head[1] & 0x80:
+            mask = await self._read_exactly(4)
+        payload = await self._read_exactly(length) if length else b""
+        if mask:
+            payload = bytearray(payload)
+            _unmask(payload, mask)
+        return head[0] & 0x80, head[0] & 0x0F, payload
+
+    async def _read_loop(self):
+        fragments = None
+        msg_opcode = OP_CONT
+        try:
+            while True:
+                fin, opcode, payload = await self._read_frame()
+                if opcode == OP_PING:
+                    self._enqueue(OP_PONG, payload, LANE_PROTOCOL)
+                    continue
+                if opcode == OP_PONG:
+                    if self.on_pong_callback:
+                        self.on_pong_callback(bytes(payload))
+                    continue
+                if opcode == OP_CLOSE:
+                    if not self._closing:
+                        self._enqueue(OP_CLOSE, payload[:2], LANE_PROTOCOL)
+                    break
+                if opcode != OP_CONT:
+                    msg_opcode = opcode
+                if not fin or fragments is not None:
+                    # 分片消息：拼接直到 FIN
+                    if fragments is None:
+                        fragments = bytearray()
+                    if len(fragments) + len(payload) > self.max_message:
+                        raise OSError("消息过长: %d" % (len(fragments) + len(payload)))
+                    fragments += payload
+                    if not fin:
+                        continue
+                    payload = fragments
+                    fragments = None
+                self.messages_received += 1
+                if msg_opcode == OP_TEXT:
+                    try:
+                        text = str(payload, "utf-8")
+                    except UnicodeError:
+                        # 文本帧不是合法 UTF-8：以 1007 关闭（RFC 6455 7.4.1），close 帧由写任务在关闭前发出
+                        print("WebSocket 文本消息不是合法的 UTF-8")
+                        self._enqueue(OP_CLOSE, b"\x03\xef", LANE_PROTOCOL)
+                        break
+                    self._dispatch(self.on_message_callback, text)
+                else:
+                    self._dispatch(self.on_binary_callback or self.on_message_callback, bytes(payload))
+        except asyncio.CancelledError:
+            raise
+        except (EOFError, OSError) as e:
+            if not self._closing:
+                print("WebSocket 读取结束:", e)
+        except Exception as e:
+            self._fail(e)
+            return
+        await self._shutdown()
+
+    def _dispatch(self, callback, message):
+        if not callback:
+            return
+        try:
+            result = callback(message)
+            if result is not None and hasattr(result, "send"):
+                asyncio.create_task(result)  # 协程回调在事件循环中独立运行
+        except Exception as e:
+            print("WebSocket 消息回调异常:", e)
+
+    def _fail(self, error):
+        print("WebSocket 错误:", error)
+        if self.on_error_callback:
+            self.on_error_callback(error)
+        asyncio.create_task(self._shutdown())
+
+    async def _shutdown(self):
+        if not self.connected:
+            return
+        self.connected = False
+        self._closing = True
+        current = asyncio.current_task()
+        read_task, write_task = self._tasks
+        if write_task is not current:
+            # 写任务在 _closing 置位后发完已入队的数据（如 close 帧）即退出
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(write_task, 2)
+            except Exception:
+                pass
+        if read_task is not current:
+            read_task.cancel()
+        try:
+            self.stream.close()
+            await self.stream.wait_closed()
+        except Exception:
+            pass
+        self.stream = None
+        if self.on_close_callback:
+            self.on_close_callback()
+
+    async def close(self, code=1000):
+        # 发送 close 帧，等待写任务发送完毕后关闭连接
+        if not self.connected:
+            return
+        self._enqueue(OP_CLOSE, bytes((code >> 8, code & 0xFF)), LANE_PROTOCOL)
+        await self._shutdown()
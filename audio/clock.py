@@ -0,0 +1,102 @@
+# 基于截止时刻（deadline）的帧时钟
+# 每帧的截止时刻 = 上一帧截止时刻 + 帧周期，而不是“处理完再睡固定时长”，
+# 因此处理耗时不会累积成漂移；短暂卡顿后会连续追帧，卡顿过久则跳过错过的帧重新对齐。
+# 同时统计迟到时长直方图，并可在持续错过截止时刻时在配置范围内调整帧长。
+from utils.ticks import ticks_us, ticks_diff, ticks_add, sleep_us
+
+LATENESS_BUCKETS_MS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class FrameClock:
+    def __init__(self, period_us, max_catchup=4):
+        self.period_us = period_us
+        self.max_catchup = max_catchup  # 落后超过这么多帧就放弃追帧，直接重新对齐
+        self.deadline = None
+        self.histogram = [0] * (len(LATENESS_BUCKETS_MS) + 1)
+        self.frames = 0
+        self.missed = 0
+        self.skipped = 0
+
+    def set_period(self, period_us):
+        self.period_us = period_us
+
+    def start(self):
+        self.deadline = ticks_add(ticks_us(), self.period_us)
+
+    def wait(self):
+        """阻塞到本帧截止时刻并推进到下一帧，返回迟到的微秒数（按时为 0）"""
+        if self.deadline is None:
+            self.start()
+        remaining = ticks_diff(self.deadline, ticks_us())
+        if remaining > 0:
+            sleep_us(remaining)
+            lateness = 0
+        else:
+            lateness = -remaining
+        self.record(lateness)
+        if lateness > self.max_catchup * self.period_us:
+            self.skipped += lateness // self.period_us
+            self.deadline = ticks_add(ticks_us(), self.period_us)
+        else:
+            self.deadline = ticks_add(self.deadline, self.period_us)
+        return lateness
+
+    def record(self, lateness_us):
+        """记录一帧相对截止时刻的迟到时长（外部节拍驱动时直接调用）"""
+        self.frames += 1
+        if lateness_us <= 0:
+            self.histogram[0] += 1
+            return
+        self.missed += 1
+        lateness_ms = lateness_us / 1000
+        for i, bound in enumerate(LATENESS_BUCKETS_MS):
+            if lateness_ms <= bound:
+                self.histogram[i] += 1
+                return
+        self.histogram[-1] += 1
+
+    def get_stats(self):
+        labels = ["<=%dms" % b for b in LATENESS_BUCKETS_MS] + [">%dms" % LATENESS_BUCKETS_MS[-1]]
+        return {
+            "frames": self.frames,
+            "missed": self.missed,
+            "skipped": self.skipped,
+            "lateness": {label: count for label, count in zip(labels, self.histogram) if count},
+        }
+
+
+class AdaptiveFrameSize:
+    """连续错过截止时刻时加大帧长（减少每帧固定开销），长时间稳定后再逐步缩回"""
+
+    def __init__(self, min_samples, max_samples, window=32, miss_ratio=0.25, relax_windows=4):
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.samples = min_samples
+        self.window = window
+        self.miss_limit = max(1, int(window * miss_ratio))
+        self.relax_windows = relax_windows
+        self._frames = 0
+        self._misses = 0
+        self._clean_windows = 0
+
+    def update(self, missed):
+        """每帧调用一次，帧长变化时返回新帧长，否则返回 None"""
+        self._frames += 1
+        if missed:
+            self._misses += 1
+        if self._frames < self.window:
+            return None
+        misses = self._misses
+        self._frames = self._misses = 0
+        if misses >= self.miss_limit:
+            self._clean_windows = 0
+            if self.samples < self.max_samples:
+                self.samples = min(self.max_samples, self.samples * 2)
+                return self.samples
+        elif misses == 0:
+            self._clean_windows += 1
+            if self._clean_windows >= self.relax_windows and self.samples > self.min_samples:
+                self._clean_windows = 0
+                self.samples = max(self.min_samples, self.samples // 2)
+                return self.samples
+        return None
@@ -0,0 +1,183 @@
+# 上行音频编码层：位于 AudioProcessor 与 PacketBuilder 之间，codec_id 写入数据包头。
+#   CODEC_PCM       原始 16bit PCM（512 采样 -> 1024 字节）
+#   CODEC_IMA_ADPCM IMA-ADPCM 4bit（512 采样 -> 4 + 256 字节，约 4:1）
+# ADPCM 每帧带 4 字节块头（预测值 int16 LE + 步长索引 + 保留），编码器状态跨帧连续，
+# UDP 丢包时解码端也能从下一帧的块头重新同步。
+from array import array
+
+try:
+    from micropython import native
+except ImportError:
+    def native(f):
+        return f
+
+CODEC_PCM = 0
+CODEC_IMA_ADPCM = 1
+
+_INDEX_TABLE = array('b', (-1, -1, -1, -1, 2, 4, 6, 8, -1, -1, -1, -1, 2, 4, 6, 8))
+
+_STEP_TABLE = array('h', (
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767))
+
+ADPCM_BLOCK_HEADER = 4
+
+
+class PcmCodec:
+    codec_id = CODEC_PCM
+    name = "pcm"
+
+    def encoded_size(self, num_samples):
+        return num_samples * 2
+
+    @native
+    def encode(self, samples, count, out):
+        """int16 采样以小端写入 out，返回写入的字节数"""
+        for i in range(count):
+            y = samples[i]
+            out[2 * i] = y & 0xFF
+            out[2 * i + 1] = (y >> 8) & 0xFF
+        return count * 2
+
+    @native
+    def decode(self, data, out):
+        """小端 PCM 字节解码到 int16 采样缓冲区 out，返回采样数"""
+        count = len(data) // 2
+        for i in range(count):
+            y = data[2 * i] | (data[2 * i + 1] << 8)
+            if y & 0x8000:
+                y -= 0x10000
+            out[i] = y
+        return count
+
+
+class ImaAdpcmEncoder:
+    codec_id = CODEC_IMA_ADPCM
+    name = "adpcm"
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.predictor = 0
+        self.index = 0
+
+    def encoded_size(self, num_samples):
+        return ADPCM_BLOCK_HEADER + (num_samples + 1) // 2
+
+    @native
+    def encode(self, samples, count, out):
+        """编码 samples 的前 count 个采样写入 out，返回写入的字节数"""
+        predictor = self.predictor
+        index = self.index
+        steps = _STEP_TABLE
+        indexes = _INDEX_TABLE
+        # 块头：当前预测值与步长索引
+        out[0] = predictor & 0xFF
+        out[1] = (predictor >> 8) & 0xFF
+        out[2] = index
+        out[3] = 0
+        pos = ADPCM_BLOCK_HEADER
+        for i in range(count):
+            step = steps[index]
+            diff = samples[i] - predictor
+            if diff < 0:
+                nibble = 8
+                diff = -diff
+            else:
+                nibble = 0
+            vpdiff = step >> 3
+            if diff >= step:
+                nibble |= 4
+                diff -= step
+                vpdiff += step
+            step >>= 1
+            if diff >= step:
+                nibble |= 2
+                diff -= step
+                vpdiff += step
+            step >>= 1
+            if diff >= step:
+                nibble |= 1
+                vpdiff += step
+            if nibble & 8:
+                predictor -= vpdiff
+                if predictor < -32768:
+                    predictor = -32768
+            else:
+                predictor += vpdiff
+                if predictor > 32767:
+                    predictor = 32767
+            index += indexes[nibble]
+            if index < 0:
+                index = 0
+            elif index > 88:
+                index = 88
+            # 低半字节在前（与 WAV IMA-ADPCM 一致）
+            if i & 1:
+                out[pos] |= nibble << 4
+                pos += 1
+            else:
+                out[pos] = nibble
+        if count & 1:
+            pos += 1
+        self.predictor = predictor
+        self.index = index
+        return pos
+
+
+class ImaAdpcmDecoder:
+    """主机侧（服务端/测试）解码器，每帧从块头恢复状态"""
+
+    def decode(self, data, out=None):
+        """解码一帧，返回 array('h')；out 给定时写入 out 并返回采样数"""
+        predictor = data[0] | (data[1] << 8)
+        if predictor & 0x8000:
+            predictor -= 0x10000
+        index = data[2]
+        num_samples = (len(data) - ADPCM_BLOCK_HEADER) * 2
+        if out is None:
+            result = array('h', (0 for _ in range(num_samples)))
+        else:
+            result = out
+        steps = _STEP_TABLE
+        indexes = _INDEX_TABLE
+        for i in range(num_samples):
+            byte = data[ADPCM_BLOCK_HEADER + (i >> 1)]
+            nibble = (byte >> 4) if i & 1 else (byte & 0x0F)
+            step = steps[index]
+            vpdiff = step >> 3
+            if nibble & 4:
+                vpdiff += step
+            if nibble & 2:
+                vpdiff += step >> 1
+            if nibble & 1:
+                vpdiff += step >> 2
+            if nibble & 8:
+                predictor -= vpdiff
+                if predictor < -32768:
+                    predictor = -32768
+            else:
+                predictor += vpdiff
+                if predictor > 32767:
+                    predictor = 32767
+            index += indexes[nibble]
+            if index < 0:
+                index = 0
+            elif index > 88:
+                index = 88
+            result[i] = predictor
+        return result if out is None else num_samples
+
+
+def create_codec(name):
+    if name == PcmCodec.name:
+        return PcmCodec()
+    if name == ImaAdpcmEncoder.name:
+        return ImaAdpcmEncoder()
+    raise ValueError("Unsupported codec: %s" % name)
@@ -0,0 +1,220 @@
+# 下行音频抖动缓冲与播放调度
+# 服务端 TTS 帧按网络节奏到达（WebsocketProtocol._on_binary），而播放需要按帧时长匀速进行。
+# JitterBuffer：预分配槽位的有界队列，目标深度随到达抖动自适应；
+#   播放中欠载时，缺帧的播放时刻由补偿帧占用（序号照常前进），之后才到的该帧即为迟到帧，直接丢弃；
+#   连续欠载超过 max_late 帧视为断流，重新预缓冲。迟到帧与超出最大深度的积压帧都会被丢弃，保证时延有上界。
+# PlayoutScheduler：独立线程按 server_frame_duration 节拍取帧，必要时重采样后写入 I2S TX；
+#   缓冲区为空时用上一帧衰减重复做丢包补偿，连续欠载后输出静音，并重新预缓冲到目标深度。
+# 下行帧假定为 16bit 小端 PCM，采样率为 server_sample_rate。
+import _thread
+from audio.clock import FrameClock
+from audio.codec import PcmCodec
+from audio.processor import new_sample_buffer
+from utils.ticks import ticks_ms, ticks_diff, sleep_ms
+
+
+class JitterBuffer:
+    def __init__(self, frame_ms, frame_bytes, max_frames=16, min_target=2, max_target=8, max_late=3):
+        self.frame_ms = frame_ms
+        self.frame_bytes = frame_bytes
+        self.capacity = max_frames
+        self.slots = [bytearray(frame_bytes) for _ in range(max_frames)]
+        self.lengths = [0] * max_frames
+        self.min_target = min_target
+        self.max_target = max_target
+        self.target = min_target
+        # 欠载后还按迟到处理的帧数，与 PlayoutScheduler 的 conceal_frames 对应
+        self.max_late = max_late
+        self.missed = 0         # 当前连续欠载的帧数
+        self.lock = _thread.allocate_lock()
+        self.head = 0
+        self.tail = 0
+        self.depth = 0
+        self.next_seq = 0       # 下一个要播放的序号
+        self.push_seq = 0       # 未携带序号时按到达顺序编号
+        self.jitter_ms = 0.0
+        self._last_arrival = None
+        self.buffering = True   # 预缓冲中：深度达到目标前不出帧
+        self.received = 0
+        self.late_drops = 0
+        self.overflow_drops = 0
+        self.oversize_drops = 0
+
+    def push(self, data, arrival_ms, seq=None):
+        """放入一帧；seq 为 None 时按到达顺序编号。返回是否入队"""
+        length = len(data)
+        if length > self.frame_bytes:
+            self.oversize_drops += 1
+            return False
+        with self.lock:
+            self.received += 1
+            if seq is None:
+                seq = self.push_seq
+            self.push_seq = seq + 1
+            if self.buffering and self.depth == 0:
+                # 新一段播放从这一帧开始
+                self.next_seq = seq
+            elif seq < self.next_seq:
+                # 该帧的播放时刻已过（欠载时已用补偿帧代替）
+                self.late_drops += 1
+                return False
+            self._update_jitter(arrival_ms)
+            # 留出一个槽给刚 pop 出、可能仍在解码的帧
+            if self.depth >= self.capacity - 1 or self.depth >= 2 * self.max_target:
+                # 积压过多，丢最旧的一帧，把时延拉回上界
+                self.tail = (self.tail + 1) % self.capacity
+                self.depth -= 1
+                self.next_seq += 1
+                self.overflow_drops += 1
+            slot = self.slots[self.head]
+            slot[:length] = data
+            self.lengths[self.head] = length
+            self.head = (self.head + 1) % self.capacity
+            self.depth += 1
+            return True
+
+    def _update_jitter(self, arrival_ms):
+        # RFC 3550 风格的到达间隔抖动，据此调整目标深度
+        if self._last_arrival is not None:
+            d = abs(ticks_diff(arrival_ms, self._last_arrival) - self.frame_ms)
+            self.jitter_ms += (d - self.jitter_ms) / 16
+            target = 1 + int(2 * self.jitter_ms / self.frame_ms + 0.999)
+            self.target = max(self.min_target, min(self.max_target, target))
+        self._last_arrival = arrival_ms
+
+    def pop(self):
+        """取出一帧，返回 (缓冲区, 字节数)；需要补偿（欠载或预缓冲中）时返回 None"""
+        with self.lock:
+            if self.buffering:
+                if self.depth < self.target:
+                    return None
+                self.buffering = False
+            if self.depth == 0:
+                # 欠载：这一帧的播放时刻由补偿占用，之后再到的该帧按迟到丢弃
+                self.next_seq += 1
+                self.missed += 1
+                if self.missed > self.max_late:
+                    self.buffering = True
+                    self.missed = 0
+                return None
+            self.missed = 0
+            tail = self.tail
+            self.tail = (tail + 1) % self.capacity
+            self.depth -= 1
+            self.next_seq += 1
+            # push 总会为最近 pop 出的槽留空，调用方须在下一次 pop 前用完
+            return self.slots[tail], self.lengths[tail]
+
+    def reset(self):
+        with self.lock:
+            self.head = self.tail = self.depth = 0
+            self.next_seq = self.push_seq
+            self.missed = 0
+            self.buffering = True
+            self._last_arrival = None
+
+    def get_stats(self):
+        return {
+            "depth": self.depth,
+            "target": self.target,
+            "jitter_ms": round(self.jitter_ms, 2),
+            "received": self.received,
+            "late_drops": self.late_drops,
+            "overflow_drops": self.overflow_drops,
+            "oversize_drops": self.oversize_drops,
+        }
+
+
+class PlayoutScheduler:
+    def __init__(self, jitter_buffer, sink, input_rate, resampler=None, conceal_frames=3):
+        """
+        sink: 支持 write(buf) 的 I2S TX（或模拟）对象
+        resampler: 可选，将 input_rate 转换为 sink 的采样率
+        conceal_frames: 欠载时用上一帧衰减重复的帧数，之后输出静音
+        """
+        self.jitter = jitter_buffer
+        self.sink = sink
+        self.resampler = resampler
+        self.conceal_frames = conceal_frames
+        frame_samples = jitter_buffer.frame_bytes // 2
+        self.frame_samples = frame_samples
+        self.codec = PcmCodec()
+        self.samples = new_sample_buffer(frame_samples)
+        self.last_count = frame_samples
+        if resampler is not None:
+            self.output = new_sample_buffer(resampler.max_output(frame_samples))
+        else:
+            self.output = self.samples
+        self.clock = FrameClock(frame_samples * 1000000 // input_rate)
+        self.running = False
+        self._alive = False
+        self.frames_played = 0
+        self.underruns = 0
+        self.concealed = 0
+        self.silent = 0
+        self._conceal_run = 0
+
+    def start(self):
+        self.running = True
+        self._alive = True
+        _thread.start_new_thread(self._run, ())
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        try:
+            while self.running:
+                self.clock.wait()
+                self.play_one()
+        finally:
+            self._alive = False
+
+    def play_one(self):
+        """播放一个帧时长的音频（由播放线程按节拍调用）"""
+        samples = self.samples
+        item = self.jitter.pop()
+        if item is not None:
+            count = self.codec.decode(memoryview(item[0])[:item[1]], samples)
+            self.last_count = count
+            self._conceal_run = 0
+            self.frames_played += 1
+        else:
+            count = self.last_count
+            if self.frames_played and self._conceal_run == 0:
+                # 播放过程中断流，每次断流只计一次
+                self.underruns += 1
+            self._conceal(samples, count)
+        if self.resampler is not None:
+            count = self.resampler.process(samples, count, self.output)
+        self.sink.write(memoryview(self.output)[:count])
+
+    def _conceal(self, samples, count):
+        self._conceal_run += 1
+        if self.frames_played and self._conceal_run <= self.conceal_frames:
+            # 上一帧衰减一半重复播放
+            for i in range(count):
+                samples[i] >>= 1
+            self.concealed += 1
+        else:
+            for i in range(count):
+                samples[i] = 0
+            self.silent += 1
+
+    def join(self, timeout_ms=1000):
+        """等待播放线程退出"""
+        start = ticks_ms()
+        while self._alive and ticks_diff(ticks_ms(), start) < timeout_ms:
+            sleep_ms(1)
+        return not self._alive
+
+    def get_stats(self):
+        stats = self.jitter.get_stats()
+        stats.update({
+            "played": self.frames_played,
+            "underruns": self.underruns,
+            "concealed": self.concealed,
+            "silent": self.silent,
+            "playout": self.clock.get_stats(),
+        })
+        return stats
@@ -0,0 +1,120 @@
+# UDP 音频上行数据包构造与解析
+# v1（旧格式，继续可解析）:
+#   PCM:    魔数 0xA1B2C3D4(4B) + 设备ID(16B) + 数据长度(2B)
+#   非 PCM: 魔数 0xA1B2C3D5(4B) + 设备ID(16B) + 编码(1B) + 数据长度(2B)
+# v2（带版本号的流格式）:
+#   魔数 0xA1B2C3D6(4B) + 版本(1B) + 设备ID(16B) + 编码(1B) + 标志(1B) + 序号(4B) + 采集时刻 ms(4B) + 数据长度(2B)
+#   序号只在真正发出的帧上递增（VAD 抑制的帧不占序号），因此序号缺口即为丢包；
+#   采集时刻来自 ticks_ms，用于计算抖动与相对时延。
+#   服务端须先升级到能解析 v2 魔数的版本，因此 PacketBuilder 默认仍发送 v1，需要时显式选择 v2。
+# 全部为网络字节序。每个音频流预分配一个 头部+负载 的 bytearray，魔数与设备ID只写一次，
+# 之后每帧只用 pack_into 更新变化的字段，DSP 直接写入负载区，sendto 拿到的是零拷贝的 memoryview。
+import struct
+from audio.codec import CODEC_PCM
+
+MAGIC_NUMBER = 0xA1B2C3D4     # 与服务端一致的魔数
+AUDIO_FORMAT = "!I16sH"       # 协议头格式: 魔数(4B) + 设备ID(16B) + 数据长度(2B)
+HEADER_SIZE = struct.calcsize(AUDIO_FORMAT)
+CODEC_MAGIC_NUMBER = 0xA1B2C3D5
+CODEC_AUDIO_FORMAT = "!I16sBH"  # 魔数(4B) + 设备ID(16B) + 编码(1B) + 数据长度(2B)
+CODEC_HEADER_SIZE = struct.calcsize(CODEC_AUDIO_FORMAT)
+STREAM_MAGIC_NUMBER = 0xA1B2C3D6
+STREAM_AUDIO_FORMAT = "!IB16sBBIIH"  # 魔数 + 版本 + 设备ID + 编码 + 标志 + 序号 + 采集时刻 + 数据长度
+STREAM_HEADER_SIZE = struct.calcsize(STREAM_AUDIO_FORMAT)
+_STREAM_DYNAMIC_FORMAT = "!BIIH"      # 标志 + 序号 + 采集时刻 + 数据长度
+_STREAM_DYNAMIC_OFFSET = 4 + 1 + 16 + 1
+DEVICE_ID_SIZE = 16
+
+PACKET_VERSION_LEGACY = 1
+PACKET_VERSION_STREAM = 2
+
+FLAG_SPEECH_START = 0x01  # 语音段的第一帧，与上一帧之间的静音间隔不计入抖动
+
+
+def encode_device_id(device_id):
+    """设备ID编码为固定 16 字节，超长截断，不足补 0"""
+    if isinstance(device_id, str):
+        device_id = device_id.encode('utf-8')
+    device_id = bytes(device_id[:DEVICE_ID_SIZE])
+    return device_id + b'\x00' * (DEVICE_ID_SIZE - len(device_id))
+
+
+class AudioPacket:
+    """解析后的数据包；v1 格式没有 seq/tick，对应字段为 None"""
+
+    def __init__(self, device_id, version, codec_id, payload, flags=0, seq=None, tick=None):
+        self.device_id = device_id
+        self.version = version
+        self.codec_id = codec_id
+        self.payload = payload
+        self.flags = flags
+        self.seq = seq
+        self.tick = tick
+
+
+def parse_packet(packet):
+    magic = struct.unpack_from("!I", packet, 0)[0]
+    if magic == STREAM_MAGIC_NUMBER:
+        _, version, device_id, codec_id, flags, seq, tick, length = \
+            struct.unpack_from(STREAM_AUDIO_FORMAT, packet, 0)
+        if version != PACKET_VERSION_STREAM:
+            raise ValueError("unsupported packet version: %d" % version)
+        payload = memoryview(packet)[STREAM_HEADER_SIZE:STREAM_HEADER_SIZE + length]
+        return AudioPacket(device_id.rstrip(b'\x00'), version, codec_id, payload, flags, seq, tick)
+    if magic == MAGIC_NUMBER:
+        _, device_id, length = struct.unpack_from(AUDIO_FORMAT, packet, 0)
+        codec_id, offset = CODEC_PCM, HEADER_SIZE
+    elif magic == CODEC_MAGIC_NUMBER:
+        _, device_id, codec_id, length = struct.unpack_from(CODEC_AUDIO_FORMAT, packet, 0)
+        offset = CODEC_HEADER_SIZE
+    else:
+        raise ValueError("bad magic: 0x%08X" % magic)
+    payload = memoryview(packet)[offset:offset + length]
+    return AudioPacket(device_id.rstrip(b'\x00'), PACKET_VERSION_LEGACY, codec_id, payload)
+
+
+class PacketBuilder:
+    def __init__(self, device_id, max_payload, codec_id=CODEC_PCM, version=PACKET_VERSION_LEGACY):
+        self.max_payload = max_payload
+        self.codec_id = codec_id
+        self.version = version
+        self.seq = 0
+        dev_id = encode_device_id(device_id)
+        if version == PACKET_VERSION_STREAM:
+            self.header_size = STREAM_HEADER_SIZE
+            self.buffer = bytearray(STREAM_HEADER_SIZE + max_payload)
+            struct.pack_into(STREAM_AUDIO_FORMAT, self.buffer, 0, STREAM_MAGIC_NUMBER,
+                             PACKET_VERSION_STREAM, dev_id, codec_id, 0, 0, 0, 0)
+        elif codec_id == CODEC_PCM:
+            self.header_size = HEADER_SIZE
+            self.buffer = bytearray(HEADER_SIZE + max_payload)
+            struct.pack_into(AUDIO_FORMAT, self.buffer, 0, MAGIC_NUMBER, dev_id, 0)
+        else:
+            self.header_size = CODEC_HEADER_SIZE
+            self.buffer = bytearray(CODEC_HEADER_SIZE + max_payload)
+            struct.pack_into(CODEC_AUDIO_FORMAT, self.buffer, 0, CODEC_MAGIC_NUMBER, dev_id, codec_id, 0)
+        self._length_offset = self.header_size - 2
+        self._view = memoryview(self.buffer)
+        # 负载区：DSP/编码器输出直接写到这里
+        self.payload = self._view[self.header_size:]
+
+    def finish(self, length, tick=0, flags=0):
+        """负载区已写入 length 字节后调用，返回整个数据包的 memoryview。
+        tick 为该帧的采集时刻（ticks_ms），仅 v2 格式使用。"""
+        if length > self.max_payload:
+            raise ValueError("payload too large: %d > %d" % (length, self.max_payload))
+        if self.version == PACKET_VERSION_STREAM:
+            struct.pack_into(_STREAM_DYNAMIC_FORMAT, self.buffer, _STREAM_DYNAMIC_OFFSET,
+                             flags, self.seq, tick & 0xFFFFFFFF, length)
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+        else:
+            struct.pack_into("!H", self.buffer, self._length_offset, length)
+        return self._view[:self.header_size + length]
+
+    def build(self, data, tick=0, flags=0):
+        """把已有的音频数据拷贝进负载区并返回数据包（兼容非零拷贝的调用方）"""
+        length = len(data)
+        if length > self.max_payload:
+            raise ValueError("payload too large: %d > %d" % (length, self.max_payload))
+        self.payload[:length] = data
+        return self.finish(length, tick, flags)
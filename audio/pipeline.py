@@ -0,0 +1,162 @@
+# I2S 采集的生产者/消费者流水线
+# 生产者线程只负责把 I2S 数据读进预分配的多槽环形缓冲区，消费者线程负责处理与发送。
+# 发送变慢或 Wi-Fi 抖动时，生产者仍能持续清空 I2S DMA 缓冲区，丢帧会体现在 overrun 计数上，而不是静默丢失。
+import _thread
+from audio.processor import new_sample_buffer
+from audio.clock import FrameClock
+from utils.ticks import ticks_ms, ticks_diff, ticks_add, sleep_ms
+
+
+class RingBuffer:
+    def __init__(self, slots, samples_per_slot):
+        self.slots = [new_sample_buffer(samples_per_slot) for _ in range(slots)]
+        self.lengths = [0] * slots
+        self.ticks = [0] * slots  # 每个槽的采集时刻（ticks_ms）
+        self.capacity = slots
+        self.head = 0    # 下一个写入的槽
+        self.tail = 0    # 下一个读取的槽
+        self.depth = 0   # 已写入未读取的槽数
+        self.max_depth = 0
+        self.lock = _thread.allocate_lock()
+
+    def write_slot(self):
+        """返回可写入的槽，环形缓冲区已满时返回 None"""
+        if self.depth >= self.capacity:
+            return None
+        return self.slots[self.head]
+
+    def commit_write(self, length, tick):
+        with self.lock:
+            self.lengths[self.head] = length
+            self.ticks[self.head] = tick
+            self.head = (self.head + 1) % self.capacity
+            self.depth += 1
+            if self.depth > self.max_depth:
+                self.max_depth = self.depth
+
+    def read_slot(self):
+        """返回 (槽, 字节数, 采集时刻)，环形缓冲区为空时返回 None"""
+        if self.depth == 0:
+            return None
+        tail = self.tail
+        return self.slots[tail], self.lengths[tail], self.ticks[tail]
+
+    def release_read(self):
+        with self.lock:
+            self.tail = (self.tail + 1) % self.capacity
+            self.depth -= 1
+
+
+class CapturePipeline:
+    def __init__(self, source, handler, slots=4, samples_per_slot=512, sample_rate=16000, frame_size=None):
+        """
+        source: 支持 readinto 的 I2S（或模拟）对象
+        handler: handler(samples, num_bytes, tick)，在消费者线程中处理并发送一帧，tick 为采集完成时刻
+        frame_size: 可选的 AdaptiveFrameSize，持续错过截止时刻时在其范围内调整帧长，
+                    此时槽大小按其 max_samples 分配
+        每帧的处理截止时刻为采集时刻 + 帧时长，迟到情况记录在 self.clock；
+        消费者等待超过两帧时长（采集源停顿）记一次 underrun。
+        """
+        self.source = source
+        self.handler = handler
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        if frame_size is not None:
+            samples_per_slot = frame_size.max_samples
+        self.ring = RingBuffer(slots, samples_per_slot)
+        self._scratch = new_sample_buffer(samples_per_slot)  # 缓冲区满时用于丢弃数据，保证 I2S 不溢出
+        self.clock = FrameClock(0)
+        self._set_frame_samples(frame_size.samples if frame_size is not None else samples_per_slot)
+        self.running = False
+        self._producer_alive = False
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.overruns = 0
+        self.underruns = 0
+
+    def _set_frame_samples(self, samples):
+        self.frame_samples = samples
+        self.frame_ms = samples * 1000 // self.sample_rate
+        self.clock.set_period(samples * 1000000 // self.sample_rate)
+
+    def _frame_buffer(self, slot):
+        samples = self.frame_samples
+        return slot if samples >= len(slot) else memoryview(slot)[:samples]
+
+    def start(self):
+        self.running = True
+        self._producer_alive = True
+        _thread.start_new_thread(self._producer, ())
+
+    def stop(self):
+        self.running = False
+
+    def _producer(self):
+        ring = self.ring
+        try:
+            while self.running:
+                slot = ring.write_slot()
+                if slot is None:
+                    # 消费者跟不上：依旧读取 I2S，但丢弃这一帧
+                    self.source.readinto(self._frame_buffer(self._scratch))
+                    self.overruns += 1
+                    continue
+                num_bytes = self.source.readinto(self._frame_buffer(slot))
+                if num_bytes > 0:
+                    ring.commit_write(num_bytes, ticks_ms())
+                    self.frames_captured += 1
+        finally:
+            self._producer_alive = False
+
+    def run_consumer(self):
+        """在当前线程中运行消费者循环，直到 stop() 被调用"""
+        ring = self.ring
+        wait_start = None
+        while self.running:
+            item = ring.read_slot()
+            if item is None:
+                now = ticks_ms()
+                if wait_start is None:
+                    wait_start = now
+                elif ticks_diff(now, wait_start) > 2 * self.frame_ms:
+                    self.underruns += 1
+                    wait_start = now
+                sleep_ms(1)
+                continue
+            wait_start = None
+            try:
+                self.handler(item[0], item[1], item[2])
+            finally:
+                ring.release_read()
+            self.frames_processed += 1
+            self._check_deadline(item[2], item[1] // 2)
+
+    def _check_deadline(self, tick, samples):
+        # 本帧须在下一帧采集完成前处理完
+        deadline = ticks_add(tick, samples * 1000 // self.sample_rate)
+        lateness_ms = ticks_diff(ticks_ms(), deadline)
+        self.clock.record(lateness_ms * 1000)
+        if self.frame_size is not None:
+            new_samples = self.frame_size.update(lateness_ms > 0)
+            if new_samples is not None:
+                print(f"帧长调整为 {new_samples} 采样")
+                self._set_frame_samples(new_samples)
+
+    def join(self, timeout_ms=1000):
+        """等待生产者线程退出"""
+        start = ticks_ms()
+        while self._producer_alive and ticks_diff(ticks_ms(), start) < timeout_ms:
+            sleep_ms(1)
+        return not self._producer_alive
+
+    def get_stats(self):
+        return {
+            "captured": self.frames_captured,
+            "processed": self.frames_processed,
+            "overruns": self.overruns,
+            "underruns": self.underruns,
+            "depth": self.ring.depth,
+            "max_depth": self.ring.max_depth,
+            "frame_samples": self.frame_samples,
+            "deadline": self.clock.get_stats(),
+        }
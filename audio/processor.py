@@ -0,0 +1,89 @@
+# 单遍、有状态的音频处理器：去直流 + 增益 + 一阶低通，原地处理 int16 采样缓冲区。
+# 与旧版 process_audio 的区别：
+#   1. 不再 unpack/pack 成 list，直接在 array('h') 上读写（或直接写入数据包负载区），不分配新内存；
+#   2. 直流偏移与增益使用上一帧的统计量（单遍即可完成），滤波器状态跨帧保持，消除帧边界的咔哒声。
+from array import array
+
+try:
+    from micropython import native
+except ImportError:
+    def native(f):
+        return f
+
+
+def new_sample_buffer(num_samples):
+    """创建一个可直接交给 I2S.readinto 的 int16 采样缓冲区"""
+    return array('h', (0 for _ in range(num_samples)))
+
+
+def sample_view(buf):
+    """把 bytearray / memoryview 视作 int16 序列；array('h') 原样返回"""
+    if isinstance(buf, array):
+        return buf
+    return memoryview(buf).cast('h')  # 仅 CPython 可用，设备上请直接使用 array('h') 缓冲区
+
+
+class AudioProcessor:
+    def __init__(self, alpha=20, max_gain=5, gain_threshold=100, dc_smoothing=2):
+        self.alpha = alpha                    # 低通滤波系数（百分比）
+        self.max_gain = max_gain              # 最大增益
+        self.gain_threshold = gain_threshold  # 峰值超过该值才启用增益
+        self.dc_smoothing = dc_smoothing      # 直流估计的平滑移位量，越大越平滑
+        self.reset()
+
+    def reset(self):
+        self.dc_offset = 0
+        self.gain = 1
+        self.prev = 0
+        self.frames = 0
+
+    @native
+    def process(self, samples, count=-1, out=None):
+        """处理 samples 的前 count 个采样，返回处理的采样数。
+        结果总是原地写回 samples；out 不为 None 时另以小端 int16 写入 out（如数据包的负载区），
+        这样写入负载区的路径上 VAD 等后续分析看到的仍是处理后的采样。"""
+        if count < 0:
+            count = len(samples)
+        if count == 0:
+            return 0
+        dc = self.dc_offset
+        gain = self.gain
+        prev = self.prev
+        alpha = self.alpha
+        beta = 100 - alpha
+        total = 0
+        peak = 0
+        for i in range(count):
+            x = samples[i]
+            total += x
+            x -= dc
+            # 峰值统计用于下一帧的增益，取增益前的幅值
+            if x > peak:
+                peak = x
+            elif -x > peak:
+                peak = -x
+            x *= gain
+            y = (prev * beta + x * alpha) // 100
+            if y > 32767:
+                y = 32767
+            elif y < -32768:
+                y = -32768
+            samples[i] = y
+            if out is not None:
+                out[2 * i] = y & 0xFF
+                out[2 * i + 1] = (y >> 8) & 0xFF
+            prev = y
+        self.prev = prev
+
+        # 更新下一帧使用的直流偏移与增益
+        mean = total // count
+        if self.frames == 0:
+            self.dc_offset = mean
+        else:
+            self.dc_offset = dc + ((mean - dc) >> self.dc_smoothing)
+        if peak > self.gain_threshold:
+            self.gain = min(self.max_gain, 32767 // peak)
+        else:
+            self.gain = 1
+        self.frames += 1
+        return count
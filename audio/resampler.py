@@ -0,0 +1,119 @@
+# 有状态、按块流式处理的多相（polyphase）整数比重采样器
+# rate_out/rate_in 约分为 L/M：概念上先 L 倍插零上采样，经低通后 M 倍抽取；
+# 多相分解后每个输出采样只需一个相位的 taps 个系数与最近 taps 个输入做点积。
+# 滤波系数（加窗 sinc，Q12 定点）在构造时预先计算，块与块之间保留输入历史与相位，无拼接误差。
+# 典型用法：16k <-> 24k（3/2、2/3），16k <-> 48k（3/1、1/3）。
+import math
+from array import array
+
+try:
+    from micropython import native
+except ImportError:
+    def native(f):
+        return f
+
+COEF_SHIFT = 12
+# 抗混叠：截止频率取较低奈奎斯特频率的 90%，过渡带落在奈奎斯特以内；
+# 每相位抽头数按 TAPS_PER_RATIO * max(up, down) / up 随抽取比例增长，保证过渡带宽相对截止频率不变
+# （48k->16k 每相位 48 个、24k->16k 24 个、16k->24k/48k 16 个，奈奎斯特以上 2kHz 处衰减约 -64dB）
+CUTOFF_RATIO = 0.9
+TAPS_PER_RATIO = 16
+
+
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+
+def design_phases(up, down, taps):
+    """生成 up 个相位、每相位 taps 个系数的 Q12 滤波器表"""
+    length = up * taps
+    cutoff = 0.5 * CUTOFF_RATIO / max(up, down)  # 相对上采样后的采样率
+    center = (length - 1) / 2
+    coefs = []
+    for j in range(length):
+        t = j - center
+        sinc = 2 * cutoff if t == 0 else math.sin(2 * math.pi * cutoff * t) / (math.pi * t)
+        # Blackman 窗
+        window = 0.42 - 0.5 * math.cos(2 * math.pi * j / (length - 1)) + 0.08 * math.cos(4 * math.pi * j / (length - 1))
+        coefs.append(sinc * window * up)
+    phases = []
+    for p in range(up):
+        table = [coefs[p + k * up] for k in range(taps)]
+        # 每个相位单独归一化为单位直流增益，避免相位间的幅度起伏
+        total = sum(table) or 1
+        phases.append(array('h', (int(round(c / total * (1 << COEF_SHIFT))) for c in table)))
+    return phases
+
+
+class Resampler:
+    def __init__(self, rate_in, rate_out, taps=None, max_block=1024):
+        g = _gcd(rate_in, rate_out)
+        self.rate_in = rate_in
+        self.rate_out = rate_out
+        self.up = rate_out // g
+        self.down = rate_in // g
+        if taps is None:
+            taps = TAPS_PER_RATIO * max(self.up, self.down) // self.up
+        self.taps = taps
+        self.max_block = max_block
+        self.phases = design_phases(self.up, self.down, taps)
+        # 工作区 = taps-1 个历史采样 + 当前输入块
+        self.work = array('h', (0 for _ in range(taps - 1 + max_block)))
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.work)):
+            self.work[i] = 0
+        self.phase = 0
+        self.position = 0  # 下一个输出对应的输入下标（相对当前块起点）
+
+    def max_output(self, count):
+        """count 个输入最多产生的输出采样数"""
+        return count * self.up // self.down + 1
+
+    def process(self, samples, count, out):
+        """重采样 samples 的前 count 个采样写入 out，返回输出采样数"""
+        if count > self.max_block:
+            raise ValueError("block too large: %d > %d" % (count, self.max_block))
+        history = self.taps - 1
+        work = self.work
+        for i in range(count):
+            work[history + i] = samples[i]
+        produced = self._run(count, out)
+        # 保留最后 taps-1 个输入作为下一块的历史
+        for i in range(history):
+            work[i] = work[count + i]
+        return produced
+
+    @native
+    def _run(self, count, out):
+        work = self.work
+        phases = self.phases
+        taps = self.taps
+        up = self.up
+        down = self.down
+        base = taps - 1
+        phase = self.phase
+        i = self.position
+        n = 0
+        while i < count:
+            table = phases[phase]
+            acc = 0
+            j = base + i
+            for k in range(taps):
+                acc += table[k] * work[j - k]
+            y = acc >> COEF_SHIFT
+            if y > 32767:
+                y = 32767
+            elif y < -32768:
+                y = -32768
+            out[n] = y
+            n += 1
+            phase += down
+            i += phase // up
+            phase %= up
+        self.phase = phase
+        self.position = i - count
+        return n
@@ -0,0 +1,117 @@
+# 流式语音活动检测（VAD），放在编码与网络发送之前，静音帧直接丢弃。
+# 判定依据：帧能量（相对均值的平均绝对偏差）与过零率；
+# 噪声底自适应，起止阈值不同（迟滞），语音结束后保持 hangover 帧，避免句尾与字间停顿被截断。
+try:
+    from micropython import native
+except ImportError:
+    def native(f):
+        return f
+
+
+class VoiceActivityDetector:
+    def __init__(self, start_ratio=3.0, stop_ratio=1.5, min_energy=60, max_zcr=0.35, hangover_frames=8):
+        self.start_ratio = start_ratio          # 能量超过噪声底的该倍数才进入语音
+        self.stop_ratio = stop_ratio            # 语音中能量高于噪声底的该倍数即视为继续
+        self.min_energy = min_energy            # 绝对能量下限，防止极安静环境下误触发
+        self.max_zcr = max_zcr                  # 过零率上限，高过零率的弱信号按噪声处理
+        self.hangover_frames = hangover_frames  # 语音结束后继续发送的帧数
+        self.speech_start_callback = None
+        self.speech_end_callback = None
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.speech_started = False  # 本帧是否为语音段的第一帧
+        self.noise_floor = -1
+        self.mean = 0
+        self.hangover = 0
+        self.energy = 0
+        self.zcr = 0
+        self.frames_sent = 0
+        self.frames_suppressed = 0
+
+    def on_speech_start(self, callback):
+        self.speech_start_callback = callback
+
+    def on_speech_end(self, callback):
+        self.speech_end_callback = callback
+
+    @native
+    def _measure(self, samples, count):
+        # 单遍计算：相对上一帧均值的平均绝对偏差、过零次数、本帧均值
+        mean = self.mean
+        total = 0
+        deviation = 0
+        crossings = 0
+        last_positive = samples[0] >= mean
+        for i in range(count):
+            x = samples[i]
+            total += x
+            d = x - mean
+            if d >= 0:
+                deviation += d
+                if not last_positive:
+                    crossings += 1
+                    last_positive = True
+            else:
+                deviation -= d
+                if last_positive:
+                    crossings += 1
+                    last_positive = False
+        self.mean = total // count
+        return deviation // count, crossings
+
+    def process(self, samples, count=-1):
+        """分析一帧，返回 True 表示应当发送"""
+        if count < 0:
+            count = len(samples)
+        if count == 0:
+            return False
+        self.speech_started = False
+        energy, crossings = self._measure(samples, count)
+        zcr = crossings / count
+        self.energy = energy
+        self.zcr = zcr
+
+        if self.noise_floor < 0:
+            self.noise_floor = energy
+        ratio = self.stop_ratio if self.in_speech else self.start_ratio
+        threshold = max(self.min_energy, self.noise_floor * ratio)
+        voiced = energy > threshold and (zcr <= self.max_zcr or energy > 2 * threshold)
+
+        if voiced:
+            self.hangover = self.hangover_frames
+            if not self.in_speech:
+                self.in_speech = True
+                self.speech_started = True
+                if self.speech_start_callback:
+                    self.speech_start_callback()
+        else:
+            # 噪声底只在非语音帧上更新：下降快、上升慢
+            if energy < self.noise_floor:
+                self.noise_floor = energy
+            else:
+                self.noise_floor += (energy - self.noise_floor) / 16
+            if self.in_speech:
+                if self.hangover > 0:
+                    self.hangover -= 1
+                else:
+                    self.in_speech = False
+                    if self.speech_end_callback:
+                        self.speech_end_callback()
+
+        if self.in_speech:
+            self.frames_sent += 1
+            return True
+        self.frames_suppressed += 1
+        return False
+
+    def get_stats(self):
+        total = self.frames_sent + self.frames_suppressed
+        return {
+            "sent": self.frames_sent,
+            "suppressed": self.frames_suppressed,
+            "suppressed_ratio": self.frames_suppressed / total if total else 0,
+            "noise_floor": self.noise_floor,
+            "in_speech": self.in_speech,
+        }
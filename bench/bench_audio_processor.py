@@ -0,0 +1,85 @@
+# 主机侧基准：对比旧版 process_audio（list + struct）与 AudioProcessor（原地单遍）
+# 每帧耗时（微秒）与每帧内存分配。
+# 用法: python bench/bench_audio_processor.py [帧数]
+import os
+import sys
+import math
+import struct
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from array import array
+
+from audio.processor import AudioProcessor, new_sample_buffer
+
+SAMPLES_PER_FRAME = 512  # 1024 字节 / 16bit
+
+
+def legacy_process_audio(raw_data):
+    # inmp441_reader2.process_audio 的原始实现（去掉了打印）
+    fmt = f'<{len(raw_data)//2}h'
+    samples = list(struct.unpack(fmt, raw_data))
+    dc_offset = sum(samples) // len(samples) if samples else 0
+    samples = [x - dc_offset for x in samples]
+    max_val = max((abs(x) for x in samples), default=1)
+    if max_val > 100:
+        gain = min(5, 32767 // max_val)
+        samples = [min(32767, max(-32768, int(x * gain))) for x in samples]
+    filtered = []
+    prev = 0
+    alpha = 20
+    for x in samples:
+        new_val = (prev * (100 - alpha) + x * alpha) // 100
+        filtered.append(max(-32768, min(32767, new_val)))
+        prev = filtered[-1]
+    return bytearray(struct.pack(f'<{len(filtered)}h', *filtered))
+
+
+def synth_frame(index):
+    # 440Hz 正弦 + 直流偏移，模拟 INMP441 输出
+    base = index * SAMPLES_PER_FRAME
+    return [int(3000 * math.sin(2 * math.pi * 440 * (base + i) / 16000)) + 200
+            for i in range(SAMPLES_PER_FRAME)]
+
+
+def measure(name, run, frames):
+    start = time.perf_counter_ns()
+    for i in range(frames):
+        run(i)
+    elapsed = time.perf_counter_ns() - start
+
+    # 单帧处理过程中的峰值堆占用，即每帧的临时分配量
+    tracemalloc.start()
+    run(0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<16} {elapsed / frames / 1000:8.1f} us/frame  alloc {peak:7d} B/frame")
+
+
+def main(frames=500):
+    sources = [synth_frame(i) for i in range(frames)]
+    raw_frames = [struct.pack(f'<{SAMPLES_PER_FRAME}h', *s) for s in sources]
+
+    def run_legacy(i):
+        legacy_process_audio(raw_frames[i])
+
+    buf = new_sample_buffer(SAMPLES_PER_FRAME)
+    processor = AudioProcessor()
+
+    # 预先转换为 array，避免把输入构造计入 AudioProcessor 的开销
+    arrays = [array('h', s) for s in sources]
+
+    def run_processor(i):
+        buf[:] = arrays[i]
+        processor.process(buf)
+
+    print(f"{frames} 帧, 每帧 {SAMPLES_PER_FRAME} 采样")
+    measure("legacy", run_legacy, frames)
+    measure("AudioProcessor", run_processor, frames)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,70 @@
+# 主机侧验证：用按真实时钟速率产出数据的模拟 I2S 源驱动 CapturePipeline，
+# 并周期性模拟发送阻塞（Wi-Fi 抖动），观察 overrun/underrun 计数、队列深度、
+# 截止时刻迟到直方图，以及处理持续变慢时的自适应帧长。
+# 用法: python bench/bench_capture_pipeline.py [秒数] [阻塞毫秒] [每帧额外处理毫秒]
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from audio.pipeline import CapturePipeline
+from audio.clock import FrameClock, AdaptiveFrameSize
+
+SAMPLE_RATE = 16000
+SAMPLES_PER_FRAME = 512
+FRAME_MS = SAMPLES_PER_FRAME * 1000 // SAMPLE_RATE
+
+
+class FakeI2S:
+    """按采样率节拍阻塞的 I2S.readinto 模拟，节拍由 FrameClock 的截止时刻驱动"""
+
+    def __init__(self, rate=SAMPLE_RATE):
+        self.rate = rate
+        self.clock = FrameClock(SAMPLES_PER_FRAME * 1000000 // rate)
+        self.value = 0
+
+    def readinto(self, buf):
+        n = len(buf)
+        self.clock.set_period(n * 1000000 // self.rate)
+        self.clock.wait()
+        self.value = (self.value + 1) & 0x7FFF
+        buf[0] = self.value
+        return n * 2
+
+
+def main(seconds=5.0, stall_ms=200, work_ms=0):
+    stall_every = 50  # 每 50 帧模拟一次发送阻塞
+
+    def handler(samples, num_bytes, tick):
+        if pipeline.frames_processed % stall_every == stall_every - 1:
+            time.sleep(stall_ms / 1000)
+        if work_ms:
+            time.sleep(work_ms / 1000)
+
+    frame_size = AdaptiveFrameSize(SAMPLES_PER_FRAME, SAMPLES_PER_FRAME * 2, window=16)
+    pipeline = CapturePipeline(FakeI2S(), handler, slots=8, samples_per_slot=SAMPLES_PER_FRAME,
+                               sample_rate=SAMPLE_RATE, frame_size=frame_size)
+    pipeline.start()
+
+    consumer = threading.Thread(target=pipeline.run_consumer, daemon=True)
+    consumer.start()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        time.sleep(1)
+        print(pipeline.get_stats())
+    pipeline.stop()
+    pipeline.join()
+    consumer.join(1)
+
+    stats = pipeline.get_stats()
+    expected = int(seconds * 1000 / FRAME_MS)
+    print(f"期望帧数 ~{expected}（{FRAME_MS}ms 帧长下）, 采集 {stats['captured']} (+{stats['overruns']} 丢弃), "
+          f"处理 {stats['processed']}, 最大队列深度 {stats['max_depth']}/8")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+         float(sys.argv[3]) if len(sys.argv) > 3 else 0)
@@ -0,0 +1,63 @@
+# 主机侧基准：每帧编码耗时、编解码往返信噪比，以及数据包层面的带宽对比。
+# 用法: python bench/bench_codec.py [帧数]
+import os
+import sys
+import math
+import time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from audio.codec import PcmCodec, ImaAdpcmEncoder, ImaAdpcmDecoder
+from audio.packet import PacketBuilder, parse_packet
+
+SAMPLE_RATE = 16000
+SAMPLES_PER_FRAME = 512
+
+
+def synth_frames(frames):
+    result = []
+    for f in range(frames):
+        base = f * SAMPLES_PER_FRAME
+        result.append(array('h', (
+            int(6000 * math.sin(2 * math.pi * 300 * (base + i) / SAMPLE_RATE)
+                + 2000 * math.sin(2 * math.pi * 2100 * (base + i) / SAMPLE_RATE))
+            for i in range(SAMPLES_PER_FRAME))))
+    return result
+
+
+def snr_db(reference, decoded):
+    signal = sum(x * x for x in reference)
+    noise = sum((x - y) * (x - y) for x, y in zip(reference, decoded)) or 1
+    return 10 * math.log10(signal / noise)
+
+
+def main(frames=300):
+    source = synth_frames(frames)
+    packets_per_second = SAMPLE_RATE / SAMPLES_PER_FRAME
+    decoder = ImaAdpcmDecoder()
+    baseline = None
+    for codec in (PcmCodec(), ImaAdpcmEncoder()):
+        builder = PacketBuilder("bench-device", codec.encoded_size(SAMPLES_PER_FRAME), codec.codec_id)
+        packets = []
+        start = time.perf_counter_ns()
+        for frame in source:
+            length = codec.encode(frame, SAMPLES_PER_FRAME, builder.payload)
+            packets.append(bytes(builder.finish(length)))
+        elapsed = time.perf_counter_ns() - start
+
+        kbps = len(packets[0]) * 8 * packets_per_second / 1000
+        if baseline is None:
+            baseline = kbps
+        line = (f"{codec.name:<6} encode {elapsed / frames / 1000:8.1f} us/frame  "
+                f"packet {len(packets[0]):5d} B  {kbps:6.1f} kbit/s  "
+                f"saved {100 * (1 - kbps / baseline):5.1f}%")
+        if codec.name == "adpcm":
+            decoded = [decoder.decode(parse_packet(p).payload) for p in packets]
+            snr = sum(snr_db(s, d) for s, d in zip(source, decoded)) / frames
+            line += f"  SNR {snr:5.1f} dB"
+        print(line)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
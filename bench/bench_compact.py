@@ -0,0 +1,149 @@
+# 主机侧基准：紧凑二进制控制消息编码（protocol/compact.py，MessagePack 子集 + 短整数键）与 ujson 的对比。
+# 对一组典型上下行控制消息比较线上字节数与编码/解码耗时，并校验往返一致；
+# 再用一个记录型 websocket 走一遍 WebsocketProtocol 的 hello 协商：服务端接受时切换到紧凑编码，
+# 不认识该编码的服务端则保持 JSON。
+# 用法: python bench/bench_compact.py [次数]
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+import ujson
+from protocol import compact
+from protocol.protocol import WebsocketProtocol
+
+SESSION_ID = "session-24d7eb0a1c3f"
+STATES = [{"name": "Speaker", "state": {"volume": 60, "muted": False}},
+          {"name": "Lamp", "state": {"power": True, "brightness": 80, "color": "warm"}},
+          {"name": "Battery", "state": {"level": 97, "charging": False}},
+          {"name": "Thermometer", "state": {"temperature": 23.5}}]
+
+UPLINK = [
+    ("listen start", {"type": "listen", "state": "start", "mode": "manual"}),
+    ("listen stop", {"type": "listen", "state": "stop"}),
+    ("listen detect", {"type": "listen", "state": "detect", "text": "你好小智"}),
+    ("abort", {"type": "abort", "reason": "wake_word_detected"}),
+    ("iot states", {"type": "iot", "update": True, "states": STATES}),
+    ("iot descriptor", {"type": "iot", "update": True, "descriptors": [{
+        "name": "Speaker", "description": "扬声器，可调节音量与静音",
+        "properties": {"volume": {"description": "当前音量", "type": "int"},
+                       "muted": {"description": "是否静音", "type": "bool"}},
+        "methods": {"SetVolume": {"description": "设置音量",
+                                  "parameters": {"volume": {"description": "音量 0-100", "type": "number"}}}}}]}),
+]
+DOWNLINK = [
+    ("tts start", {"type": "tts", "state": "start"}),
+    ("tts sentence", {"type": "tts", "state": "sentence_start", "text": "好的，已经帮你把音量调到六十。"}),
+    ("stt", {"type": "stt", "text": "把音量调到六十"}),
+    ("llm emotion", {"type": "llm", "emotion": "happy", "text": "😊"}),
+    ("iot command", {"type": "iot", "commands": [{"name": "Speaker", "method": "SetVolume",
+                                                  "parameters": {"volume": 60}}]}),
+    ("tts stop", {"type": "tts", "state": "stop"}),
+]
+
+
+def per_call(fn, arg, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(arg)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def compare(n):
+    print(f"{'消息':16s} {'JSON B':>7s} {'紧凑 B':>7s} {'比例':>6s} {'ujson 编/解 us':>16s} {'紧凑 编/解 us':>16s}")
+    totals = [0, 0]
+    for label, message in UPLINK + DOWNLINK:
+        # JSON 信封每条都带 session_id；紧凑编码由连接隐含会话
+        with_session = dict(message, session_id=SESSION_ID)
+        text = ujson.dumps(with_session)
+        data = compact.encode(message)
+        assert compact.decode(data) == message, label
+        # 设备上的 ujson 直接输出 UTF-8，不转义为 \uXXXX，按此计算 JSON 线上字节
+        json_size = len(json.dumps(with_session, ensure_ascii=False).encode("utf-8"))
+        compact_size = len(data)
+        totals[0] += json_size
+        totals[1] += compact_size
+        json_enc, json_dec = per_call(ujson.dumps, with_session, n), per_call(ujson.loads, text, n)
+        enc, dec = per_call(compact.encode, message, n), per_call(compact.decode, data, n)
+        print(f"{label:16s} {json_size:7d} {compact_size:7d} {compact_size / json_size:6.1%} "
+              f"{json_enc:7.2f}/{json_dec:<7.2f} {enc:7.2f}/{dec:<7.2f}")
+    print(f"{'合计':16s} {totals[0]:7d} {totals[1]:7d} {totals[1] / totals[0]:6.1%}")
+
+
+class CaptureSocket:
+    """只记录发出的帧，回调由测试直接驱动"""
+
+    def __init__(self):
+        self.sent = []
+
+    def connect(self):
+        pass
+
+    def on_message(self, callback):
+        pass
+
+    def on_binary(self, callback):
+        pass
+
+    def on_close(self, callback):
+        pass
+
+    def send(self, message):
+        self.sent.append(message if isinstance(message, str) else bytes(message))
+        return True
+
+    def send_binary(self, data):
+        self.sent.append(bytes(data))
+        return True
+
+
+def negotiate(server_hello):
+    socket = CaptureSocket()
+    protocol = WebsocketProtocol(socket, ping_interval_ms=0, compact_encoding=True)
+    received = {"audio": [], "json": []}
+    protocol.on_incoming_audio(lambda data: received["audio"].append(bytes(data)))
+    protocol.on_incoming_json(received["json"].append)
+    assert protocol.open_audio_channel("ws://stand-in/", {})
+    hello = ujson.loads(socket.sent[0])
+    protocol._on_text(ujson.dumps(server_hello))
+    protocol.send_start_listening("manual")
+    protocol.send_iot_states(STATES)
+    protocol.send_audio(bytearray(b"\xf8\xff\xfe"))
+    return protocol, socket.sent[1:], received, hello
+
+
+def check_negotiation():
+    accept = {"type": "hello", "transport": "websocket", "encoding": compact.ENCODING,
+              "audio_params": {"sample_rate": 24000, "frame_duration": 60}}
+    protocol, sent, received, hello = negotiate(accept)
+    print("hello 提议:", hello)
+    assert protocol.encoding == compact.ENCODING
+    listen, states, audio = sent
+    assert listen[0] == compact.FRAME_MESSAGE and compact.decode(listen[1:]) == {"type": "listen", "state": "start", "mode": "manual"}
+    assert compact.decode(states[1:])["states"] == STATES
+    assert audio == compact.AUDIO_HEADER + b"\xf8\xff\xfe"
+    protocol._on_binary(compact.MESSAGE_HEADER + compact.encode({"type": "tts", "state": "start"}))
+    protocol._on_binary(compact.AUDIO_HEADER + b"\x01\x02")
+    protocol._on_text(ujson.dumps({"type": "stt", "text": "文本帧始终是 JSON"}))
+    assert received["json"] == [{"type": "tts", "state": "start"}, {"type": "stt", "text": "文本帧始终是 JSON"}]
+    assert received["audio"] == [b"\x01\x02"]
+    print(f"服务端接受 {compact.ENCODING}：listen {len(listen)} B，iot states {len(states)} B，音频帧头 1 B")
+
+    protocol, sent, received, _ = negotiate({"type": "hello", "transport": "websocket"})
+    assert protocol.encoding == "json"
+    listen, states, audio = sent
+    assert ujson.loads(listen)["session_id"] == protocol.session_id
+    assert audio == b"\xf8\xff\xfe"
+    protocol._on_binary(b"\x01\x02")
+    assert received["audio"] == [b"\x01\x02"]
+    print(f"服务端未应答编码：回退 JSON，listen {len(listen)} B，iot states {len(states)} B")
+
+
+if __name__ == "__main__":
+    compare(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    check_negotiation()
@@ -0,0 +1,183 @@
+# 主机侧基准：ConnectionManager 的 DNS 缓存、预热连接与断线重连。
+# 本地服务端在握手前人为延迟（模拟服务端/链路 RTT），getaddrinfo 也加入固定延迟（模拟 DNS 查询），
+# 分别测量：冷连接、命中 DNS 缓存的连接、取用预热连接时打开音频通道的耗时；
+# 然后服务端主动断开并停机一段时间，观察带抖动的指数退避重连与重连后的 TTFB；
+# 最后在空闲的预热连接上让服务端断开，检查预热连接被及时丢弃，而不是在 warm_max_age_ms 内一直显示可用。
+# 用法: python bench/bench_connection.py
+import os
+import sys
+import time
+import json
+import socket
+import struct
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+import usocket
+from micropython_websocket_client import WebSocketClient
+from protocol.connection import ConnectionManager, DnsCache
+from protocol.protocol import WebsocketProtocol
+
+DNS_DELAY = 0.04
+HANDSHAKE_DELAY = 0.06
+RESPONSE = (b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: HSmrc0sMlYUkAGmm5OPpG2HaGWk=\r\n\r\n")
+HELLO = json.dumps({"type": "hello", "audio_params": {"sample_rate": 24000, "frame_duration": 60}}).encode()
+
+
+def slow_getaddrinfo(host, port, *args, **kwargs):
+    time.sleep(DNS_DELAY)
+    return socket.getaddrinfo(host, port, *args, **kwargs)
+
+
+usocket.getaddrinfo = slow_getaddrinfo
+
+
+class Server:
+    def __init__(self):
+        self.port = None
+        self.listener = None
+        self.conns = []
+        self.start()
+
+    def start(self):
+        self.listener = socket.socket()
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", self.port or 0))
+        self.listener.listen(8)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.accept_loop, args=(self.listener,), daemon=True).start()
+
+    def stop(self):
+        # 停机：关闭监听与所有连接（对客户端而言是连接被对端断开）
+        try:
+            self.listener.shutdown(socket.SHUT_RDWR)  # 唤醒阻塞在 accept 中的线程
+        except OSError:
+            pass
+        self.listener.close()
+        for conn in self.conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+                conn.close()
+            except OSError:
+                pass
+        self.conns = []
+
+    def accept_loop(self, listener):
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            self.conns.append(conn)
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                request += conn.recv(1024)
+            time.sleep(HANDSHAKE_DELAY)
+            conn.sendall(RESPONSE)
+            while True:
+                head = conn.recv(2)
+                if len(head) < 2:
+                    return
+                n = head[1] & 0x7F
+                if n == 126:
+                    n = struct.unpack(">H", conn.recv(2))[0]
+                mask = conn.recv(4)
+                data = b""
+                while len(data) < n:
+                    data += conn.recv(n - len(data))
+                data = bytes(b ^ mask[i & 3] for i, b in enumerate(data))
+                if head[0] & 0x0F == 1 and b'"hello"' in data:
+                    conn.sendall(struct.pack("!BB", 0x81, len(HELLO)) + HELLO)
+        except OSError:
+            pass
+
+
+def open_channel(protocol, url):
+    hello = threading.Event()
+    protocol.on_incoming_json(lambda data: None)
+
+    def on_hello(data):
+        protocol._parse_server_hello(data)
+        hello.set()
+
+    # hello 经 JSON 类型处理表分发，替换表项即可得知服务端 hello 到达
+    protocol.on_json_message("hello", on_hello)
+    start = time.perf_counter()
+    assert protocol.open_audio_channel(url, {})
+    opened = time.perf_counter()
+    assert hello.wait(2), "没有收到服务端 hello"
+    return (opened - start) * 1000, (time.perf_counter() - start) * 1000
+
+
+def main():
+    server = Server()
+    url = f"ws://localhost:{server.port}/xiaozhi/v1/"
+
+    def factory(u):
+        return WebSocketClient(u, "token", "mac", "uuid")
+
+    # 1) 冷连接：每次都解析 DNS
+    cold = []
+    for _ in range(5):
+        client = factory(url)
+        client.connect()
+        cold.append(client.timings)
+        client.close()
+    print("冷连接:", cold[-1])
+
+    # 2) DNS 缓存 + 预热连接
+    manager = ConnectionManager(url, factory, DnsCache(ttl_ms=60000), min_backoff_ms=200, warm=True)
+    protocol = WebsocketProtocol(None, manager)
+    closed = threading.Event()
+    protocol.on_audio_channel_closed(closed.set)
+    results = {}
+    results["首次打开（冷）"] = open_channel(protocol, url)
+    protocol.close_audio_channel()  # release：关闭并在后台预热下一条连接
+    time.sleep(0.3)
+    results["预热后打开"] = open_channel(protocol, url)
+    protocol.close_audio_channel()
+    time.sleep(0.3)
+    manager.warm = False
+    manager.acquire().close()  # 消耗掉预热连接
+    results["DNS 缓存命中"] = open_channel(protocol, url)
+    for name, (opened, hello) in results.items():
+        print(f"{name:12s} 打开通道 {opened:6.1f} ms，收到服务端 hello {hello:6.1f} ms")
+
+    # 3) 服务端断开并停机 1.2 秒，期间按退避重试，恢复后自动重连
+    down_at = time.perf_counter()
+    server.stop()
+    time.sleep(1.2)
+    server.start()
+    while protocol.websocket is None or not protocol.websocket.connected:
+        if closed.is_set() or time.perf_counter() - down_at > 20:
+            break
+        time.sleep(0.01)
+    print(f"断线到重连成功 {(time.perf_counter() - down_at) * 1000:.0f} ms，重连耗时 {manager.last_timings}")
+    print("统计:", manager.get_stats())
+    assert not closed.is_set(), "重连失败"
+
+    # 4) 空闲的预热连接被服务端断开
+    manager.warm = True
+    protocol.close_audio_channel()
+    while not manager.get_stats()["warm_ready"] and time.perf_counter() - down_at < 30:
+        time.sleep(0.01)
+    assert manager.get_stats()["warm_ready"], "预热失败"
+    dropped_at = time.perf_counter()
+    server.stop()
+    while manager.get_stats()["warm_ready"] and time.perf_counter() - dropped_at < 2:
+        time.sleep(0.01)
+    print(f"预热连接被服务端断开后 {(time.perf_counter() - dropped_at) * 1000:.0f} ms 丢弃")
+    assert not manager.get_stats()["warm_ready"], "断开的预热连接仍显示可用"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# 主机侧基准：permessage-deflate 在真实 IoT 描述符与状态消息上节省的字节数。
+# 用 ThingManager + Protocol 生成与设备一致的 JSON 消息（每个描述符一条、每次状态更新一条），
+# 对比不压缩、不同窗口位数、是否保留上下文时的线上字节数与压缩耗时；
+# 再用 WebSocketClient 连到本地支持 permessage-deflate 的服务端，双向收发并校验内容一致。
+# 用法: python bench/bench_deflate.py
+import os
+import sys
+import time
+import zlib
+import socket
+import struct
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+from iot.things import Thing, ThingManager
+from protocol.protocol import Protocol
+from micropython_websocket_client import WebSocketClient, PerMessageDeflate
+
+UPDATES = 40
+
+
+class CaptureProtocol(Protocol):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def send_text(self, text):
+        self.sent.append(text.encode("utf-8"))
+
+
+def build_manager():
+    values = {"volume": 60, "muted": False, "power": True, "brightness": 80, "color": "warm",
+              "level": 97, "charging": False, "theme": "dark", "rssi": -55, "temperature": 23.5}
+    manager = ThingManager()
+
+    def getter(key):
+        return lambda: values[key]
+
+    specs = [
+        ("Speaker", "扬声器，可调节音量与静音", ["volume", "muted"],
+         [("SetVolume", {"volume": {"description": "音量 0-100", "type": "number"}}, "设置音量")]),
+        ("Lamp", "一个测试用的灯", ["power", "brightness", "color"],
+         [("TurnOn", {}, "打开灯"), ("TurnOff", {}, "关闭灯"),
+          ("SetBrightness", {"brightness": {"description": "亮度 0-100", "type": "number"}}, "设置亮度")]),
+        ("Battery", "电池状态", ["level", "charging"], []),
+        ("Screen", "屏幕，可设置亮度与主题", ["brightness", "theme"],
+         [("SetTheme", {"theme": {"description": "主题名称 light/dark", "type": "string"}}, "设置主题")]),
+        ("Network", "网络状态", ["rssi"], []),
+        ("Thermometer", "室内温度传感器", ["temperature"], []),
+    ]
+    for name, description, props, methods in specs:
+        thing = Thing(name, description)
+        for prop in props:
+            thing.add_property(prop, getter(prop), f"当前{prop}")
+        for method, params, desc in methods:
+            thing.add_method(method, lambda p: None, params, desc)
+        manager.add_thing(thing)
+    return manager, values
+
+
+def capture_messages():
+    manager, values = build_manager()
+    protocol = CaptureProtocol()
+    protocol.send_iot_descriptors(manager.get_descriptors())
+    descriptors = protocol.sent
+    protocol.sent = []
+    states, _ = manager.get_states(delta=False)
+    protocol.send_iot_states(states)
+    for i in range(UPDATES):
+        values["volume"] = (values["volume"] + 5) % 100
+        values["rssi"] = -50 - i % 7
+        if i % 3 == 0:
+            values["power"] = not values["power"]
+        states, changed = manager.get_states(delta=True)
+        if changed:
+            protocol.send_iot_states(states)
+    return descriptors, protocol.sent
+
+
+def wire_size(payload):
+    n = len(payload)
+    return n + (6 if n <= 125 else 8)
+
+
+def measure(messages, compression):
+    total = 0
+    elapsed = 0.0
+    for data in messages:
+        if compression and len(data) >= compression.threshold:
+            t0 = time.perf_counter()
+            data = compression.compress(data)
+            elapsed += time.perf_counter() - t0
+        total += wire_size(data)
+    return total, elapsed
+
+
+def size_table(descriptors, states):
+    print(f"描述符 {len(descriptors)} 条，原始 {sum(map(len, descriptors))} B；"
+          f"状态更新 {len(states)} 条，原始 {sum(map(len, states))} B")
+    base_d, _ = measure(descriptors, None)
+    base_s, _ = measure(states, None)
+    print(f"{'配置':28s} {'描述符':>8s} {'状态':>8s} {'合计':>8s} {'节省':>6s} {'压缩耗时/条':>10s}")
+    print(f"{'不压缩':28s} {base_d:8d} {base_s:8d} {base_d + base_s:8d} {'-':>6s} {'-':>10s}")
+    for bits in (9, 10, 12, 15):
+        for takeover in (False, True):
+            compression = PerMessageDeflate(window_bits=bits, threshold=64, context_takeover=takeover)
+            d, td = measure(descriptors, compression)
+            s, ts = measure(states, compression)
+            label = f"window_bits={bits} {'保留上下文' if takeover else '无上下文'}"
+            saved = 1 - (d + s) / (base_d + base_s)
+            per = (td + ts) / compression.messages * 1e6 if compression.messages else 0
+            print(f"{label:28s} {d:8d} {s:8d} {d + s:8d} {saved:6.1%} {per:8.1f}us")
+
+
+RESPONSE = ("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            "Sec-WebSocket-Accept: HSmrc0sMlYUkAGmm5OPpG2HaGWk=\r\n"
+            "Sec-WebSocket-Extensions: permessage-deflate; server_max_window_bits=10; client_max_window_bits=10\r\n\r\n")
+
+
+def recv_exact(conn, n):
+    data = b""
+    while len(data) < n:
+        chunk = conn.recv(n - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data
+
+
+def deflate_server(count, result):
+    """服务端：保留上下文解压客户端消息，再原样压缩回发"""
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    def run():
+        conn, _ = listener.accept()
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += conn.recv(1024)
+        result["offer"] = [line for line in request.decode().split("\r\n") if "Extensions" in line]
+        conn.sendall(RESPONSE.encode())
+        inflater = zlib.decompressobj(-10)
+        deflater = zlib.compressobj(6, zlib.DEFLATED, -10)
+        received = []
+        for _ in range(count):
+            b0, b1 = recv_exact(conn, 2)
+            n = b1 & 0x7F
+            if n == 126:
+                n = struct.unpack(">H", recv_exact(conn, 2))[0]
+            mask = recv_exact(conn, 4)
+            data = bytes(b ^ mask[i & 3] for i, b in enumerate(recv_exact(conn, n)))
+            if b0 & 0x40:
+                data = inflater.decompress(data + b"\x00\x00\xff\xff")
+            received.append(data)
+            out = deflater.compress(data) + deflater.flush(zlib.Z_SYNC_FLUSH)
+            out = out[:-4]
+            head = struct.pack("!BB", 0xC1, len(out)) if len(out) <= 125 else struct.pack("!BBH", 0xC1, 126, len(out))
+            conn.sendall(head + out)
+        result["received"] = received
+        conn.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def round_trip(messages, compression, label):
+    # 每次连接都是新的服务端：解压上下文从空窗口开始，客户端必须同样从空窗口开始压缩
+    result = {}
+    port = deflate_server(len(messages), result)
+    client = WebSocketClient(f"ws://127.0.0.1:{port}/", "token", "mac", "uuid", compression=compression)
+    client.connect()
+    echoed = []
+    for data in messages:
+        client.send(data.decode("utf-8"))
+        echoed.append(client.recv().encode("utf-8"))
+    client.close()
+    assert client.deflate is compression
+    assert result["received"] == messages, "服务端解压结果不一致"
+    assert echoed == messages, "客户端解压结果不一致"
+    print(f"{label}端到端往返 {len(messages)} 条消息校验通过，客户端发送压缩率 "
+          f"{compression.bytes_out / compression.bytes_in:.1%}（{compression.messages} 条被压缩）")
+    return result["offer"][0]
+
+
+def main():
+    descriptors, states = capture_messages()
+    size_table(descriptors, states)
+    # 同一个 PerMessageDeflate 在重连时复用（WebsocketProtocol.open_audio_channel 再次 connect）
+    compression = PerMessageDeflate(window_bits=10, threshold=64)
+    offer = round_trip(descriptors + states, compression, "")
+    print("握手提议:", offer)
+    assert round_trip(descriptors + states, compression, "重连后") == offer, "重连后的握手提议变化"
+
+
+if __name__ == "__main__":
+    main()
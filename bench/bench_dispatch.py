@@ -0,0 +1,103 @@
+# 主机侧基准：下行消息分发开销。
+# 旧实现对每条消息先 ujson.loads，失败（ValueError）才当作音频，每个音频帧都要付出一次失败解析和异常分配；
+# 新实现由帧操作码决定去向：二进制直接进音频回调，文本才解析 JSON 并按 type 查表分发。
+# 报告每帧/每条消息的平均分发耗时与分配字节数（tracemalloc）。
+# 另外检查畸形下行消息（非对象 JSON、空帧、非 map 的 compact 消息）被丢弃而不是抛出异常：
+# 分发里的异常会让接收线程走关闭流程，断开整条连接。
+# 用法: python bench/bench_dispatch.py [次数]
+import os
+import sys
+import time
+import json
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+import ujson
+from protocol.protocol import WebsocketProtocol
+
+TEXT_MESSAGES = [
+    json.dumps({"type": "tts", "state": "sentence_start", "text": "好的，已经帮你把音量调到六十。"}),
+    json.dumps({"type": "stt", "text": "把音量调到六十"}),
+    json.dumps({"type": "llm", "emotion": "happy", "text": "😊"}),
+    json.dumps({"type": "iot", "commands": [{"name": "Speaker", "method": "SetVolume", "parameters": {"volume": 60}}]}),
+]
+
+
+def legacy_on_message(protocol, message):
+    # 改造前的 WebsocketProtocol._on_message
+    try:
+        data = ujson.loads(message)
+        if "type" in data and data["type"] == "hello":
+            protocol._parse_server_hello(data)
+        elif protocol.on_incoming_json_callback:
+            protocol.on_incoming_json_callback(data)
+        protocol.last_incoming_time = time.ticks_ms()
+    except ValueError:
+        if protocol.on_incoming_audio_callback:
+            protocol.on_incoming_audio_callback(message)
+
+
+def build_protocol():
+    protocol = WebsocketProtocol(None)
+    counts = {"audio": 0, "json": 0, "iot": 0}
+    protocol.on_incoming_audio(lambda data: counts.__setitem__("audio", counts["audio"] + 1))
+    protocol.on_incoming_json(lambda data: counts.__setitem__("json", counts["json"] + 1))
+    protocol.on_json_message("iot", lambda data: counts.__setitem__("iot", counts["iot"] + 1))
+    return protocol, counts
+
+
+def measure(dispatch, messages, n):
+    for message in messages:
+        dispatch(message)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for message in messages:
+            dispatch(message)
+    per = (time.perf_counter() - t0) / (n * len(messages)) * 1e6
+    tracemalloc.start()
+    for _ in range(100):
+        for message in messages:
+            dispatch(message)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per, peak
+
+
+def check_malformed():
+    from protocol.compact import ENCODING, MESSAGE_HEADER, encode_value
+    protocol, counts = build_protocol()
+    for message in ("[1,2]", "5", "null", '"hello"', "{"):
+        protocol._on_text(message)
+    protocol._on_binary(b"")
+    protocol.encoding = ENCODING
+    for frame in (b"", b"\x01\x05", MESSAGE_HEADER + encode_value([1, 2]), MESSAGE_HEADER):
+        protocol._on_binary(frame)
+    assert counts == {"audio": 0, "json": 0, "iot": 0}, counts
+    print("畸形消息均被丢弃")
+
+
+def main(n):
+    check_malformed()
+    frames = [("opus 60ms", os.urandom(180)), ("pcm 24k 60ms", os.urandom(2880))]
+    print(f"{'消息':16s} {'旧: loads+异常':>16s} {'新: 按操作码':>14s} {'加速':>6s} {'旧峰值分配':>10s} {'新峰值分配':>10s}")
+    for label, frame in frames:
+        protocol, counts = build_protocol()
+        old, old_mem = measure(lambda m: legacy_on_message(protocol, m), [frame], n)
+        new, new_mem = measure(protocol._on_binary, [frame], n)
+        assert counts["audio"] == 2 * (n + 101) and counts["json"] == 0
+        print(f"{label:16s} {old:13.2f} us {new:11.2f} us {old / new:5.1f}x {old_mem:8d} B {new_mem:8d} B")
+
+    protocol, counts = build_protocol()
+    old, old_mem = measure(lambda m: legacy_on_message(protocol, m), TEXT_MESSAGES, n)
+    new, new_mem = measure(protocol._on_text, TEXT_MESSAGES, n)
+    # 旧实现把 iot 交给 on_incoming_json，新实现按 type 查表交给 iot 处理函数
+    assert counts["iot"] == n + 101 and counts["json"] == 7 * (n + 101)
+    print(f"{'JSON 文本':16s} {old:13.2f} us {new:11.2f} us {old / new:5.1f}x {old_mem:8d} B {new_mem:8d} B")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
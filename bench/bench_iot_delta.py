@@ -0,0 +1,112 @@
+# 主机侧基准：IoT 状态增量上报（50 个 Thing × 10 个属性）。
+# 旧：每周期调用全部 getter 生成整份状态，整 dict 比较，有变化就重发该 Thing 的完整状态；
+# 轮询：每周期调用全部 getter，但逐属性与上次上报值比较，只发变化的属性；
+# 可观察：属性值由 set_property 写入并自行标脏，周期内只处理脏属性，开销与变化数成正比。
+# 每周期随机改动 k 个属性，报告每周期耗时（含改值、get_states 与序列化发送）和线上字节数，
+# 并校验服务端按增量合并后的状态与设备端一致。
+# 用法: python bench/bench_iot_delta.py [周期数]
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+import ujson
+from iot.things import Thing, ThingManager
+from protocol.protocol import Protocol
+
+THINGS = 50
+PROPERTIES = 10
+
+
+class CaptureProtocol(Protocol):
+    def __init__(self):
+        super().__init__()
+        self.bytes = 0
+        self.view = {}
+
+    def send_text(self, text):
+        # 模拟服务端：把增量合并进每个 Thing 的状态视图
+        self.bytes += len(text.encode("utf-8"))
+        for state in ujson.loads(text)["states"]:
+            self.view.setdefault(state["name"], {}).update(state["state"])
+        return True
+
+
+class LegacyManager(ThingManager):
+    # 改造前的 get_states：整份状态比较，变化则重发完整状态
+    def __init__(self):
+        super().__init__()
+        self.last_states = {}
+
+    def get_states(self, delta=False):
+        states = []
+        changed = False
+        for thing in self.things:
+            state = thing.get_state()
+            if delta:
+                if self.last_states.get(thing.name) == state:
+                    continue
+                changed = True
+            self.last_states[thing.name] = state
+            states.append(state)
+        return states, changed
+
+
+def build(kind):
+    manager = LegacyManager() if kind == "旧" else ThingManager()
+    values = {}
+    for i in range(THINGS):
+        thing = Thing(f"Device{i:02d}", f"测试设备 {i}")
+        for j in range(PROPERTIES):
+            name = f"prop{j}"
+            values[(thing, name)] = j
+            if kind == "可观察":
+                thing.add_observable_property(name, j, f"属性 {j}")
+            else:
+                thing.add_property(name, (lambda key: lambda: values[key])((thing, name)), f"属性 {j}")
+        manager.add_thing(thing)
+
+    def setter(key, value):
+        if kind == "可观察":
+            key[0].set_property(key[1], value)
+        else:
+            values[key] = value
+    return manager, list(values), setter
+
+
+def run(kind, k, cycles):
+    manager, keys, setter = build(kind)
+    protocol = CaptureProtocol()
+    protocol.send_iot_states(manager.get_states(delta=False)[0])
+    protocol.bytes = 0
+    rng = random.Random(k)
+    plan = [[(key, rng.randrange(1000)) for key in rng.sample(keys, k)] for _ in range(cycles)]
+    t0 = time.perf_counter()
+    for changes in plan:
+        for key, value in changes:
+            setter(key, value)
+        states, changed = manager.get_states(delta=True)
+        if changed:
+            protocol.send_iot_states(states)
+    per = (time.perf_counter() - t0) / cycles * 1000
+    full = [thing.get_state() for thing in manager.things]
+    assert protocol.view == {state["name"]: state["state"] for state in full}, kind
+    return per, protocol.bytes // cycles
+
+
+def main(cycles):
+    kinds = ("旧", "轮询", "可观察")
+    print(f"{THINGS} 个 Thing × {PROPERTIES} 个属性，{cycles} 个周期取平均")
+    print(f"{'变化数/周期':>10s} " + " ".join(f"{kind + ' 耗时':>14s} {kind + ' 字节':>10s}" for kind in kinds))
+    for k in (0, 1, 10, 50, 500):
+        row = [run(kind, k, cycles) for kind in kinds]
+        print(f"{k:10d} " + " ".join(f"{per:11.3f} ms {size:10d}" for per, size in row))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
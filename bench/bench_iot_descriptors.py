@@ -0,0 +1,111 @@
+# 主机侧基准：打开音频通道时的 IoT 上报（50 个 Thing），经本地替身服务端（tools/standin_server.py）实测。
+# 旧：每次打开通道都调用全部 getter 推断类型、重新生成并发送全部描述符；
+# 新：描述符按声明类型生成一次并缓存内容哈希，hello 携带哈希；服务端 hello 回带其缓存的哈希，
+#     一致时（重连）只发状态，不一致或服务端没有缓存时（首次连接）才发完整描述符。
+# 报告每次打开的 getter 调用次数、生成与发送 IoT 消息的耗时、上行 IoT 消息条数与长度（取自 get_metrics()，文本按字符计）。
+# 用法: python bench/bench_iot_descriptors.py
+import os
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+
+import standin_server
+from iot.things import Thing, ThingManager
+from micropython_websocket_client import WebSocketClient
+from protocol.protocol import WebsocketProtocol
+
+THINGS = 50
+TYPES = {"power": "bool", "level": "int", "mode": "str", "temperature": "float"}
+
+
+def build_manager(getter_calls, declared):
+    manager = ThingManager()
+    for i in range(THINGS):
+        values = {"power": i % 2 == 0, "level": i, "mode": "auto", "temperature": 20.5 + i % 5}
+        thing = Thing(f"Device{i:02d}", f"测试设备 {i}，带开关、等级、模式和温度")
+        for name in values:
+            def getter(key=name, v=values):
+                getter_calls[0] += 1
+                return v[key]
+            thing.add_property(name, getter, f"当前{name}", TYPES[name] if declared else None)
+        thing.add_method("SetLevel", lambda p: None, {"level": {"description": "等级 0-100", "type": "number"}}, "设置等级")
+        thing.add_method("SetMode", lambda p: None, {"mode": {"description": "模式 auto/manual", "type": "string"}}, "设置模式")
+        manager.add_thing(thing)
+    return manager
+
+
+def legacy_descriptor(thing):
+    # 改造前的 Thing.get_descriptor：每次都调用 getter 推断类型
+    return {
+        "name": thing.name,
+        "description": thing.description,
+        "properties": {name: {"description": prop["description"], "type": type(prop["getter"]()).__name__}
+                       for name, prop in thing.properties.items()},
+        "methods": {name: {"description": method["description"], "parameters": method["parameters"]}
+                    for name, method in thing.methods.items()},
+    }
+
+
+def open_channel(url, manager, getter_calls, legacy):
+    protocol = WebsocketProtocol(WebSocketClient(url, "token", "bench-device", "uuid"), ping_interval_ms=0)
+    done = threading.Event()
+    result = {}
+
+    def on_server_hello():
+        # 与 Application.on_server_hello 相同的上报流程。完整描述符一次突发约 40 KB，
+        # 超过默认发送队列控制消息的上限（2 倍高水位）会被丢弃，这里放大队列以统计完整的上报量
+        protocol.websocket.queue.high_water = 1 << 20
+        getter_calls[0] = 0
+        t0 = time.perf_counter()
+        if legacy:
+            protocol.send_iot_descriptors([legacy_descriptor(thing) for thing in manager.things])
+        elif not protocol.iot_descriptors_known:
+            protocol.send_iot_descriptors(manager.get_descriptors(), manager.get_descriptors_hash())
+        states, _ = manager.get_states(delta=False)
+        protocol.send_iot_states(states)
+        result["ms"] = (time.perf_counter() - t0) * 1000
+        result["getters"] = getter_calls[0]
+        done.set()
+
+    protocol.on_server_hello(on_server_hello)
+    if not legacy:
+        protocol.on_iot_descriptors_hash(manager.get_descriptors_hash)
+    assert protocol.open_audio_channel(url, {}), "打开音频通道失败"
+    assert done.wait(5), "没有收到服务端 hello"
+    time.sleep(0.05)  # 让发送队列排空
+    iot = protocol.get_metrics()["out"]["iot"]
+    protocol.close_audio_channel()
+    return result["getters"], result["ms"], iot["messages"], iot["bytes"]
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    ws_server, server = asyncio.run_coroutine_threadsafe(standin_server.serve("127.0.0.1", 0), loop).result()
+    url = "ws://127.0.0.1:%d/" % ws_server.sockets[0].getsockname()[1]
+
+    print(f"{THINGS} 个 Thing（各 4 个属性、2 个方法），每次打开音频通道的 IoT 上报")
+    print(f"{'场景':14s} {'getter 调用':>10s} {'耗时':>10s} {'消息':>5s} {'上行长度':>9s}")
+    getter_calls = [0]
+    rows = []
+    manager = build_manager(getter_calls, declared=False)
+    for label in ("旧 首次连接", "旧 重连"):
+        rows.append((label, open_channel(url, manager, getter_calls, legacy=True)))
+    manager = build_manager(getter_calls, declared=True)
+    for label in ("新 首次连接", "新 重连", "新 再次重连"):
+        rows.append((label, open_channel(url, manager, getter_calls, legacy=False)))
+    for label, (getters, ms, messages, size) in rows:
+        print(f"{label:14s} {getters:10d} {ms:7.2f} ms {messages:5d} {size:9d}")
+    # 重连时服务端哈希一致，只发状态
+    assert rows[3][1][2:] == rows[4][1][2:] and rows[3][1][3] < rows[2][1][3]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# 主机侧基准：IoT 描述符/状态从 ThingManager 到线上文本的序列化开销（50 个 Thing）。
+# 旧路径：Thing dumps -> ThingManager loads 再 dumps 整个列表 -> Protocol 再 loads，每个描述符单独 dumps 一条消息；
+# 新路径：全程传递原生 dict，在发送边界每项只 dumps 一次，并按 iot_batch_size 打包成批。
+# 报告每次完整上报（描述符 + 状态）的耗时、ujson 调用次数与经手的字符数、tracemalloc 峰值，以及消息条数和字节数。
+# 用法: python bench/bench_iot_serialize.py [轮数]
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+import ujson
+from iot.things import Thing, ThingManager
+from protocol.protocol import Protocol
+
+THINGS = 50
+
+
+class CaptureProtocol(Protocol):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def send_text(self, text):
+        self.sent.append(text)
+
+
+class CountingJson:
+    """包装 ujson.dumps/loads，统计调用次数和经手字符数（中间字符串即堆上的临时分配）"""
+
+    def __init__(self):
+        self.dumps_calls = self.loads_calls = self.chars = 0
+        self._dumps, self._loads = ujson.dumps, ujson.loads
+
+    def dumps(self, obj):
+        text = self._dumps(obj)
+        self.dumps_calls += 1
+        self.chars += len(text)
+        return text
+
+    def loads(self, text):
+        self.loads_calls += 1
+        self.chars += len(text)
+        return self._loads(text)
+
+    def install(self):
+        ujson.dumps, ujson.loads = self.dumps, self.loads
+
+    def uninstall(self):
+        ujson.dumps, ujson.loads = self._dumps, self._loads
+
+
+def build_manager():
+    manager = ThingManager()
+    for i in range(THINGS):
+        values = {"power": i % 2 == 0, "level": i, "mode": "auto", "temperature": 20.5 + i % 5}
+        thing = Thing(f"Device{i:02d}", f"测试设备 {i}，带开关、等级、模式和温度")
+        for name in values:
+            thing.add_property(name, (lambda key, v=values: lambda: v[key])(name), f"当前{name}")
+        thing.add_method("SetLevel", lambda p: None, {"level": {"description": "等级 0-100", "type": "number"}}, "设置等级")
+        thing.add_method("SetMode", lambda p: None, {"mode": {"description": "模式 auto/manual", "type": "string"}}, "设置模式")
+        manager.add_thing(thing)
+    return manager
+
+
+def legacy_report(manager, protocol):
+    # 改造前：ThingManager.get_descriptors_json / get_states_json + Protocol.send_iot_descriptors / send_iot_states
+    descriptors = ujson.dumps([ujson.loads(ujson.dumps(thing.get_descriptor())) for thing in manager.things])
+    for descriptor in ujson.loads(descriptors):
+        protocol.send_text(ujson.dumps({"session_id": protocol.session_id, "type": "iot", "update": True,
+                                        "descriptors": [descriptor]}))
+    states = ujson.dumps([ujson.loads(ujson.dumps(thing.get_state())) for thing in manager.things])
+    protocol.send_text(ujson.dumps({"session_id": protocol.session_id, "type": "iot", "update": True,
+                                    "states": ujson.loads(states)}))
+
+
+def native_report(manager, protocol):
+    protocol.send_iot_descriptors(manager.get_descriptors())
+    states, _ = manager.get_states(delta=False)
+    protocol.send_iot_states(states)
+
+
+def measure(label, report, rounds):
+    manager = build_manager()
+    protocol = CaptureProtocol()
+    report(manager, protocol)
+    messages = len(protocol.sent)
+    wire = sum(len(text.encode("utf-8")) for text in protocol.sent)
+    longest = max(len(text) for text in protocol.sent)
+    decoded = [ujson.loads(text) for text in protocol.sent]
+
+    counter = CountingJson()
+    counter.install()
+    protocol.sent = []
+    report(manager, protocol)
+    counter.uninstall()
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        protocol.sent = []
+        report(manager, protocol)
+    per = (time.perf_counter() - t0) / rounds * 1000
+
+    protocol.sent = []
+    tracemalloc.start()
+    report(manager, protocol)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:8s} {per:8.2f} ms {counter.dumps_calls:6d} {counter.loads_calls:6d} {counter.chars:9d} "
+          f"{peak / 1024:8.1f} KiB {messages:6d} {wire:9d} {longest:8d}")
+    return decoded
+
+
+def flatten(messages, key):
+    return [item for message in messages for item in message.get(key, [])]
+
+
+def main(rounds):
+    print(f"{THINGS} 个 Thing，每轮上报全部描述符和状态，{rounds} 轮取平均")
+    print(f"{'路径':8s} {'耗时/轮':>11s} {'dumps':>6s} {'loads':>6s} {'经手字符':>9s} {'峰值分配':>12s} "
+          f"{'消息':>6s} {'线上字节':>9s} {'最长消息':>8s}")
+    old = measure("旧", legacy_report, rounds)
+    new = measure("新", native_report, rounds)
+    # 两种路径上报的内容必须一致
+    for key in ("descriptors", "states"):
+        assert flatten(old, key) == flatten(new, key), key
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
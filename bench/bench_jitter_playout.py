@@ -0,0 +1,113 @@
+# 主机侧验证：模拟网络抖动/突发到达的下行帧，经 JitterBuffer + PlayoutScheduler 写入模拟 I2S TX，
+# 观察缓冲深度、自适应目标深度、欠载、迟到/积压丢帧与播放节拍。
+# 开始前先用确定性的时间线验证迟到丢帧：播放中网络卡顿 3 帧，缓冲吸收不了的帧到达时播放时刻已由补偿占用，
+# 应按迟到丢弃，之后的帧照常播放，缓冲深度（即播放时延）不因卡顿而增加。
+# 用法: python bench/bench_jitter_playout.py [秒数] [最大网络抖动ms] [服务端采样率]
+import os
+import sys
+import time
+import random
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from audio.jitter import JitterBuffer, PlayoutScheduler
+from audio.resampler import Resampler
+
+FRAME_MS = 60
+OUTPUT_RATE = 16000
+
+
+class FakeSink:
+    """记录写入量的 I2S TX 模拟（不阻塞，节拍由 PlayoutScheduler 的 FrameClock 提供）"""
+
+    def __init__(self):
+        self.samples = 0
+        self.writes = 0
+
+    def write(self, buf):
+        self.samples += len(buf)
+        self.writes += 1
+        return len(buf) * 2
+
+
+def sender(jitter, rate, seconds, max_jitter_ms, stop):
+    frame = bytes(rate * FRAME_MS // 1000 * 2)
+    start = time.monotonic()
+    sent = 0
+    pending = []
+    while time.monotonic() - start < seconds and not stop.is_set():
+        due = start + sent * FRAME_MS / 1000
+        # 每帧附加随机网络时延，偶尔出现一次大的卡顿造成突发到达
+        delay = random.uniform(0, max_jitter_ms) / 1000
+        if random.random() < 0.02:
+            delay += 4 * max_jitter_ms / 1000
+        pending.append(due + delay)
+        sent += 1
+        pending.sort()
+        now = time.monotonic()
+        while pending and pending[0] <= now:
+            pending.pop(0)
+            jitter.push(frame, int(now * 1000))
+        time.sleep(0.005)
+    return sent
+
+
+def check_late_drops(stall_frames=3):
+    # 与应用相同的用法：push(data, ticks_ms())，不带序号
+    jitter = JitterBuffer(FRAME_MS, 16)
+    frame = bytes(16)
+    arrivals = []
+    for i in range(40):
+        delay = stall_frames * FRAME_MS if 20 <= i < 20 + stall_frames else 0
+        arrivals.append(i * FRAME_MS + delay)
+    arrivals.sort()
+    depths = {}
+    played = []
+    # 每帧时长节拍：先放入这一刻之前到达的帧，再取一帧播放
+    for tick in range(45):
+        while arrivals and arrivals[0] <= tick * FRAME_MS:
+            jitter.push(frame, arrivals.pop(0))
+        depths[tick] = jitter.depth
+        played.append(jitter.pop() is not None)
+    first = played.index(True)
+    last = len(played) - 1 - played[::-1].index(True)
+    missed = played[first:last].count(False)
+    stats = jitter.get_stats()
+    print(f"卡顿 {stall_frames} 帧: 补偿 {missed} 个节拍，late_drops {stats['late_drops']}，"
+          f"播放 {sum(played)} 帧，深度 卡顿前 {depths[19]} / 卡顿后 {depths[35]}")
+    # 缓冲吸收不了的部分由补偿占位，对应的帧到达后按迟到丢弃，时延不因卡顿而增加
+    assert missed > 0 and stats["late_drops"] == missed
+    assert sum(played) == 40 - missed
+    assert depths[35] <= depths[19]
+
+
+def main(seconds=10.0, max_jitter_ms=40, rate=24000):
+    check_late_drops()
+    frame_bytes = rate * FRAME_MS // 1000 * 2
+    jitter = JitterBuffer(FRAME_MS, frame_bytes)
+    resampler = Resampler(rate, OUTPUT_RATE, max_block=frame_bytes // 2) if rate != OUTPUT_RATE else None
+    sink = FakeSink()
+    playout = PlayoutScheduler(jitter, sink, rate, resampler)
+    playout.start()
+
+    stop = threading.Event()
+    thread = threading.Thread(target=sender, args=(jitter, rate, seconds, max_jitter_ms, stop), daemon=True)
+    thread.start()
+    for _ in range(int(seconds)):
+        time.sleep(1)
+        stats = playout.get_stats()
+        print({k: stats[k] for k in ("depth", "target", "jitter_ms", "played", "underruns",
+                                     "concealed", "overflow_drops", "late_drops")})
+    stop.set()
+    thread.join()
+    playout.stop()
+    playout.join()
+    print("final:", playout.get_stats())
+    print(f"sink: {sink.writes} writes, {sink.samples / OUTPUT_RATE:.2f}s of {OUTPUT_RATE}Hz audio")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 10.0,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 40,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 24000)
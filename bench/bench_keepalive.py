@@ -0,0 +1,113 @@
+# 主机侧验证：WebsocketProtocol / AsyncWebsocketProtocol 的 ping/pong 保活与 RTT 统计。
+# 本地服务端按设定的延迟回 pong（模拟链路 RTT 与抖动），运行一段时间后停止回应（模拟对端失联但 TCP 未断），
+# 报告 RTT 直方图，以及从失联到协议判定连接失效的时间（原来只能等 120 秒的 is_timeout）。
+# 用法: python bench/bench_keepalive.py [ping间隔ms]
+import os
+import sys
+import time
+import random
+import socket
+import struct
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+from micropython_websocket_client import WebSocketClient
+from async_websocket_client import AsyncWebSocketClient
+from protocol.protocol import WebsocketProtocol, AsyncWebsocketProtocol
+
+RESPONSE = (b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: HSmrc0sMlYUkAGmm5OPpG2HaGWk=\r\n\r\n")
+BASE_RTT = 0.03
+JITTER = 0.02
+
+
+class PongServer:
+    def __init__(self):
+        self.answering = True
+        self.listener = socket.socket()
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(4)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    def accept_loop(self):
+        while True:
+            conn, _ = self.listener.accept()
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def recv_exact(self, conn, n):
+        data = b""
+        while len(data) < n:
+            chunk = conn.recv(n - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    def handle(self, conn):
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                request += conn.recv(1024)
+            conn.sendall(RESPONSE)
+            while True:
+                b0, b1 = self.recv_exact(conn, 2)
+                n = b1 & 0x7F
+                if n == 126:
+                    n = struct.unpack(">H", self.recv_exact(conn, 2))[0]
+                mask = self.recv_exact(conn, 4)
+                data = bytes(b ^ mask[i & 3] for i, b in enumerate(self.recv_exact(conn, n)))
+                if b0 & 0x0F == 0x9 and self.answering:
+                    delay = BASE_RTT + random.random() * JITTER
+                    threading.Timer(delay, conn.sendall, (struct.pack("!BB", 0x8A, len(data)) + data,)).start()
+        except (EOFError, OSError):
+            pass
+
+
+def report(name, protocol, lost_at, closed_at):
+    stats = protocol.get_rtt_stats()
+    print(f"[{name}] RTT 样本 {stats['samples']}，srtt {stats['srtt_ms']} ms，rttvar {stats['rttvar_ms']} ms，"
+          f"min/max {stats['min_ms']}/{stats['max_ms']} ms，p50<={stats['p50_ms']} p90<={stats['p90_ms']}")
+    print(f"[{name}] 直方图 {stats['histogram']}")
+    print(f"[{name}] 对端失联 {(closed_at - lost_at) * 1000:.0f} ms 后判定连接失效（missed={stats['missed']}）")
+
+
+def run_sync(interval_ms, seconds):
+    server = PongServer()
+    client = WebSocketClient(f"ws://127.0.0.1:{server.port}/", "token", "mac", "uuid")
+    protocol = WebsocketProtocol(client, ping_interval_ms=interval_ms, max_missed_pongs=2)
+    closed = threading.Event()
+    protocol.on_audio_channel_closed(closed.set)
+    assert protocol.open_audio_channel(client.url, {})
+    time.sleep(seconds)
+    server.answering = False
+    lost_at = time.perf_counter()
+    closed.wait(10 * interval_ms / 1000)
+    report("sync", protocol, lost_at, time.perf_counter())
+    assert closed.is_set() and protocol.is_timeout()
+
+
+async def run_async(interval_ms, seconds):
+    server = PongServer()
+    client = AsyncWebSocketClient(f"ws://127.0.0.1:{server.port}/", "token", "mac", "uuid")
+    protocol = AsyncWebsocketProtocol(client, ping_interval_ms=interval_ms, max_missed_pongs=2)
+    closed = asyncio.Event()
+    protocol.on_audio_channel_closed(closed.set)
+    assert await protocol.open_audio_channel(client.url, {})
+    await asyncio.sleep(seconds)
+    server.answering = False
+    lost_at = time.perf_counter()
+    await asyncio.wait_for(closed.wait(), 10 * interval_ms / 1000)
+    report("async", protocol, lost_at, time.perf_counter())
+
+
+if __name__ == "__main__":
+    interval = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    run_sync(interval, 3)
+    asyncio.run(run_async(interval, 3))
@@ -0,0 +1,68 @@
+# 主机侧基准：Protocol 流量计数与回调耗时直方图的开销。
+# 对比下行音频帧/JSON 消息在“直接调用回调”与“经 _on_binary/_on_text 分发（计数 + 计时）”下的每条耗时，
+# 并用 tracemalloc 确认预热后记录指标不再分配内存（计数器与直方图都是预分配的列表）；
+# 最后打印 get_metrics() 快照及其 JSON 长度（可作为 IoT 状态上报或串口输出）。
+# 用法: python bench/bench_metrics.py [次数]
+import os
+import sys
+import json
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+from protocol.protocol import WebsocketProtocol
+from protocol.metrics import ProtocolMetrics
+
+TTS_MESSAGE = json.dumps({"type": "tts", "state": "sentence_start", "text": "好的，已经帮你把音量调到六十。"})
+
+
+def per_call_us(fn, arg, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(arg)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def metrics_alloc(n):
+    # 只测指标记录本身：计数与直方图写入（small int 不分配）
+    metrics = ProtocolMetrics()
+    metrics.count_in(0, 180)
+    metrics.audio_callback.record(120)
+    tracemalloc.start()
+    for i in range(n):
+        metrics.count_in(0, 180)
+        metrics.audio_callback.record(i & 0xFFF)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(n):
+    protocol = WebsocketProtocol(None)
+    protocol.on_incoming_audio(lambda data: None)
+    protocol.on_incoming_json(lambda data: None)
+    frame = os.urandom(180)
+
+    direct = per_call_us(protocol.on_incoming_audio_callback, frame, n)
+    dispatched = per_call_us(protocol._on_binary, frame, n)
+    print(f"音频帧   直接回调 {direct:6.2f} us   _on_binary {dispatched:6.2f} us   指标开销 {dispatched - direct:5.2f} us/帧")
+
+    parse = per_call_us(json.loads, TTS_MESSAGE, n)
+    dispatched = per_call_us(protocol._on_text, TTS_MESSAGE, n)
+    print(f"JSON     仅解析   {parse:6.2f} us   _on_text   {dispatched:6.2f} us")
+
+    print(f"记录 {n} 次指标的峰值分配: {metrics_alloc(n)} B")
+
+    snapshot = protocol.get_metrics()
+    assert snapshot["in"]["audio"]["messages"] == n and snapshot["in"]["tts"]["messages"] == n
+    text = json.dumps(snapshot, ensure_ascii=False)
+    print(f"get_metrics() 快照 {len(text)} 字节:")
+    print(text)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,86 @@
+# 主机侧基准：各采样率组合下每块重采样耗时，以及相对实时的占用比例；
+# 并检查频率响应：通带 1kHz 增益接近 0dB，降采样时输出奈奎斯特以上 2kHz 的单音（会混叠回通带）
+# 整体输出被压到 STOPBAND_DB 以下，升采样时 1kHz 的镜像（rate_in - 1kHz）同样被压到 STOPBAND_DB 以下。
+# 用法: python bench/bench_resampler.py [块时长ms] [块数]
+import os
+import sys
+import math
+import time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from audio.resampler import Resampler
+
+PAIRS = ((16000, 24000), (24000, 16000), (16000, 48000), (48000, 16000))
+AMPLITUDE = 16000
+STOPBAND_DB = -50
+
+
+def tone(rate, freq, count):
+    return array('h', (int(AMPLITUDE * math.sin(2 * math.pi * freq * i / rate)) for i in range(count)))
+
+
+def resample_tone(rate_in, rate_out, freq):
+    # 先送入 1 秒单音建立滤波器历史，再取第二秒输出的后 3/4
+    resampler = Resampler(rate_in, rate_out, max_block=rate_in)
+    out = array('h', (0 for _ in range(resampler.max_output(rate_in))))
+    resampler.process(tone(rate_in, freq, rate_in), rate_in, out)
+    produced = resampler.process(tone(rate_in, freq, rate_in), rate_in, out)
+    return out[produced // 4:produced]
+
+
+def db(value):
+    return 20 * math.log10(max(value, 1e-9) / (AMPLITUDE / math.sqrt(2)))
+
+
+def rms(samples):
+    return math.sqrt(sum(x * x for x in samples) / len(samples))
+
+
+def tone_level(samples, rate, freq):
+    # Goertzel：samples 中 freq 分量的有效值
+    coeff = 2 * math.cos(2 * math.pi * freq / rate)
+    s1 = s2 = 0.0
+    for x in samples:
+        s1, s2 = x + coeff * s1 - s2, s1
+    power = s1 * s1 + s2 * s2 - coeff * s1 * s2
+    return math.sqrt(max(power, 0)) * math.sqrt(2) / len(samples)
+
+
+def check_response(rate_in, rate_out):
+    passband = db(tone_level(resample_tone(rate_in, rate_out, 1000), rate_out, 1000))
+    if rate_out < rate_in:
+        freq = rate_out // 2 + 2000
+        reject = db(rms(resample_tone(rate_in, rate_out, freq)))
+        label = f"{freq} Hz 混叠"
+    else:
+        freq = rate_in - 1000
+        reject = db(tone_level(resample_tone(rate_in, rate_out, 1000), rate_out, freq))
+        label = f"{freq} Hz 镜像"
+    print(f"{rate_in:>5} -> {rate_out:<5} 通带 1000 Hz {passband:6.1f} dB  {label} {reject:6.1f} dB")
+    assert passband > -1, "通带衰减过大"
+    assert reject < STOPBAND_DB, "阻带衰减不足"
+
+
+def main(block_ms=32, blocks=200):
+    for rate_in, rate_out in PAIRS:
+        check_response(rate_in, rate_out)
+    for rate_in, rate_out in PAIRS:
+        count = rate_in * block_ms // 1000
+        resampler = Resampler(rate_in, rate_out, max_block=count)
+        source = tone(rate_in, 440, count)
+        out = array('h', (0 for _ in range(resampler.max_output(count))))
+        produced = 0
+        start = time.perf_counter_ns()
+        for _ in range(blocks):
+            produced += resampler.process(source, count, out)
+        elapsed = time.perf_counter_ns() - start
+        per_block_us = elapsed / blocks / 1000
+        print(f"{rate_in:>5} -> {rate_out:<5} {count:5d} -> {produced // blocks:5d} samples/block  {resampler.taps:2d} taps  "
+              f"{per_block_us:8.1f} us/block  {100 * per_block_us / (block_ms * 1000):5.1f}% realtime")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 32,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,188 @@
+# 主机侧基准：发送队列的优先级、背压与小帧合并。
+# 1) 直接对 SendQueue + FrameWriter：一次 send_iot_descriptors 式的突发（每个描述符一条消息）
+#    对比逐帧写与合并写的 socket 写次数，并检查通道优先级顺序；
+# 2) 阻塞版 WebSocketClient 连到限速的本地服务端（接收端只有音频码率的一半带宽），
+#    采集节奏发送音频并穿插 IoT 消息，观察背压、丢帧、停滞时间，并校验服务端收到的音频序号单调递增。
+# 3) 每个音频帧经队列发送的拷贝开销：直接 FrameWriter.send_frame（bench_ws_send 的路径，拷贝一次并加掩码）
+#    对比经 SendQueue 入队拷贝（默认）与移交所有权不拷贝（copy=False）后再由 send_frames 写出。
+# 用法: python bench/bench_send_queue.py [秒数]
+import os
+import sys
+import time
+import json
+import socket
+import struct
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+from micropython_websocket_client import (WebSocketClient, FrameWriter, SendQueue, OP_TEXT, OP_BINARY, OP_PONG,
+                                          LANE_PROTOCOL, LANE_AUDIO, LANE_CONTROL)
+from protocol.protocol import WebsocketProtocol
+
+FRAME_MS = 60
+RESPONSE = (b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: HSmrc0sMlYUkAGmm5OPpG2HaGWk=\r\n\r\n")
+
+
+class CountingSink:
+    def __init__(self):
+        self.writes = 0
+        self.data = bytearray()
+
+    def write(self, data):
+        self.writes += 1
+        self.data += data
+
+
+def parse_frames(data):
+    frames = []
+    i = 0
+    while i < len(data):
+        opcode = data[i] & 0x0F
+        n = data[i + 1] & 0x7F
+        i += 2
+        if n == 126:
+            n = struct.unpack(">H", data[i:i + 2])[0]
+            i += 2
+        mask = data[i:i + 4]
+        i += 4
+        frames.append((opcode, bytes(data[i + k] ^ mask[k & 3] for k in range(n))))
+        i += n
+    return frames
+
+
+def descriptor_burst():
+    descriptors = [{"name": "Thing%d" % i, "description": "x" * 80, "properties": {}, "methods": {}}
+                   for i in range(12)]
+    messages = [json.dumps({"session_id": "s", "type": "iot", "update": True, "descriptors": [d]})
+                for d in descriptors]
+
+    direct = CountingSink()
+    writer = FrameWriter(direct)
+    for m in messages:
+        writer.send_frame(OP_TEXT, m.encode())
+
+    queue = SendQueue()
+    coalesced = CountingSink()
+    writer = FrameWriter(coalesced)
+    for m in messages:
+        queue.put(OP_TEXT, m.encode(), LANE_CONTROL)
+    while True:
+        batch = queue.get_batch()
+        if not batch:
+            break
+        writer.send_frames(batch)
+    assert parse_frames(coalesced.data) == parse_frames(direct.data) == [(OP_TEXT, m.encode()) for m in messages]
+    print(f"描述符突发 {len(messages)} 条：逐帧写 {direct.writes} 次，合并写 {coalesced.writes} 次")
+
+    # 优先级：后入队的 pong 与音频先于已排队的控制消息发出
+    queue = SendQueue()
+    queue.put(OP_TEXT, b"ctl-1", LANE_CONTROL)
+    queue.put(OP_BINARY, b"audio-1", LANE_AUDIO)
+    queue.put(OP_TEXT, b"ctl-2", LANE_CONTROL)
+    queue.put(OP_PONG, b"", LANE_PROTOCOL)
+    queue.put(OP_BINARY, b"audio-2", LANE_AUDIO)
+    order = [data for _, data in queue.get_batch()]
+    assert order == [b"", b"audio-1", b"audio-2", b"ctl-1", b"ctl-2"], order
+    print("出队顺序:", order)
+
+
+def throttled_server(rate_bytes_per_s, result):
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    def run():
+        conn, _ = listener.accept()
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += conn.recv(1024)
+        conn.sendall(RESPONSE)
+        data = bytearray()
+        chunk = 512
+        while True:
+            try:
+                got = conn.recv(chunk)
+            except OSError:
+                break
+            if not got:
+                break
+            data += got
+            time.sleep(len(got) / rate_bytes_per_s)
+        result["frames"] = parse_frames(data)
+        conn.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return listener.getsockname()[1], thread
+
+
+def live(seconds):
+    frame_bytes = 16000 * FRAME_MS // 1000 * 2
+    result = {}
+    port, server = throttled_server(frame_bytes * 1000 // FRAME_MS // 2, result)
+    client = WebSocketClient(f"ws://127.0.0.1:{port}/", "token", "mac", "uuid")
+    client.connect()
+    client.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    protocol = WebsocketProtocol(client)
+    changes = []
+    client.queue.on_backpressure = lambda active: changes.append(active)
+
+    payload = bytearray(frame_bytes)
+    sent = dropped = 0
+    deadline = time.monotonic() + seconds
+    seq = 0
+    while time.monotonic() < deadline:
+        struct.pack_into(">I", payload, 0, seq)
+        if protocol.send_audio(payload):
+            sent += 1
+        else:
+            dropped += 1
+        seq += 1
+        if seq % 20 == 0:
+            protocol.send_iot_states([{"name": "Lamp", "state": {"power": seq % 40 == 0}}])
+        time.sleep(FRAME_MS / 1000)
+    stats = client.get_send_stats()
+    client.close()
+    server.join(30)
+
+    frames = result.get("frames", [])
+    audio = [struct.unpack(">I", data[:4])[0] for opcode, data in frames if opcode == OP_BINARY]
+    texts = [data for opcode, data in frames if opcode == OP_TEXT]
+    assert audio == sorted(audio), "音频帧乱序"
+    print(f"限速链路 {seconds:.0f}s：音频入队 {sent}，背压丢弃 {dropped}，服务端收到音频 {len(audio)}、IoT {len(texts)}")
+    print(f"背压切换 {changes[:6]}{'...' if len(changes) > 6 else ''}")
+    print("队列统计:", stats)
+    print(f"写次数 {client.writer.writes}，帧数 {client.writer.frames}")
+
+
+def copy_cost(count=3000):
+    print(f"{'音频帧':>8s} {'直接 send_frame':>16s} {'队列 拷贝':>12s} {'队列 copy=False':>16s}")
+    for size in (180, 960, 1920):
+        frames = [bytearray(os.urandom(size)) for _ in range(count)]
+        writer = FrameWriter(None, write=lambda data: None)
+        t0 = time.perf_counter()
+        for frame in frames:
+            writer.send_frame(OP_BINARY, frame)
+        direct = (time.perf_counter() - t0) / count * 1e6
+        results = []
+        for copy in (True, False):
+            queue = SendQueue(high_water=1 << 30)
+            t0 = time.perf_counter()
+            for frame in frames:
+                queue.put(OP_BINARY, frame, LANE_AUDIO, copy=copy)
+                writer.send_frames(queue.get_batch())
+            results.append((time.perf_counter() - t0) / count * 1e6)
+        print(f"{size:6d} B {direct:13.2f} us {results[0]:9.2f} us {results[1]:13.2f} us")
+
+
+if __name__ == "__main__":
+    copy_cost()
+    descriptor_burst()
+    live(float(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,94 @@
+# 单机流健康度基准：若干模拟设备按帧节拍向本地参考接收端发送 v2 数据包，
+# 注入丢包、乱序与随机时延，核对接收端统计的丢包/乱序/抖动/时延。
+# 另外检查设备重启（序号从 0 重新开始）被识别为新的一段流，而不是记成乱序或重复。
+# 用法: python bench/bench_stream_health.py [设备数] [秒数]
+import os
+import sys
+import time
+import random
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from audio.packet import PacketBuilder, PACKET_VERSION_STREAM
+from tools.audio_receiver import serve, AudioReceiver
+
+FRAME_MS = 32
+PAYLOAD = 1024
+LOSS = 0.02
+REORDER = 0.01
+MAX_DELAY_MS = 15
+
+
+def _now_ms():
+    return time.monotonic_ns() // 1000000
+
+
+async def device(index, addr, seconds, injected):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=addr)
+    builder = PacketBuilder("bench-%04d" % index, PAYLOAD, version=PACKET_VERSION_STREAM)
+    held = None
+    start = loop.time()
+    frame = 0
+    while loop.time() - start < seconds:
+        packet = bytes(builder.finish(PAYLOAD, _now_ms()))
+        frame += 1
+        if random.random() < LOSS:
+            injected["lost"] += 1
+        elif held is None and random.random() < REORDER:
+            held = packet  # 延后一帧发送，制造乱序
+            injected["reordered"] += 1
+        else:
+            delay = random.uniform(0, MAX_DELAY_MS) / 1000
+            loop.call_later(delay, transport.sendto, packet)
+            if held is not None:
+                loop.call_later(delay + 0.001, transport.sendto, held)
+                held = None
+        await asyncio.sleep(max(0, start + frame * FRAME_MS / 1000 - loop.time()))
+    await asyncio.sleep(0.1)
+    transport.close()
+
+
+def check_restart():
+    receiver = AudioReceiver(clock=_now_ms)
+    # 短流（序号仍在去重窗口内）与长流（序号远超去重窗口）各重启一次
+    for frames in (50, 3000):
+        tick = 1000
+        for _ in range(2):
+            builder = PacketBuilder("restart-%d" % frames, 16, version=PACKET_VERSION_STREAM)
+            for _ in range(frames):
+                receiver.datagram_received(bytes(builder.finish(16, tick)), None)
+                tick += FRAME_MS
+            tick = 5  # 重启后 ticks 从头开始
+    for device_id, report in receiver.report().items():
+        print(f"{device_id}: 重启 {report['restarts']}，乱序 {report['reordered']}，重复 {report['duplicates']}，"
+              f"丢包 {report['lost']}，收到 {report['received']}")
+        assert report["restarts"] == 1 and report["reordered"] == 0 and report["duplicates"] == 0
+        assert report["lost"] == 0
+
+
+async def main(devices, seconds):
+    check_restart()
+    transport, receiver = await serve("127.0.0.1", 0)
+    addr = transport.get_extra_info("sockname")
+    injected = {"lost": 0, "reordered": 0}
+    await asyncio.gather(*(device(i, addr, seconds, injected) for i in range(devices)))
+    transport.close()
+
+    totals = {"received": 0, "lost": 0, "reordered": 0}
+    worst_p99 = 0
+    jitter = 0.0
+    for report in receiver.report().values():
+        for key in totals:
+            totals[key] += report[key]
+        worst_p99 = max(worst_p99, report["latency_p99_ms"])
+        jitter += report["jitter_ms"]
+    print(f"{devices} 设备 x {seconds}s: 注入 丢包 {injected['lost']} 乱序 {injected['reordered']}")
+    print(f"接收端统计: {totals}, 平均抖动 {jitter / max(1, devices):.2f}ms, 最差 p99 时延 <= {worst_p99}ms")
+    print("示例设备:", next(iter(receiver.report().items())))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 5))
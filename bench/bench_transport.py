@@ -0,0 +1,147 @@
+# 主机侧对比：WebsocketProtocol（TCP）与 MqttUdpProtocol（MQTT 控制 + AES-CTR 加密 UDP 音频）。
+# 两个本地替身服务端都把上行音频帧原样回发，设备侧按 60ms 节奏发送带序号的帧，测量：
+#   打开音频通道耗时、音频帧往返时延分位数、listen stop 到首个下行 TTS 帧的响应时延；
+# 最后让 UDP 替身按比例丢弃下行帧，验证丢包只计入 lost、不会拖慢后续帧（TCP 上同样的丢包会造成队头阻塞，
+# 本机回环无法注入 TCP 丢包，这一项只测 UDP 侧）。
+# 用法: python bench/bench_transport.py [帧数]
+import os
+import sys
+import time
+import struct
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+
+import standin_server
+import mqtt_udp_standin
+from micropython_websocket_client import WebSocketClient
+from protocol.protocol import WebsocketProtocol
+from protocol.mqtt_protocol import MqttUdpProtocol
+
+FRAME_MS = 60
+FRAME_BYTES = 120
+
+
+def start_in_thread(coro):
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def percentiles(samples):
+    if not samples:
+        return "-"
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+    return f"p50 {pick(50):6.2f}  p90 {pick(90):6.2f}  p99 {pick(99):6.2f}  max {samples[-1]:6.2f} ms"
+
+
+class Probe:
+    """挂到协议回调上：按帧序号记录发送时刻，回发到达时计算往返时延"""
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.sent_at = {}
+        self.rtt_ms = []
+        self.listen_stopped_at = None
+        self.response_ms = None
+        self.tts_done = threading.Event()
+        protocol.on_incoming_audio(self.on_audio)
+        protocol.on_json_message("tts", self.on_tts)
+        protocol.on_json_message("stt", lambda data: None)
+
+    def on_audio(self, data):
+        now = time.perf_counter()
+        if self.listen_stopped_at is not None:
+            if self.response_ms is None:
+                self.response_ms = (now - self.listen_stopped_at) * 1000
+            return
+        sent = self.sent_at.pop(struct.unpack_from(">I", data, 0)[0], None)
+        if sent is not None:
+            self.rtt_ms.append((now - sent) * 1000)
+
+    def on_tts(self, data):
+        if data.get("state") == "stop":
+            self.tts_done.set()
+
+    def run(self, frames):
+        frame = bytearray(FRAME_BYTES)
+        deadline = time.perf_counter()
+        for seq in range(frames):
+            struct.pack_into(">I", frame, 0, seq)
+            self.sent_at[seq] = time.perf_counter()
+            self.protocol.send_audio(frame)
+            deadline += FRAME_MS / 1000
+            time.sleep(max(0, deadline - time.perf_counter()))
+        time.sleep(0.2)
+        self.listen_stopped_at = time.perf_counter()
+        self.protocol.send_stop_listening()
+        self.tts_done.wait(5)
+
+
+def open_channel(protocol, url):
+    t0 = time.perf_counter()
+    assert protocol.open_audio_channel(url, {}), "打开音频通道失败"
+    return (time.perf_counter() - t0) * 1000
+
+
+def run_websocket(frames):
+    ws_server, _ = start_in_thread(standin_server.serve("127.0.0.1", 0, frame_duration=FRAME_MS, echo=True))
+    url = "ws://127.0.0.1:%d/" % ws_server.sockets[0].getsockname()[1]
+    protocol = WebsocketProtocol(WebSocketClient(url, "token", "mac", "uuid"), ping_interval_ms=0)
+    probe = Probe(protocol)
+    open_ms = open_channel(protocol, url)
+    # 通道打开后先等服务端 hello，保证后续消息与音频都在会话内
+    time.sleep(0.1)
+    probe.run(frames)
+    protocol.close_audio_channel()
+    return open_ms, probe
+
+
+def run_mqtt_udp(frames, loss=0.0):
+    mqtt_server, server = start_in_thread(mqtt_udp_standin.serve("127.0.0.1", 0, 0, echo=True, loss=loss,
+                                                                 frame_duration=FRAME_MS))
+    port = mqtt_server.sockets[0].getsockname()[1]
+    protocol = MqttUdpProtocol({
+        "endpoint": "127.0.0.1:%d" % port, "client_id": "bench-device", "username": "u", "password": "p",
+        "publish_topic": mqtt_udp_standin.SERVER_TOPIC, "subscribe_topic": "devices/bench-device",
+    })
+    probe = Probe(protocol)
+    protocol.start()
+    open_ms = open_channel(protocol, None)
+    probe.run(frames)
+    stats = protocol.get_audio_stats()
+    protocol.close_audio_channel()
+    protocol.mqtt.disconnect()
+    return open_ms, probe, stats, server.stats
+
+
+def report(name, open_ms, probe):
+    print(f"[{name}] 打开通道 {open_ms:.1f} ms，响应 {probe.response_ms if probe.response_ms is None else round(probe.response_ms, 2)} ms")
+    print(f"[{name}] 往返 {percentiles(probe.rtt_ms)}（{len(probe.rtt_ms)} 帧）")
+
+
+def main(frames):
+    open_ms, probe = run_websocket(frames)
+    report("websocket", open_ms, probe)
+    assert len(probe.rtt_ms) == frames
+
+    open_ms, probe, stats, server_stats = run_mqtt_udp(frames)
+    report("mqtt+udp", open_ms, probe)
+    print(f"[mqtt+udp] 设备侧 {stats}，服务端 {server_stats}")
+    assert len(probe.rtt_ms) == frames and stats["lost"] == 0
+
+    open_ms, probe, stats, server_stats = run_mqtt_udp(frames, loss=0.1)
+    report("mqtt+udp 10% 下行丢包", open_ms, probe)
+    print(f"[mqtt+udp 10% 下行丢包] 设备侧 {stats}，服务端丢弃 {server_stats['udp_dropped']}")
+    # 序号缺口计入 lost；尾部丢失的帧之后没有新帧，不会被计为缺口
+    assert stats["lost"] <= server_stats["udp_dropped"]
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
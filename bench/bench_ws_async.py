@@ -0,0 +1,135 @@
+# 主机侧验证：本地 asyncio WebSocket 服务端 + AsyncWebsocketProtocol/AsyncWebSocketClient。
+# 采集线程按帧周期调用 send_audio，服务端同时按帧周期推送下行音频、插入 ping 与 IoT 文本消息，
+# 统计两个方向的帧数、pong 数与事件循环最大滞后，验证单连接上行/下行/控制消息互不阻塞。
+# 用法: python bench/bench_ws_async.py [秒数]
+import os
+import sys
+import time
+import json
+import struct
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+from async_websocket_client import AsyncWebSocketClient
+from protocol.protocol import AsyncWebsocketProtocol
+
+FRAME_MS = 60
+RESPONSE = (b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: HSmrc0sMlYUkAGmm5OPpG2HaGWk=\r\n\r\n")
+
+
+def frame(opcode, payload):
+    n = len(payload)
+    if n <= 125:
+        head = struct.pack("!BB", 0x80 | opcode, n)
+    else:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    return head + payload
+
+
+class Server:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.uplink = {}
+        self.pongs = 0
+
+    async def read_frame(self, reader):
+        b0, b1 = await reader.readexactly(2)
+        n = b1 & 0x7F
+        if n == 126:
+            n = struct.unpack("!H", await reader.readexactly(2))[0]
+        mask = await reader.readexactly(4)
+        data = bytearray(await reader.readexactly(n))
+        for i in range(n):
+            data[i] ^= mask[i & 3]
+        return b0 & 0x0F, bytes(data)
+
+    async def handle(self, reader, writer):
+        while (await reader.readline()) != b"\r\n":
+            pass
+        writer.write(RESPONSE)
+        hello = {"type": "hello", "transport": "websocket",
+                 "audio_params": {"sample_rate": 24000, "frame_duration": FRAME_MS}}
+        writer.write(frame(1, json.dumps(hello).encode()))
+        pusher = asyncio.create_task(self.push(writer))
+        try:
+            while True:
+                opcode, data = await self.read_frame(reader)
+                self.uplink[opcode] = self.uplink.get(opcode, 0) + 1
+                if opcode == 0xA:
+                    self.pongs += 1
+                elif opcode == 8:
+                    writer.write(frame(8, data))
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        pusher.cancel()
+        writer.close()
+
+    async def push(self, writer):
+        audio = bytes(24000 * FRAME_MS // 1000 * 2)
+        i = 0
+        while True:
+            writer.write(frame(2, audio))
+            if i % 10 == 0:
+                writer.write(frame(9, b"p%d" % i))
+                command = {"type": "iot", "commands": [{"name": "Lamp", "method": "TurnOn"}]}
+                writer.write(frame(1, json.dumps(command).encode()))
+            await writer.drain()
+            i += 1
+            await asyncio.sleep(FRAME_MS / 1000)
+
+
+async def main(seconds):
+    server = Server(seconds)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+
+    client = AsyncWebSocketClient(f"ws://127.0.0.1:{port}/xiaozhi/v1/", "token", "mac", "uuid")
+    protocol = AsyncWebsocketProtocol(client)
+    received = {"audio": 0, "json": 0}
+    protocol.on_incoming_audio(lambda data: received.__setitem__("audio", received["audio"] + 1))
+    protocol.on_incoming_json(lambda data: received.__setitem__("json", received["json"] + 1))
+    assert await protocol.open_audio_channel(client.url, {})
+
+    # 采集线程：与设备上一样在事件循环之外调用 send_audio
+    stop = threading.Event()
+    sent = [0]
+
+    def capture():
+        payload = bytearray(16000 * FRAME_MS // 1000 * 2)
+        while not stop.is_set():
+            protocol.send_audio(payload)
+            sent[0] += 1
+            time.sleep(FRAME_MS / 1000)
+
+    threading.Thread(target=capture, daemon=True).start()
+
+    # 事件循环滞后：10 ms 定时器的实际唤醒延迟
+    max_lag = 0.0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        t0 = time.monotonic()
+        await asyncio.sleep(0.01)
+        max_lag = max(max_lag, time.monotonic() - t0 - 0.01)
+    stop.set()
+    await asyncio.sleep(FRAME_MS / 1000)
+    await protocol.close_audio_channel()
+    listener.close()
+
+    print(f"server sample rate from hello: {protocol.server_sample_rate}")
+    print(f"uplink audio: sent {sent[0]}, server got {server.uplink.get(2, 0)}")
+    print(f"downlink: audio {received['audio']}, json {received['json']}, pongs {server.pongs}")
+    print(f"client frames sent {client.messages_sent}, received {client.messages_received}")
+    print(f"max event loop lag {max_lag * 1000:.1f} ms")
+    assert server.uplink.get(2, 0) == sent[0]
+    assert server.uplink.get(8, 0) == 1, "close 帧未送达"
+
+
+if __name__ == "__main__":
+    asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 3))
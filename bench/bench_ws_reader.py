@@ -0,0 +1,168 @@
+# 主机侧基准：本地 WebSocket 服务端推送帧流，对比旧版 recv（逐次 sock.recv）与 FrameReader 的
+# 每秒帧数与每帧拷贝字节数；并用小块写入、分片消息与插入的 ping 验证短读/分片/控制帧处理。
+# 用法: python bench/bench_ws_reader.py [消息数]
+import os
+import sys
+import time
+import socket
+import struct
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+from micropython_websocket_client import WebSocketClient, OP_TEXT, OP_BINARY, OP_PING
+
+RESPONSE = (b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: HSmrc0sMlYUkAGmm5OPpG2HaGWk=\r\n\r\n")
+
+
+def frame(opcode, payload, fin=True):
+    head = bytearray([(0x80 if fin else 0) | opcode])
+    n = len(payload)
+    if n <= 125:
+        head.append(n)
+    elif n <= 65535:
+        head.append(126)
+        head += struct.pack(">H", n)
+    else:
+        head.append(127)
+        head += struct.pack(">Q", n)
+    return bytes(head) + payload
+
+
+def serve_once(stream, chunk=None):
+    """启动一次性服务端：完成握手后按 chunk 大小分块写出 stream，返回监听地址"""
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    def run():
+        conn, _ = listener.accept()
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += conn.recv(1024)
+        # 握手响应与首批帧一起写出，验证响应之后的数据不会丢失
+        data = RESPONSE + stream
+        try:
+            if chunk:
+                for i in range(0, len(data), chunk):
+                    conn.sendall(data[i:i + chunk])
+            else:
+                conn.sendall(data)
+            # 丢弃客户端发来的 pong，等客户端读完并关闭连接
+            while conn.recv(4096):
+                pass
+        except OSError:
+            pass  # 旧实现读坏数据流后会提前断开
+        conn.close()
+        listener.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return "ws://127.0.0.1:%d/" % listener.getsockname()[1]
+
+
+class CountingSocket:
+    """统计旧版 recv 的拷贝量：每次 sock.recv 都会分配并拷贝出新的 bytes"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.copied = 0
+
+    def recv(self, n):
+        data = self.sock.recv(n)
+        self.copied += len(data)
+        return data
+
+
+def legacy_recv(sock):
+    # micropython_websocket_client.WebSocketClient.recv 的原始实现
+    header = sock.recv(2)
+    if not header:
+        return None
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", sock.recv(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", sock.recv(8))[0]
+    return sock.recv(length).decode("utf-8")
+
+
+def connect(url):
+    client = WebSocketClient(url, "token", "mac", "uuid")
+    client.connect()
+    return client
+
+
+def run_legacy(count):
+    text = b'{"type":"tts","state":"sentence_start","text":"' + b"x" * 900 + b'"}'
+    url = serve_once(b"".join(frame(OP_TEXT, text) for _ in range(count)))
+    host, port = url[5:-1].split(":")
+    sock = socket.create_connection((host, int(port)))
+    sock.send(b"GET / HTTP/1.1\r\n\r\n")
+    received = b""
+    while b"\r\n\r\n" not in received:
+        received += sock.recv(1)
+    counting = CountingSocket(sock)
+    ok = 0
+    start = time.perf_counter()
+    try:
+        for _ in range(count):
+            message = legacy_recv(counting)
+            if message is None or len(message) != len(text):
+                break
+            ok += 1
+    except (UnicodeError, struct.error, IndexError):
+        pass
+    elapsed = time.perf_counter() - start
+    sock.close()
+    # 每条文本消息解码为 str 还要再拷贝一次
+    copied = counting.copied + ok * len(text)
+    print(f"legacy recv     {ok / elapsed:10.0f} frames/s  {copied / max(1, ok):8.1f} B copied/frame  "
+          f"({ok}/{count} frames intact)")
+
+
+def run_reader(count, chunk=None, label="FrameReader"):
+    audio = bytes(range(256)) * 4
+    text = b'{"type":"tts","state":"sentence_start","text":"' + b"x" * 150 + b'"}'
+    parts = []
+    expected = []
+    for i in range(count):
+        if i % 4 == 3:
+            parts.append(frame(OP_TEXT, text))
+            expected.append((OP_TEXT, len(text)))
+        elif i % 50 == 49:
+            # 三片分片的二进制消息，中间插入一个 ping
+            parts.append(frame(OP_BINARY, audio[:400], fin=False))
+            parts.append(frame(OP_PING, b"p"))
+            parts.append(frame(0, audio[400:800], fin=False))
+            parts.append(frame(0, audio[800:], fin=True))
+            expected.append((OP_BINARY, len(audio)))
+        else:
+            parts.append(frame(OP_BINARY, audio))
+            expected.append((OP_BINARY, len(audio)))
+    client = connect(serve_once(b"".join(parts), chunk))
+    reader = client.reader
+    start = time.perf_counter()
+    for opcode, length in expected:
+        got_opcode, payload = client.recv_message()
+        assert got_opcode == opcode and len(payload) == length, (got_opcode, len(payload))
+        if opcode == OP_BINARY:
+            assert payload[:4] == audio[:4]
+    elapsed = time.perf_counter() - start
+    client.close()
+    print(f"{label:<15} {count / elapsed:10.0f} frames/s  {reader.bytes_copied / count:8.1f} B copied/frame  "
+          f"({reader.frames} wire frames)")
+
+
+def main(count=20000):
+    run_legacy(count)
+    run_reader(count)
+    run_reader(count // 10, chunk=37, label="FrameReader/37B")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
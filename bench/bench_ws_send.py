@@ -0,0 +1,150 @@
+# 主机侧基准：对比旧版发送路径（逐帧 struct.pack 拼接帧头 + 负载，不带掩码，不符合 RFC 6455）、
+# 逐字节掩码的拼接路径（旧 _send_control 的做法）与 FrameWriter（预分配缓冲区、原地按字掩码、
+# 单次写出）的每秒帧数与吞吐；并在接收端解掩码校验负载一致。
+# 用法: python bench/bench_ws_send.py [帧数]
+import os
+import sys
+import time
+import socket
+import struct
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "sim"))
+import simenv
+
+simenv.install()
+
+from micropython_websocket_client import FrameWriter, OP_BINARY, OP_TEXT
+
+
+def legacy_create_frame(message):
+    # 旧实现：三次 struct.pack 拼接帧头，再与负载拼接成新 bytes
+    length = len(message)
+    if length <= 125:
+        header = struct.pack("B", 0x82) + struct.pack("B", length)
+    elif length <= 65535:
+        header = struct.pack("B", 0x82) + struct.pack("B", 126) + struct.pack(">H", length)
+    else:
+        header = struct.pack("B", 0x82) + struct.pack("B", 127) + struct.pack(">Q", length)
+    return header + bytes(message)
+
+
+def bytewise_masked_frame(payload):
+    # 逐字节掩码：分配新帧并在 Python 循环里异或
+    mask = os.urandom(4)
+    n = len(payload)
+    if n <= 125:
+        frame = bytearray(6 + n)
+        frame[1] = 0x80 | n
+        start = 2
+    else:
+        frame = bytearray(8 + n)
+        frame[1] = 0x80 | 126
+        struct.pack_into(">H", frame, 2, n)
+        start = 4
+    frame[0] = 0x82
+    frame[start:start + 4] = mask
+    start += 4
+    for i in range(n):
+        frame[start + i] = payload[i] ^ mask[i & 3]
+    return frame
+
+
+def drain(sock):
+    total = 0
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            return total
+        total += len(data)
+
+
+def run_case(name, payload, count, send):
+    a, b = socket.socketpair()
+    result = {}
+    t = threading.Thread(target=lambda: result.setdefault("bytes", drain(b)))
+    t.start()
+    start = time.perf_counter()
+    send(a, payload, count)
+    a.shutdown(socket.SHUT_WR)
+    elapsed = time.perf_counter() - start
+    t.join()
+    a.close()
+    b.close()
+    print("  %-10s %8.0f 帧/s  %7.2f MB/s（含帧头 %d 字节）" % (
+        name, count / elapsed, result["bytes"] / elapsed / 1e6, result["bytes"]))
+    return elapsed
+
+
+def send_legacy(sock, payload, count):
+    for _ in range(count):
+        sock.send(legacy_create_frame(payload))
+
+
+def send_bytewise(sock, payload, count):
+    for _ in range(count):
+        sock.send(bytewise_masked_frame(payload))
+
+
+def send_writer(sock, payload, count):
+    writer = FrameWriter(sock)
+    for _ in range(count):
+        writer.send_frame(OP_BINARY, payload)
+
+
+def unmask_server(data):
+    """服务端视角：解析带掩码的帧并还原负载"""
+    out = []
+    i = 0
+    while i < len(data):
+        opcode = data[i] & 0x0F
+        assert data[i + 1] & 0x80, "客户端帧必须带掩码"
+        n = data[i + 1] & 0x7F
+        i += 2
+        if n == 126:
+            n = struct.unpack(">H", data[i:i + 2])[0]
+            i += 2
+        elif n == 127:
+            n = struct.unpack(">Q", data[i:i + 8])[0]
+            i += 8
+        mask = data[i:i + 4]
+        i += 4
+        out.append((opcode, bytes(data[i + k] ^ mask[k & 3] for k in range(n))))
+        i += n
+    return out
+
+
+def verify():
+    a, b = socket.socketpair()
+    writer = FrameWriter(a, buffer_size=64)
+    cases = [(OP_BINARY, bytes(range(256)) * 3 + b"xyz"), (OP_TEXT, "你好".encode("utf-8")),
+             (OP_BINARY, b""), (OP_BINARY, bytearray(os.urandom(161))),
+             (OP_BINARY, memoryview(os.urandom(70000))[1:])]
+    result = {}
+    t = threading.Thread(target=lambda: result.setdefault("data", b"".join(iter(lambda: b.recv(65536), b""))))
+    t.start()
+    for opcode, payload in cases:
+        writer.send_frame(opcode, payload)
+    a.shutdown(socket.SHUT_WR)
+    t.join()
+    got = unmask_server(result["data"])
+    assert got == [(op, bytes(p)) for op, p in cases], "解掩码后负载不一致"
+    a.close()
+    b.close()
+    print("校验通过：%d 帧解掩码后与原负载一致（含扩容与 64 位长度）" % len(cases))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    verify()
+    for label, size in (("160 B（60 ms Opus 帧）", 160), ("1 KB PCM 帧", 1024)):
+        payload = bytearray(os.urandom(size))
+        print("%s x %d" % (label, count))
+        run_case("旧路径无掩码", payload, count, send_legacy)
+        old = run_case("逐字节掩码", payload, count, send_bytewise)
+        new = run_case("FrameWriter", payload, count, send_writer)
+        print("  FrameWriter/逐字节掩码 耗时比 %.2f" % (new / old))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,3 @@
-import re
-from typing import override
-from rpds import T
-from yaml import scan
 import machine
 import network
 import ubinascii
@@ -11,6 +7,7 @@ from utils.persist import add_wifi, get_wifi_list, get_device_id
 import bluetooth
 from micropython import const
 import struct
+import _thread
 
 class Board:
     def __init__(self):
@@ -76,7 +73,7 @@ class WifiBoard(Board):
         self.wifi.active(True)  # Ensure Wi-Fi is active    
         if self.wifi.isconnected():
             print("Wi-Fi is already connected.")
-            self.monitor_wifi_status()
+            _thread.start_new_thread(self.monitor_wifi_status, ())
             return True
         else:
             # 如果未传入参数，从存储的 Wi-Fi 列表中遍历尝试连接
@@ -87,19 +84,19 @@ class WifiBoard(Board):
             print("Failed to connect to any saved Wi-Fi networks.")
             return False
 
-    def _connect_to_wifi(self, ssid, password):
+    def _connect_to_wifi(self, ssid, password, attempt_timeout=5):
         print(f"Connecting to Wi-Fi SSID: {ssid}...")
-        try_count = 0
-        while not self.wifi.isconnected() and try_count < 3:
-            try_count += 1
+        for try_count in range(1, 4):
             print(f"Attempt {try_count} to connect to {ssid}...")
             self.wifi.connect(ssid, password)
-            if self.wifi.isconnected():
-                print("Connected to Wi-Fi:", self.wifi.ifconfig())
-                self.monitor_wifi_status()
-                add_wifi(ssid, password)
-                return True
-            time.sleep(1)
+            # connect() 是异步的，轮询等待连接建立
+            for _ in range(attempt_timeout * 10):
+                if self.wifi.isconnected():
+                    print("Connected to Wi-Fi:", self.wifi.ifconfig())
+                    add_wifi(ssid, password)
+                    _thread.start_new_thread(self.monitor_wifi_status, ())
+                    return True
+                time.sleep(0.1)
         return False
 
     def set_power_save_mode(self, enabled):
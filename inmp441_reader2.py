@@ -5,20 +5,29 @@ import socket
 import time
 from machine import I2S, Pin
 from wificonnections import do_connect
-import struct
+from audio.processor import AudioProcessor, new_sample_buffer
+from audio.packet import PacketBuilder, FLAG_SPEECH_START, PACKET_VERSION_LEGACY
+from audio.codec import create_codec, CODEC_PCM
+from audio.vad import VoiceActivityDetector
+from audio.pipeline import CapturePipeline
+from audio.clock import AdaptiveFrameSize
+from audio.resampler import Resampler
 
 # 配置参数
 DEVICE_ID = ubinascii.hexlify(machine.unique_id()).decode('utf-8')  # 基于芯片ID生成设备唯一标识
 SERVER_IP = '1.14.96.238'  # 服务端IP
 SERVER_PORT = 7676
-MAGIC_NUMBER = 0xA1B2C3D4     # 与服务端一致的魔数
-AUDIO_FORMAT = "!I16sH"       # 协议头格式: 魔数(4B) + 设备ID(16B) + 数据长度(2B)
+# 数据包格式: 1 旧格式；2 带序号/采集时刻（魔数 0xA1B2C3D6），服务端全部升级到能解析 v2 之后才能切换
+PACKET_VERSION = PACKET_VERSION_LEGACY
+AUDIO_CODEC = "pcm"  # 上行编码: "pcm" 原始 16bit（256kbit/s）或 "adpcm" IMA-ADPCM（约 66kbit/s，需服务端支持）
 
 # 音频配置
 SAMPLE_RATE_IN_HZ = 16000
+UPLINK_SAMPLE_RATE = 16000  # 上行发送的采样率，与采集采样率不同时在 DSP 之后重采样（如 24000、48000）
 SAMPLE_SIZE_IN_BITS = 16
 BUFFER_LENGTH_IN_BYTES = 1024  # 每次发送的音频数据长度
 SAMPLES_PER_BUFFER = BUFFER_LENGTH_IN_BYTES // (SAMPLE_SIZE_IN_BITS // 8)
+MAX_SAMPLES_PER_BUFFER = SAMPLES_PER_BUFFER * 2  # 持续处理超时时帧长最多放大到的采样数
 interval_ms = int((SAMPLES_PER_BUFFER / SAMPLE_RATE_IN_HZ) * 1000)
 
 def setup_mic():
@@ -35,93 +44,64 @@ def setup_mic():
     )
     return i2s
 
-def create_packet(audio_data):
-    # 确保音频数据是字节类型
-    if not isinstance(audio_data, (bytes, bytearray)):
-        print(f"错误：音频数据类型不正确 {type(audio_data)}")
-        audio_data = bytearray()
-        
-    # 设备ID处理
-    dev_id = DEVICE_ID.encode('utf-8')[:16]
-    dev_id = dev_id + b'\x00'*(16-len(dev_id))
-    
-    try:
-        # 创建数据包头
-        header = struct.pack(AUDIO_FORMAT, MAGIC_NUMBER, dev_id, len(audio_data))
-        # 合并头部和音频数据
-        return header + audio_data
-    except Exception as e:
-        print(f"创建数据包错误: {e}")
-        return bytearray()
-
-def process_audio(raw_data):
-    # 确保输入是字节类型
-    if not isinstance(raw_data, (bytes, bytearray)):
-        print(f"警告：输入类型不正确 {type(raw_data)}")
-        return bytearray()
-        
-    # 将字节流转换为数字
-    try:
-        fmt = f'<{len(raw_data)//2}h'
-        samples = list(struct.unpack(fmt, raw_data))
-    except struct.error as e:
-        print(f"解包错误: {e}, 数据长度: {len(raw_data)}")
-        return bytearray()
-    
-    # 1. 移除直流偏移（消除电流音）
-    dc_offset = sum(samples) // len(samples) if samples else 0
-    samples = [x - dc_offset for x in samples]
-    
-    # 2. 动态增益控制（提升音量）
-    max_val = max((abs(x) for x in samples), default=1)
-    if max_val > 100:  # 只有当信号足够强时才进行增益调整
-        gain = min(5, 32767 // max_val)  # 限制最大增益
-        samples = [min(32767, max(-32768, int(x * gain))) for x in samples]
-    
-    # 3. 简单低通滤波（抑制高频噪声）
-    filtered = []
-    prev = 0
-    alpha = 20 # 滤波系数
-    for x in samples:
-        new_val = (prev * (100 - alpha) + x * alpha) // 100
-        filtered.append(max(-32768, min(32767, new_val)))  # 钳位
-        prev = filtered[-1]
-    
-    # 返回字节数组
-    try:
-        return bytearray(struct.pack(f'<{len(filtered)}h', *filtered))
-    except struct.error as e:
-        print(f"打包错误: {e}")
-        return bytearray()
+RING_SLOTS = 4  # 环形缓冲区槽数，约 128ms 的音频
 
-def main():
-    mic = udp_socket = None
-    packet_count = 0
+def main(app=None):
+    mic = udp_socket = pipeline = None
     start_time = time.ticks_ms()
     
     try:
         mic = setup_mic()
         udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        audio_buffer = bytearray(BUFFER_LENGTH_IN_BYTES)
-        
-        print(f"音频流开始传输 (间隔: {interval_ms}ms)")
+        processor = AudioProcessor()
+        codec = create_codec(AUDIO_CODEC)
+        max_samples = MAX_SAMPLES_PER_BUFFER
+        resampler = resampled = None
+        if UPLINK_SAMPLE_RATE != SAMPLE_RATE_IN_HZ:
+            resampler = Resampler(SAMPLE_RATE_IN_HZ, UPLINK_SAMPLE_RATE, max_block=MAX_SAMPLES_PER_BUFFER)
+            max_samples = resampler.max_output(MAX_SAMPLES_PER_BUFFER)
+            resampled = new_sample_buffer(max_samples)
+        # 无重采样的 PCM 可以让 DSP 直接写入负载区
+        direct = resampler is None and codec.codec_id == CODEC_PCM
+        packet_builder = PacketBuilder(DEVICE_ID, codec.encoded_size(max_samples), codec.codec_id, PACKET_VERSION)
+        server_addr = (SERVER_IP, SERVER_PORT)
+        vad = VoiceActivityDetector()
+        if app:
+            app.bind_vad(vad)
+
+        def send_frame(samples, num_bytes, tick):
+            count = num_bytes // 2
+            if direct:
+                # DSP 输出直接写入数据包负载区（同时写回 samples 供 VAD 分析），滤波状态跨帧保持
+                processor.process(samples, count, packet_builder.payload)
+            else:
+                processor.process(samples, count)
+                if resampler:
+                    count = resampler.process(samples, count, resampled)
+                    samples = resampled
+            frame_count = pipeline.frames_processed + 1
+            if frame_count % 100 == 0:
+                elapsed = time.ticks_diff(time.ticks_ms(), start_time)/1000
+                print(f"已处理 {frame_count} 帧 ({elapsed:.1f}秒) {pipeline.get_stats()} {vad.get_stats()}")
+            # 静音帧不进入编码与网络发送
+            if not vad.process(samples, count):
+                return
+            if direct:
+                length = count * 2
+            else:
+                length = codec.encode(samples, count, packet_builder.payload)
+            flags = FLAG_SPEECH_START if vad.speech_started else 0
+            udp_socket.sendto(packet_builder.finish(length, tick, flags), server_addr)
+
+        # I2S 读取在独立线程中进行，发送阻塞不会导致 DMA 缓冲区溢出
+        frame_size = AdaptiveFrameSize(SAMPLES_PER_BUFFER, MAX_SAMPLES_PER_BUFFER)
+        pipeline = CapturePipeline(mic, send_frame, RING_SLOTS, SAMPLES_PER_BUFFER, SAMPLE_RATE_IN_HZ, frame_size)
+        pipeline.start()
+
+        print(f"音频流开始传输 (帧长: {interval_ms}ms)")
         while True:
             try:
-                num_bytes_read = mic.readinto(audio_buffer)
-                if num_bytes_read > 0:
-                    # 复制部分缓冲区以避免修改原始数据
-                    processed_audio = process_audio(bytes(audio_buffer[:num_bytes_read]))
-                    if processed_audio:
-                        packet = create_packet(processed_audio)
-                        udp_socket.sendto(packet, (SERVER_IP, SERVER_PORT))
-                        packet_count += 1
-                        
-                        if packet_count % 100 == 0:
-                            elapsed = time.ticks_diff(time.ticks_ms(), start_time)/1000
-                            print(f"已发送 {packet_count} 个数据包 ({elapsed:.1f}秒)")
-                
-                time.sleep_ms(max(1, interval_ms))
-                
+                pipeline.run_consumer()
             except OSError as e:
                 print(f"error: {e}")
                 time.sleep(1)
@@ -131,9 +111,12 @@ def main():
     except KeyboardInterrupt:
         print("user cancel")
     finally:
+        if pipeline:
+            pipeline.stop()
+            pipeline.join()
+            print(f"total frames: {pipeline.frames_processed}, stats: {pipeline.get_stats()}")
         if mic: mic.deinit()
         if udp_socket: udp_socket.close()
-        print(f"total pack: {packet_count}")
 
 if __name__ == "__main__":
     if do_connect():
@@ -1,4 +1,16 @@
 import ujson
+import _thread
+import ubinascii
+
+try:
+    import hashlib
+except ImportError:
+    import uhashlib as hashlib
+
+# 保护各 Thing 的脏属性列表与 ThingManager 的脏 Thing 列表：set_property 可能在其他线程调用
+_dirty_lock = _thread.allocate_lock()
+_UNSET = object()
+
 
 class Thing:
     def __init__(self, name, description):
@@ -6,12 +18,50 @@ class Thing:
         self.description = description
         self.properties = {}
         self.methods = {}
+        # 轮询属性：每个上报周期调用 getter，与上次上报的值逐个比较
+        self.polled = []
+        # 可观察属性：值保存在这里，set_property 改变时自行标脏
+        self.values = {}
+        self.dirty = []
+        self.on_dirty = None  # 由 ThingManager 设置，Thing 从干净变脏时调用
+        self.on_polled = None  # 由 ThingManager 设置，加入管理后新增第一个轮询属性时调用
+        # 每个属性上次上报的值
+        self.reported = {}
+        # 缓存的描述符，增加属性或方法时失效
+        self.descriptor = None
 
-    def add_property(self, name, value_getter, description=""):
+    def add_property(self, name, value_getter, description="", value_type=None):
+        # value_type 为声明的类型名；不声明时在首次生成描述符时调用一次 getter 推断
         self.properties[name] = {
             "getter": value_getter,
-            "description": description
+            "description": description,
+            "type": value_type
+        }
+        self.polled.append(name)
+        self.descriptor = None
+        if len(self.polled) == 1 and self.on_polled:
+            self.on_polled(self)
+
+    def add_observable_property(self, name, value, description="", value_type=None):
+        self.values[name] = value
+        self.properties[name] = {
+            "getter": lambda: self.values[name],
+            "description": description,
+            "type": value_type or type(value).__name__
         }
+        self.descriptor = None
+
+    def set_property(self, name, value):
+        # 只用于可观察属性；值未变化时不标脏
+        if self.values[name] == value:
+            return
+        with _dirty_lock:
+            self.values[name] = value
+            if name in self.dirty:
+                return
+            self.dirty.append(name)
+            if len(self.dirty) == 1 and self.on_dirty:
+                self.on_dirty(self)
 
     def add_method(self, name, callback, parameters=None, description=""):
         self.methods[name] = {
@@ -19,37 +69,70 @@ class Thing:
             "parameters": parameters or {},
             "description": description
         }
+        self.descriptor = None
 
-    def get_descriptor_json(self):
-        descriptor = {
-            "name": self.name,
-            "description": self.description,
-            "properties": {
-                name: {
-                    "description": prop["description"],
-                    "type": type(prop["getter"]()).__name__
+    def get_descriptor(self):
+        # 描述符只生成一次；调用方不要修改返回的 dict
+        if self.descriptor is None:
+            for prop in self.properties.values():
+                if prop["type"] is None:
+                    prop["type"] = type(prop["getter"]()).__name__
+            self.descriptor = {
+                "name": self.name,
+                "description": self.description,
+                "properties": {
+                    name: {
+                        "description": prop["description"],
+                        "type": prop["type"]
+                    }
+                    for name, prop in self.properties.items()
+                },
+                "methods": {
+                    name: {
+                        "description": method["description"],
+                        "parameters": method["parameters"]
+                    }
+                    for name, method in self.methods.items()
                 }
-                for name, prop in self.properties.items()
-            },
-            "methods": {
-                name: {
-                    "description": method["description"],
-                    "parameters": method["parameters"]
-                }
-                for name, method in self.methods.items()
             }
-        }
-        return ujson.dumps(descriptor)
+        return self.descriptor
 
-    def get_state_json(self):
-        state = {
+    def get_state(self):
+        return {
             "name": self.name,
             "state": {
                 name: prop["getter"]()
                 for name, prop in self.properties.items()
             }
         }
-        return ujson.dumps(state)
+
+    def mark_reported(self, state):
+        # 完整上报后以此为基准，清空待上报的变化
+        self.reported = dict(state["state"])
+        with _dirty_lock:
+            self.dirty = []
+
+    def get_changes(self):
+        # 自上次上报以来变化的属性 {name: value}；只轮询 polled 属性，可观察属性只看脏列表
+        changes = {}
+        reported = self.reported
+        properties = self.properties
+        for name in self.polled:
+            value = properties[name]["getter"]()
+            if reported.get(name, _UNSET) != value:
+                changes[name] = value
+                reported[name] = value
+        if self.dirty:
+            with _dirty_lock:
+                dirty = self.dirty
+                self.dirty = []
+            values = self.values
+            for name in dirty:
+                value = values[name]
+                if reported.get(name, _UNSET) != value:  # 改回了上报过的值则不必再报
+                    changes[name] = value
+                    reported[name] = value
+        return changes
 
     def invoke(self, command):
         method_name = command.get("method")
@@ -67,28 +150,72 @@ class Thing:
 class ThingManager:
     def __init__(self):
         self.things = []
-        self.last_states = {}
+        # 有轮询属性的 Thing 每个周期都要采样；只有可观察属性的 Thing 仅在标脏后才处理
+        self.polled_things = []
+        self.dirty_things = []
+        # 缓存的描述符列表及其内容哈希，任一 Thing 的描述符失效或新增 Thing 时重建
+        self.descriptors = None
+        self.descriptors_hash = None
 
     def add_thing(self, thing):
+        thing.on_dirty = self._on_thing_dirty
+        thing.on_polled = self._on_thing_polled
         self.things.append(thing)
+        if thing.polled:
+            self.polled_things.append(thing)
+        self.descriptors = None
 
-    def get_descriptors_json(self):
-        descriptors = [ujson.loads(thing.get_descriptor_json()) for thing in self.things]
-        return ujson.dumps(descriptors)
+    def _on_thing_polled(self, thing):
+        if thing not in self.polled_things:
+            self.polled_things.append(thing)
 
-    def get_states_json(self, delta=False):
+    def _on_thing_dirty(self, thing):
+        self.dirty_things.append(thing)  # 调用方已持有 _dirty_lock
+
+    def get_descriptors(self):
+        descriptors = self.descriptors
+        if descriptors is None or any(thing.descriptor is None for thing in self.things):
+            descriptors = [thing.get_descriptor() for thing in self.things]
+            self.descriptors = descriptors
+            self.descriptors_hash = None
+        return descriptors
+
+    def get_descriptors_hash(self):
+        # 描述符内容的 SHA-256 前 16 字节（十六进制），服务端据此判断缓存的描述符是否仍然有效
+        descriptors = self.get_descriptors()
+        if self.descriptors_hash is None:
+            digest = hashlib.sha256(ujson.dumps(descriptors).encode("utf-8")).digest()
+            self.descriptors_hash = ubinascii.hexlify(digest[:16]).decode()
+        return self.descriptors_hash
+
+    def get_states(self, delta=False):
+        # delta=False：所有 Thing 的完整状态，并作为之后增量的基准；
+        # delta=True：只含变化属性的状态 {"name", "state": {变化的属性}}，
+        # 开销与轮询属性数加变化的可观察属性数成正比
+        if not delta:
+            with _dirty_lock:
+                self.dirty_things = []
+            states = []
+            for thing in self.things:
+                state = thing.get_state()
+                thing.mark_reported(state)
+                states.append(state)
+            return states, bool(states)
+        with _dirty_lock:
+            dirty = self.dirty_things
+            self.dirty_things = []
         states = []
-        changed = False
-        for thing in self.things:
-            state = ujson.loads(thing.get_state_json())
-            if delta:
-                last_state = self.last_states.get(thing.name)
-                if last_state == state:
-                    continue
-                changed = True
-            self.last_states[thing.name] = state
-            states.append(state)
-        return ujson.dumps(states), changed
+        for thing in self.polled_things:
+            self._append_changes(states, thing)
+        for thing in dirty:
+            if not thing.polled:
+                self._append_changes(states, thing)
+        return states, bool(states)
+
+    def _append_changes(self, states, thing):
+        changes = thing.get_changes()
+        if changes:
+            states.append({"name": thing.name, "state": changes})
 
     def invoke(self, command):
         thing_name = command.get("name")
@@ -0,0 +1,213 @@
+import usocket as socket
+import ustruct as struct
+import _thread
+from utils.ticks import ticks_ms, ticks_diff
+
+# MQTT 3.1.1 控制报文类型（首字节高 4 位）
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+SUBSCRIBE = 0x82  # 低 4 位固定为 0010
+SUBACK = 0x90
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+
+def encode_length(n):
+    # 剩余长度：每字节 7 位，最高位表示后面还有字节
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return out
+
+
+def encode_string(s):
+    if isinstance(s, str):
+        s = s.encode("utf-8")
+    return struct.pack("!H", len(s)) + s
+
+
+class MQTTClient:
+    """
+    精简的 MQTT 3.1.1 客户端（QoS 0 发布/订阅，收到 QoS 1 消息会回 PUBACK）。
+    - connect() 完成 CONNECT/CONNACK 后启动接收线程，消息经 on_message 回调；
+    - 接收线程在 keepalive/2 内没有收到任何报文时发送 PINGREQ，
+      超过 keepalive*1.5 仍无任何报文（包括 PINGRESP）判定连接失效；
+    - keepalive 按客户端发送计时：持续收到下行报文时接收不会超时，
+      距上次发送已过 keepalive/2 也发送 PINGREQ，避免服务端按 keepalive 断开连接；
+    - 发送在一把锁内整包写出，可在任意线程调用。
+    """
+
+    def __init__(self, client_id, server, port=1883, user=None, password=None, keepalive=90):
+        self.client_id = client_id
+        self.server = server
+        self.port = port
+        self.user = user
+        self.password = password
+        self.keepalive = keepalive
+        self.sock = None
+        self.connected = False
+        self.lock = _thread.allocate_lock()
+        self.packet_id = 0
+        self.last_rx = 0
+        self.last_tx = 0
+        self.on_message_callback = None
+        self.on_close_callback = None
+        self.pings = 0
+
+    def on_message(self, callback):
+        # callback(topic, payload)：topic 为 str，payload 为 bytes
+        self.on_message_callback = callback
+
+    def on_close(self, callback):
+        # 仅在连接被对端关闭或失效时回调，本地 disconnect() 不回调
+        self.on_close_callback = callback
+
+    def connect(self, clean_session=True, timeout=10):
+        addr = socket.getaddrinfo(self.server, self.port)[0][-1]
+        self.sock = socket.socket()
+        try:
+            self.sock.settimeout(timeout)
+            self.sock.connect(addr)
+            flags = 0x02 if clean_session else 0
+            payload = encode_string(self.client_id)
+            if self.user is not None:
+                flags |= 0x80
+                payload += encode_string(self.user)
+                if self.password is not None:
+                    flags |= 0x40
+                    payload += encode_string(self.password)
+            variable = encode_string("MQTT") + struct.pack("!BBH", 4, flags, self.keepalive)
+            self._write(CONNECT, variable + payload)
+            header, body = self._read_packet()
+            if header != CONNACK or len(body) != 2:
+                raise OSError("MQTT 握手响应异常: 0x%02x" % header)
+            if body[1] != 0:
+                raise OSError("MQTT 连接被拒绝, 返回码 %d" % body[1])
+        except Exception:
+            self.sock.close()
+            self.sock = None
+            raise
+        # 接收超时取 keepalive 的一半，超时即发送心跳
+        self.sock.settimeout(self.keepalive / 2 if self.keepalive else None)
+        self.last_rx = ticks_ms()
+        self.connected = True
+        _thread.start_new_thread(self._recv_loop, ())
+
+    def subscribe(self, topic, qos=0):
+        self.packet_id = self.packet_id % 0xFFFF + 1
+        self._write(SUBSCRIBE, struct.pack("!H", self.packet_id) + encode_string(topic) + bytes((qos,)))
+
+    def publish(self, topic, payload, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self._write(PUBLISH | (1 if retain else 0), encode_string(topic) + payload)
+
+    def ping(self):
+        self.pings += 1
+        self._write(PINGREQ, b"")
+
+    def disconnect(self):
+        if not self.sock:
+            return
+        self.connected = False
+        sock = self.sock
+        try:
+            self._write(DISCONNECT, b"")
+        except OSError:
+            pass
+        self.sock = None
+        sock.close()
+
+    def _write(self, header, body):
+        with self.lock:
+            if not self.sock:
+                raise OSError("MQTT 未连接")
+            self.sock.sendall(bytes((header,)) + encode_length(len(body)) + body)
+            self.last_tx = ticks_ms()
+
+    def _recv_exact(self, n):
+        data = b""
+        while len(data) < n:
+            chunk = self.sock.recv(n - len(data))
+            if not chunk:
+                raise OSError("MQTT 连接已关闭")
+            data += chunk
+        return data
+
+    def _read_packet(self):
+        # 只有在报文边界（首字节）上的超时才算空闲；报文读到一半超时，已读的字节无法放回，
+        # 继续读会与报文边界错位，改为抛出非超时错误，由接收线程关闭连接
+        header = self._recv_exact(1)[0]
+        try:
+            n = 0
+            shift = 0
+            while True:
+                byte = self._recv_exact(1)[0]
+                n |= (byte & 0x7F) << shift
+                if not byte & 0x80:
+                    break
+                shift += 7
+            return header, self._recv_exact(n) if n else b""
+        except OSError as e:
+            if self._is_timeout(e):
+                raise OSError("MQTT 报文接收中断")
+            raise
+
+    def _recv_loop(self):
+        try:
+            while self.connected:
+                try:
+                    header, body = self._read_packet()
+                except OSError as e:
+                    if not self.connected:
+                        break
+                    # 超时：空闲时发心跳，长时间无任何报文则判定失效
+                    if self.keepalive and ticks_diff(ticks_ms(), self.last_rx) < self.keepalive * 1500 \
+                            and self._is_timeout(e):
+                        try:
+                            self.ping()
+                            continue
+                        except OSError:
+                            pass
+                    print("MQTT 接收失败:", e)
+                    break
+                self.last_rx = ticks_ms()
+                kind = header & 0xF0
+                if kind == PUBLISH:
+                    self._on_publish(header, body)
+                if self.keepalive and ticks_diff(ticks_ms(), self.last_tx) >= self.keepalive * 500:
+                    self.ping()
+        except Exception as e:
+            # 报文格式错误或回调异常：同样走关闭流程，不让接收线程悄悄退出而连接看似仍然可用
+            print("MQTT 消息处理失败:", e)
+        remote = self.connected
+        self.connected = False
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        if remote and self.on_close_callback:
+            self.on_close_callback()
+
+    def _is_timeout(self, error):
+        # MicroPython 超时抛 OSError(ETIMEDOUT)，CPython 抛 socket.timeout（OSError 子类）
+        return "timed out" in str(error) or (error.args and error.args[0] in (110, 116))
+
+    def _on_publish(self, header, body):
+        n = struct.unpack_from("!H", body, 0)[0]
+        topic = str(body[2:2 + n], "utf-8")
+        offset = 2 + n
+        qos = (header >> 1) & 0x03
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+            self._write(PUBACK, packet_id)
+        if self.on_message_callback:
+            self.on_message_callback(topic, body[offset:])
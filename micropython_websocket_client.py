@@ -2,98 +2,849 @@ import usocket as socket
 import ustruct as struct
 import time
 import json
+import io
+import os
+import sys
+import _thread
+from utils.ticks import ticks_ms, ticks_diff
 from wificonnections import do_connect
 
+try:
+    import deflate  # MicroPython 1.21+
+except ImportError:
+    deflate = None
+try:
+    import zlib
+except ImportError:
+    zlib = None
+
+# WebSocket 操作码
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+# 帧首字节的 RSV1 位：permessage-deflate 压缩的消息。与 opcode 一起传给 FrameWriter 即置位
+RSV1 = 0x40
+
+
+class FrameReader:
+    """
+    基于预分配接收缓冲区与 readinto 的帧读取器。
+    - 短读：按需多次 readinto，直到凑够头部/负载；
+    - 分片：FIN=0 的帧与后续 continuation 帧拼接到预分配的消息缓冲区；
+    - 控制帧：ping 自动回 pong，close 回复后结束，可插在分片之间；
+    - 未分片且不超过接收缓冲区的消息直接返回缓冲区内的 memoryview，不做拷贝。
+    返回的 memoryview 仅在下一次读取前有效。
+    """
+
+    def __init__(self, sock, buffer_size=4096, max_message=32768):
+        self.sock = sock
+        self._readinto = getattr(sock, "readinto", None) or sock.recv_into
+        # 两块接收缓冲区交替使用：整理剩余数据时拷到另一块再交换，避免重叠拷贝与临时分配
+        self._bufs = (bytearray(buffer_size), bytearray(buffer_size))
+        self._views = (memoryview(self._bufs[0]), memoryview(self._bufs[1]))
+        self._active = 0
+        self.buf = self._bufs[0]
+        self.view = self._views[0]
+        self.start = 0
+        self.end = 0
+        self.message = bytearray(max_message)
+        self.message_view = memoryview(self.message)
+        self.on_control = None  # on_control(opcode, payload)，ping/pong/close 时回调
+        self.rsv1 = 0
+        self.closed = False
+        self.frames = 0
+        self.messages = 0
+        self.bytes_copied = 0
+
+    def _recv_some(self, dest):
+        n = self._readinto(dest)
+        if not n:
+            self.closed = True
+            raise OSError("WebSocket 连接已关闭")
+        return n
+
+    def _fill(self, n):
+        """确保缓冲区中至少有 n 个未消费的字节"""
+        if self.end - self.start >= n:
+            return
+        if self.start + n > len(self.buf):
+            remaining = self.end - self.start
+            other = 1 - self._active
+            if remaining:
+                self._bufs[other][:remaining] = self.view[self.start:self.end]
+                self.bytes_copied += remaining
+            self._active = other
+            self.buf = self._bufs[other]
+            self.view = self._views[other]
+            self.start = 0
+            self.end = remaining
+        while self.end - self.start < n:
+            self.end += self._recv_some(self.view[self.end:])
+
+    def read_until(self, marker):
+        """读取到 marker（含）为止的字节，用于 HTTP 握手响应；之后的数据留在缓冲区"""
+        while True:
+            index = bytes(self.view[self.start:self.end]).find(marker)
+            if index >= 0:
+                end = self.start + index + len(marker)
+                data = bytes(self.view[self.start:end])
+                self.start = end
+                return data
+            if self.end - self.start >= len(self.buf):
+                raise OSError("HTTP 响应头过长")
+            self._fill(self.end - self.start + 1)
+
+    def _read_header(self):
+        self._fill(2)
+        buf = self.buf
+        s = self.start
+        b0 = buf[s]
+        b1 = buf[s + 1]
+        length = b1 & 0x7F
+        size = 2
+        if length == 126:
+            self._fill(4)
+            buf = self.buf
+            s = self.start
+            length = (buf[s + 2] << 8) | buf[s + 3]
+            size = 4
+        elif length == 127:
+            self._fill(10)
+            buf = self.buf
+            s = self.start
+            length = struct.unpack_from(">Q", buf, s + 2)[0]
+            size = 10
+        mask = None
+        if b1 & 0x80:
+            # 服务端帧不应带掩码，但按协议兼容处理
+            self._fill(size + 4)
+            s = self.start
+            mask = bytes(self.view[s + size:s + size + 4])
+            size += 4
+        self.start += size
+        self.frames += 1
+        self.rsv1 = b0 & RSV1
+        return b0 & 0x80, b0 & 0x0F, length, mask
+
+    def _read_payload(self, length, mask):
+        """负载不超过接收缓冲区时，原地返回 memoryview"""
+        self._fill(length)
+        payload = self.view[self.start:self.start + length]
+        self.start += length
+        if mask:
+            _unmask(payload, mask)
+        return payload
+
+    def _read_into(self, dest, mask):
+        """把 len(dest) 字节的负载读入 dest：先取缓冲区中已有部分，其余直接从 socket 读入"""
+        length = len(dest)
+        buffered = min(length, self.end - self.start)
+        if buffered:
+            dest[:buffered] = self.view[self.start:self.start + buffered]
+            self.start += buffered
+            self.bytes_copied += buffered
+        pos = buffered
+        while pos < length:
+            pos += self._recv_some(dest[pos:])
+        if mask:
+            _unmask(dest, mask)
+
+    def recv_message(self):
+        """读取一条完整消息，返回 (opcode, memoryview)；连接关闭时返回 (OP_CLOSE, payload)。
+        permessage-deflate 压缩的消息 opcode 带 RSV1 位"""
+        msg_len = 0
+        msg_opcode = OP_CONT
+        while True:
+            fin, opcode, length, mask = self._read_header()
+            if opcode >= OP_CLOSE:
+                if length > 125:
+                    raise OSError("控制帧过长")
+                payload = self._read_payload(length, mask)
+                if self.on_control:
+                    self.on_control(opcode, payload)
+                if opcode == OP_CLOSE:
+                    self.closed = True
+                    return OP_CLOSE, payload
+                continue
+            if opcode != OP_CONT:
+                msg_opcode = opcode | self.rsv1  # 压缩消息只在首帧置 RSV1
+            if fin and msg_len == 0 and length <= len(self.buf):
+                self.messages += 1
+                return msg_opcode, self._read_payload(length, mask)
+            # 分片或超大消息：拼接到消息缓冲区
+            if msg_len + length > len(self.message):
+                raise OSError("消息过长: %d" % (msg_len + length))
+            self._read_into(self.message_view[msg_len:msg_len + length], mask)
+            msg_len += length
+            if fin:
+                self.messages += 1
+                return msg_opcode, self.message_view[:msg_len]
+
+
+def _unmask(payload, mask):
+    for i in range(len(payload)):
+        payload[i] ^= mask[i & 3]
+
+
+# 负载在输出缓冲区中的起始偏移：4 字节对齐，前面留出最长 14 字节的帧头空间
+_PAYLOAD_OFFSET = 16
+
+if sys.implementation.name == "micropython":
+    import micropython
+    import uctypes
+
+    @micropython.viper
+    def _mask_words(addr: int, n: int, mask: int):
+        # 按 32 位字原地异或掩码，addr 由调用方保证 4 字节对齐
+        p32 = ptr32(addr)
+        words = n >> 2
+        i = 0
+        while i < words:
+            p32[i] = p32[i] ^ mask
+            i += 1
+        p8 = ptr8(addr)
+        i = words << 2
+        while i < n:
+            p8[i] = p8[i] ^ ((mask >> ((i & 3) << 3)) & 0xFF)
+            i += 1
+
+    def _apply_mask(buf, n, mask):
+        mask32 = int.from_bytes(mask, "little")
+        if mask32 & 0x80000000:
+            mask32 -= 0x100000000  # viper 参数按有符号 32 位传入
+        _mask_words(uctypes.addressof(buf) + _PAYLOAD_OFFSET, n, mask32)
+else:
+    def _apply_mask(buf, n, mask):
+        # CPython：整段按大整数异或，在 C 层按机器字处理
+        view = memoryview(buf)[_PAYLOAD_OFFSET:_PAYLOAD_OFFSET + n]
+        key = int.from_bytes((mask * ((n + 3) // 4))[:n], "little")
+        view[:] = (int.from_bytes(view, "little") ^ key).to_bytes(n, "little")
+
+
+class FrameWriter:
+    """
+    带掩码的帧发送器。
+    负载先整块拷入可复用的输出缓冲区（偏移 16，4 字节对齐），在原地按字异或掩码，
+    帧头直接写在负载前面的预留空间里，一次 write 发出，不拼接、不逐帧分配。
+    send_frames 把一批小帧依次拷入合并缓冲区后一次写出，大帧直接写出。
+    多个线程共用同一个输出缓冲区，发送过程加锁。
+    """
+
+    def __init__(self, sock, buffer_size=4096, write=None, coalesce_size=1460):
+        self.sock = sock
+        # write: 可选的写函数（如异步流的 write），默认使用 sock.write / sock.sendall
+        self._write = write or getattr(sock, "write", None) or sock.sendall
+        self._out = bytearray(_PAYLOAD_OFFSET + buffer_size)
+        self._view = memoryview(self._out)
+        # 合并缓冲区默认取一个 TCP 报文段的大小
+        self._batch = bytearray(coalesce_size)
+        self._batch_view = memoryview(self._batch)
+        self.lock = _thread.allocate_lock()
+        self.frames = 0
+        self.writes = 0
+        self.bytes_sent = 0
+
+    def _encode(self, opcode, data):
+        """编码一帧，返回输出缓冲区中的 memoryview，在下一次编码前有效"""
+        n = len(data)
+        if _PAYLOAD_OFFSET + n > len(self._out):
+            # 超出预分配大小时扩容一次，之后继续复用
+            self._out = bytearray(_PAYLOAD_OFFSET + n)
+            self._view = memoryview(self._out)
+        out = self._out
+        mask = os.urandom(4)
+        if n <= 125:
+            start = _PAYLOAD_OFFSET - 6
+            out[start + 1] = 0x80 | n
+        elif n <= 65535:
+            start = _PAYLOAD_OFFSET - 8
+            out[start + 1] = 0x80 | 126
+            struct.pack_into(">H", out, start + 2, n)
+        else:
+            start = _PAYLOAD_OFFSET - 14
+            out[start + 1] = 0x80 | 127
+            struct.pack_into(">Q", out, start + 2, n)
+        out[start] = 0x80 | opcode
+        out[_PAYLOAD_OFFSET - 4:_PAYLOAD_OFFSET] = mask
+        if n:
+            self._view[_PAYLOAD_OFFSET:_PAYLOAD_OFFSET + n] = data
+            _apply_mask(out, n, mask)
+        self.frames += 1
+        return self._view[start:_PAYLOAD_OFFSET + n]
+
+    def _flush(self, data):
+        self._write(data)
+        self.writes += 1
+        self.bytes_sent += len(data)
+
+    def send_frame(self, opcode, data):
+        with self.lock:
+            self._flush(self._encode(opcode, data))
+
+    def send_frames(self, frames):
+        # frames: [(opcode, data), ...]，按顺序发送，相邻小帧合并为一次写
+        batch = self._batch_view
+        with self.lock:
+            pos = 0
+            for opcode, data in frames:
+                frame = self._encode(opcode, data)
+                n = len(frame)
+                if pos + n > len(batch):
+                    if pos:
+                        self._flush(batch[:pos])
+                        pos = 0
+                    if n > len(batch):
+                        self._flush(frame)
+                        continue
+                batch[pos:pos + n] = frame
+                pos += n
+            if pos:
+                self._flush(batch[:pos])
+
+
+# 发送队列的优先级通道，数值越小越先发送
+LANE_PROTOCOL = 0  # pong/close 等协议控制帧
+LANE_AUDIO = 1     # 上行音频
+LANE_CONTROL = 2   # JSON 控制消息（listen/iot 等）
+
+
+class SendQueue:
+    """
+    每个连接一个的发送队列。
+    - 按通道优先级出队：协议控制帧 > 音频 > JSON 控制消息，同一通道内保持先后顺序；
+    - 按字节计的高水位：排队字节数达到 high_water 进入背压状态，降到 low_water 以下解除，
+      可通过 backpressure 属性或 on_backpressure(active) 回调通知生产者；
+      背压期间新的音频帧直接拒绝（过时的音频没有意义），控制消息在 2 倍高水位以内仍然接收，
+      协议控制帧总是接收；put 返回 False 表示被拒绝；
+    - 出队按批取出，由 FrameWriter.send_frames 合并小帧写出。
+    入队时会拷贝非 bytes 的数据，调用方可以立即复用自己的缓冲区。
+    一个音频帧因此最多拷贝三次：入队、FrameWriter 加掩码（掩码不能改调用方的数据，这一次省不掉）、
+    小帧拷入合并缓冲区（超过 coalesce_size 的帧直接写出，没有这一次）。
+    不再复用缓冲区的调用方可以用 put(..., copy=False) 移交所有权，省掉入队的拷贝；
+    PacketBuilder 这类每帧复用的缓冲区必须保留默认的拷贝。
+    """
+
+    def __init__(self, high_water=8192, low_water=None, batch_bytes=4096):
+        self.high_water = high_water
+        self.low_water = high_water // 2 if low_water is None else low_water
+        self.batch_bytes = batch_bytes
+        self.lanes = ([], [], [])
+        self.lock = _thread.allocate_lock()
+        self._signal = _thread.allocate_lock()
+        self._signal.acquire()
+        self.on_ready = None         # 有数据入队时回调（异步客户端用来唤醒写任务）
+        self.on_backpressure = None  # on_backpressure(active)
+        self.backpressure = False
+        self.closed = False
+        self.queued_frames = 0
+        self.queued_bytes = 0
+        self.max_queued_frames = 0
+        self.max_queued_bytes = 0
+        self.dropped = 0
+        self.batches = 0
+        self.stall_start = 0
+        self.stall_ms = 0
+        self.max_stall_ms = 0
+        self.stalls = 0
+
+    def _fits(self, total, lane):
+        return not (lane == LANE_AUDIO and total > self.high_water or
+                    lane == LANE_CONTROL and total > 2 * self.high_water)
+
+    def has_room(self, n, lane=LANE_CONTROL, count_drop=False):
+        # count_drop: 放不下时计入 dropped（调用方因此放弃这一帧）
+        with self.lock:
+            room = not self.closed and self._fits(self.queued_bytes + n, lane)
+            if not room and count_drop:
+                self.dropped += 1
+            return room
+
+    def put(self, opcode, data, lane=LANE_CONTROL, force=False, copy=True):
+        # force: 跳过水位检查（调用方已用 has_room 确认过，且这一帧不能丢）
+        # copy=False: data 为按字节计长的 bytes/bytearray/memoryview，调用方在发出前不再修改它
+        if copy and not isinstance(data, bytes):
+            data = bytes(data)
+        n = len(data)
+        with self.lock:
+            if self.closed:
+                return False
+            total = self.queued_bytes + n
+            accepted = force or self._fits(total, lane)
+            if accepted:
+                self.lanes[lane].append((opcode, data))
+                self.queued_frames += 1
+                self.queued_bytes = total
+                if self.queued_frames > self.max_queued_frames:
+                    self.max_queued_frames = self.queued_frames
+                if total > self.max_queued_bytes:
+                    self.max_queued_bytes = total
+            else:
+                self.dropped += 1
+            # 高水位以上（或已经放不下这一帧）即进入背压状态
+            changed = not self.backpressure and total >= self.high_water
+            if changed:
+                self.backpressure = True
+                self.stall_start = ticks_ms()
+                self.stalls += 1
+        if accepted:
+            self._notify()
+        if changed and self.on_backpressure:
+            self.on_backpressure(True)
+        return accepted
+
+    def _notify(self):
+        if self._signal.locked():
+            try:
+                self._signal.release()
+            except RuntimeError:
+                pass  # 另一个生产者已经唤醒过
+        if self.on_ready:
+            self.on_ready()
+
+    def get_batch(self):
+        """按优先级取出一批帧（约 batch_bytes 字节），队列为空时返回空列表"""
+        batch = []
+        size = 0
+        changed = False
+        with self.lock:
+            for lane in self.lanes:
+                while lane and (not batch or size + len(lane[0][1]) <= self.batch_bytes):
+                    item = lane.pop(0)
+                    batch.append(item)
+                    size += len(item[1])
+                if size >= self.batch_bytes:
+                    break
+            if batch:
+                self.batches += 1
+                self.queued_frames -= len(batch)
+                self.queued_bytes -= size
+            if self.backpressure and self.queued_bytes <= self.low_water:
+                self.backpressure = False
+                stalled = ticks_diff(ticks_ms(), self.stall_start)
+                self.stall_ms += stalled
+                if stalled > self.max_stall_ms:
+                    self.max_stall_ms = stalled
+                changed = True
+        if changed and self.on_backpressure:
+            self.on_backpressure(False)
+        return batch
+
+    def wait(self):
+        """供发送线程使用：阻塞到有数据（或队列关闭）后取出一批；关闭且为空时返回 None"""
+        while True:
+            batch = self.get_batch()
+            if batch:
+                return batch
+            if self.closed:
+                return None
+            self._signal.acquire()
+
+    def close(self):
+        self.closed = True
+        self._notify()
+
+    def get_stats(self):
+        with self.lock:
+            stall_ms = self.stall_ms
+            if self.backpressure:
+                stall_ms += ticks_diff(ticks_ms(), self.stall_start)
+            return {
+                "queued_frames": self.queued_frames,
+                "queued_bytes": self.queued_bytes,
+                "lane_depths": [len(lane) for lane in self.lanes],
+                "max_queued_frames": self.max_queued_frames,
+                "max_queued_bytes": self.max_queued_bytes,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "backpressure": self.backpressure,
+                "stalls": self.stalls,
+                "stall_ms": stall_ms,
+                "max_stall_ms": self.max_stall_ms,
+            }
+
+
+def parse_url(url):
+    if not url.startswith("ws://"):
+        raise ValueError("仅支持 ws:// 协议")
+    url = url[5:]
+    if "/" in url:
+        host, path = url.split("/", 1)
+        path = "/" + path
+    else:
+        host = url
+        path = "/"  # 默认路径为 "/"
+    if ":" in host:
+        host, port = host.split(":")
+        port = int(port)
+    else:
+        port = 80
+    return host, port, path
+
+
+def handshake_request(host, port, path, access_token, device_mac, device_uuid, extensions=None):
+    # 构造 WebSocket 握手请求
+    headers = [
+        f"GET {path} HTTP/1.1",
+        f"Host: {host}:{port}",
+        "Upgrade: websocket",
+        "Connection: Upgrade",
+        "Sec-WebSocket-Key: x3JJHMbDL1EzLkh9GBhXDw==",
+        "Sec-WebSocket-Version: 13",
+        f"Authorization: Bearer {access_token}",
+        f"Protocol-Version: 1",
+        f"Device-Id: {device_mac}",
+        f"Client-Id: {device_uuid}",
+        "\r\n"
+    ]
+    if extensions:
+        headers.insert(-1, f"Sec-WebSocket-Extensions: {extensions}")
+    return "\r\n".join(headers).encode("utf-8")
+
+
+def response_header(response, name):
+    # 从 HTTP 响应头中取出指定字段（不区分大小写），没有时返回 None
+    name = name.lower() + ":"
+    for line in response.split("\r\n"):
+        if line.lower().startswith(name):
+            return line[len(name):].strip()
+    return None
+
+
+_DEFLATE_TAIL = b"\x00\x00\xff\xff"
+_FINAL_BLOCK = b"\x03\x00"  # 空的最终静态块，让一次性解压的 DeflateIO 正常结束
+
+
+class PerMessageDeflate:
+    """
+    permessage-deflate 扩展（RFC 7692），用于 JSON 文本消息，音频不压缩。
+    - window_bits：滑动窗口位数（9~15），同时作为对服务端的 server_max_window_bits，
+      ESP32 上取 10 即 1 KB 窗口；
+    - threshold：短于该字节数的消息不压缩，按普通帧发送；
+    - context_takeover：跨消息保留压缩上下文，后续消息可以引用前面消息里重复的键名。
+      CPython 的 zlib 支持同步刷新，可以保留上下文；MicroPython 的 deflate.DeflateIO
+      每条消息必须独立结束，因此在 MicroPython 上总是协商 no_context_takeover。
+    """
+
+    def __init__(self, window_bits=10, threshold=64, context_takeover=True):
+        self.threshold = threshold
+        self.streaming = zlib is not None and hasattr(zlib, "compressobj")
+        self.available = self.streaming or deflate is not None
+        # 配置值只用于握手提议；每次握手的协商结果另存，不影响下一次连接的提议
+        self.max_window_bits = max(9, min(15, window_bits))
+        self.allow_context_takeover = context_takeover and self.streaming
+        self._negotiate(self.allow_context_takeover, self.allow_context_takeover,
+                        self.max_window_bits, self.max_window_bits)
+        self.messages = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _negotiate(self, context_takeover, server_context_takeover, window_bits, server_window_bits):
+        self.context_takeover = context_takeover
+        self.server_context_takeover = server_context_takeover
+        self.window_bits = window_bits
+        self.server_window_bits = server_window_bits
+        # 新连接的两端都从空窗口开始，不能沿用上一条连接的压缩/解压上下文
+        self._compressor = None
+        self._decompressor = None
+
+    def offer(self):
+        params = ["permessage-deflate", "client_max_window_bits=%d" % self.max_window_bits,
+                  "server_max_window_bits=%d" % self.max_window_bits]
+        if not self.allow_context_takeover:
+            params += ["client_no_context_takeover", "server_no_context_takeover"]
+        return "; ".join(params)
+
+    def accept(self, header):
+        """解析服务端返回的 Sec-WebSocket-Extensions，服务端同意时返回 True"""
+        if not header:
+            return False
+        params = [p.strip() for p in header.split(";")]
+        if params[0] != "permessage-deflate":
+            return False
+        context_takeover = self.allow_context_takeover
+        server_context_takeover = True
+        window_bits = self.max_window_bits
+        server_window_bits = self.max_window_bits
+        for param in params[1:]:
+            name, _, value = param.partition("=")
+            name = name.strip()
+            value = value.strip().strip('"')
+            if name == "client_no_context_takeover":
+                context_takeover = False
+            elif name == "server_no_context_takeover":
+                server_context_takeover = False
+            elif name == "client_max_window_bits" and value:
+                window_bits = max(9, min(window_bits, int(value)))
+            elif name == "server_max_window_bits" and value:
+                server_window_bits = int(value)
+        if server_context_takeover and not self.streaming:
+            # DeflateIO 每条消息独立解压，服务端必须确认 server_no_context_takeover，否则不启用压缩
+            print("服务端未确认 server_no_context_takeover，禁用 permessage-deflate")
+            return False
+        self._negotiate(context_takeover, server_context_takeover, window_bits, server_window_bits)
+        return True
+
+    def compress(self, data):
+        if self.streaming:
+            if self._compressor is None or not self.context_takeover:
+                self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -self.window_bits)
+            out = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            if out.endswith(_DEFLATE_TAIL):
+                out = out[:-4]
+        else:
+            buf = io.BytesIO()
+            f = deflate.DeflateIO(buf, deflate.RAW, self.window_bits)
+            f.write(data)
+            f.close()  # 写出最终块，buf 保持打开
+            out = buf.getvalue()
+        self.messages += 1
+        self.bytes_in += len(data)
+        self.bytes_out += len(out)
+        return out
+
+    def decompress(self, data):
+        data = bytes(data) + _DEFLATE_TAIL
+        if self.streaming:
+            if self._decompressor is None or not self.server_context_takeover:
+                self._decompressor = zlib.decompressobj(-self.server_window_bits)
+            return self._decompressor.decompress(data)
+        f = deflate.DeflateIO(io.BytesIO(data + _FINAL_BLOCK), deflate.RAW, self.server_window_bits)
+        return f.read()
+
+
 class WebSocketClient:
-    def __init__(self, url, access_token, device_mac, device_uuid):
+    def __init__(self, url, access_token, device_mac, device_uuid, compression=None):
         self.url = url
         self.access_token = access_token
         self.device_mac = device_mac
         self.device_uuid = device_uuid
+        # compression: PerMessageDeflate 实例，握手时提出 permessage-deflate；服务端同意后 self.deflate 生效
+        if compression and not compression.available:
+            print("当前固件不支持压缩，禁用 permessage-deflate")
+            compression = None
+        self.compression = compression
+        self.deflate = None
+        self._compress_lock = _thread.allocate_lock()
         self.sock = None
+        self.reader = None
+        self.writer = None
+        self.queue = None
+        self._sending = False
+        self._receiving = False
+        self.connected = False
+        self.on_message_callback = None
+        self.on_binary_callback = None
+        self.on_close_callback = None
+        self.on_pong_callback = None
+        # 最近一次连接各阶段耗时（毫秒）：DNS、TCP、首字节（自连接开始）、握手完成（自连接开始）
+        self.timings = None
 
-    def connect(self):
+    def connect(self, addr=None):
+        # addr: 已解析的地址（如来自 DNS 缓存），为 None 时现场解析
+        start = ticks_ms()
         # 解析 WebSocket URL
         host, port, path = self._parse_url(self.url)
-        
+        if addr is None:
+            addr = socket.getaddrinfo(host, port)[0][-1]
+        resolved = ticks_ms()
+
         # 建立 TCP 连接
-        addr = socket.getaddrinfo(host, port)[0][-1]
         self.sock = socket.socket()
-        self.sock.connect(addr)
-        
-        # 发送 WebSocket 握手请求
-        self._handshake(host, port, path)
+        try:
+            self.sock.connect(addr)
+            connected = ticks_ms()
+            self.reader = FrameReader(self.sock)
+            self.reader.on_control = self._on_control
+            self.writer = FrameWriter(self.sock)
+
+            # 发送 WebSocket 握手请求
+            self._handshake(host, port, path)
+        except Exception:
+            self.sock.close()
+            self.sock = None
+            raise
+        self.timings = {
+            "dns_ms": ticks_diff(resolved, start),
+            "tcp_ms": ticks_diff(connected, resolved),
+            "ttfb_ms": ticks_diff(self._first_byte, start),
+            "handshake_ms": ticks_diff(ticks_ms(), start),
+        }
+
+        # 所有出站帧经发送队列由发送线程写出
+        self.queue = SendQueue()
+        self._sending = True
+        self.connected = True
+        _thread.start_new_thread(self._send_loop, ())
+        if self.on_message_callback or self.on_binary_callback:
+            self._start_receiving()
+
+    def on_message(self, callback):
+        # callback(message)：文本消息为 str，二进制消息为 bytes（未注册 on_binary 时）；注册后由接收线程回调
+        self.on_message_callback = callback
+        if self.connected:
+            self._start_receiving()
+
+    def on_binary(self, callback):
+        # callback(data)：二进制消息按操作码直接分发到这里，不经过 on_message
+        self.on_binary_callback = callback
+        if self.connected:
+            self._start_receiving()
+
+    def on_close(self, callback):
+        # 仅在连接被对端关闭或出错时回调，本地 close() 不回调
+        self.on_close_callback = callback
+
+    def _start_receiving(self):
+        if not self._receiving:
+            self._receiving = True
+            _thread.start_new_thread(self._recv_loop, ())
+
+    def _recv_loop(self):
+        try:
+            while True:
+                message = self.recv()
+                if message is None:
+                    break
+                # recv() 按帧操作码解码：文本为 str，二进制为 memoryview
+                if isinstance(message, str):
+                    if self.on_message_callback:
+                        self.on_message_callback(message)
+                else:
+                    callback = self.on_binary_callback or self.on_message_callback
+                    if callback:
+                        callback(bytes(message))  # memoryview 在下一次接收前有效
+        except OSError as e:
+            if self.sock:
+                print("WebSocket 接收失败:", e)
+        except Exception as e:
+            # 消息处理出错同样走关闭流程，不让接收线程退出后连接仍显示为已连接
+            print("WebSocket 消息处理失败:", e)
+        self._receiving = False
+        remote = self.connected
+        self.connected = False
+        if self.queue:
+            self.queue.close()
+        if remote and self.on_close_callback:
+            self.on_close_callback()
 
     def _parse_url(self, url):
-        if not url.startswith("ws://"):
-            raise ValueError("仅支持 ws:// 协议")
-        url = url[5:]
-        if "/" in url:
-            host, path = url.split("/", 1)
-            path = "/" + path
-        else:
-            host = url
-            path = "/"  # 默认路径为 "/"
-        if ":" in host:
-            host, port = host.split(":")
-            port = int(port)
-        else:
-            port = 80
-        return host, port, path
+        return parse_url(url)
 
     def _handshake(self, host, port, path):
-        # 构造 WebSocket 握手请求
-        headers = [
-            f"GET {path} HTTP/1.1",
-            f"Host: {host}:{port}",
-            "Upgrade: websocket",
-            "Connection: Upgrade",
-            "Sec-WebSocket-Key: x3JJHMbDL1EzLkh9GBhXDw==",
-            "Sec-WebSocket-Version: 13",
-            f"Authorization: Bearer {self.access_token}",
-            f"Protocol-Version: 1",
-            f"Device-Id: {self.device_mac}",
-            f"Client-Id: {self.device_uuid}",
-            "\r\n"
-        ]
-        self.sock.send("\r\n".join(headers).encode("utf-8"))
-        
-        # 读取服务器响应
-        response = self.sock.recv(1024).decode("utf-8")
+        # 发送 WebSocket 握手请求
+        offer = self.compression.offer() if self.compression else None
+        self.sock.send(handshake_request(host, port, path, self.access_token, self.device_mac, self.device_uuid,
+                                         offer))
+        self.reader._fill(1)
+        self._first_byte = ticks_ms()
+
+        # 读取服务器响应，响应头之后紧跟的帧数据留在读取器缓冲区中
+        response = self.reader.read_until(b"\r\n\r\n").decode("utf-8")
         if "101 Switching Protocols" not in response:
             raise OSError("WebSocket 握手失败")
+        self.deflate = None
+        if self.compression and self.compression.accept(response_header(response, "Sec-WebSocket-Extensions")):
+            self.deflate = self.compression
 
-    def send(self, message):
-        # 发送 WebSocket 数据帧
-        frame = self._create_frame(message)
-        self.sock.send(frame)
-
-    def _create_frame(self, message):
-        # 创建 WebSocket 数据帧
-        message = message.encode("utf-8")
-        length = len(message)
-        if length <= 125:
-            header = struct.pack("B", 0x81) + struct.pack("B", length)
-        elif length <= 65535:
-            header = struct.pack("B", 0x81) + struct.pack("B", 126) + struct.pack(">H", length)
-        else:
-            header = struct.pack("B", 0x81) + struct.pack("B", 127) + struct.pack(">Q", length)
-        return header + message
+    def send(self, message, lane=LANE_CONTROL):
+        # 发送 WebSocket 数据帧：str 按文本帧发送，字节类数据按二进制帧发送
+        # 只入队，返回 False 表示因背压被拒绝
+        if isinstance(message, str):
+            data = message.encode("utf-8")
+            if self.deflate and lane == LANE_CONTROL and len(data) >= self.deflate.threshold:
+                return self._send_compressed(data, lane)
+            return self.queue.put(OP_TEXT, data, lane)
+        return self.queue.put(OP_BINARY, message, lane)
+
+    def _send_compressed(self, data, lane):
+        # 保留上下文时压缩顺序必须与发送顺序一致，压缩与入队在同一把锁内完成；
+        # 压缩前先确认队列放得下，避免压缩上下文里多出一条对端没有收到的消息
+        with self._compress_lock:
+            if not self.queue.has_room(len(data), lane, count_drop=True):
+                return False
+            return self.queue.put(OP_TEXT | RSV1, self.deflate.compress(data), lane, force=True)
+
+    def send_binary(self, data, lane=LANE_AUDIO, copy=True):
+        # 音频等二进制数据：data 可以是 bytes/bytearray/memoryview/array，入队时拷贝一次；
+        # copy=False 时移交缓冲区所有权，不拷贝（见 SendQueue）
+        return self.queue.put(OP_BINARY, data, lane, copy=copy)
+
+    def _send_control(self, opcode, payload=b""):
+        # 客户端发出的帧必须带掩码（RFC 6455 5.3），由 FrameWriter 统一处理
+        self.queue.put(opcode, payload, LANE_PROTOCOL)
+
+    def _send_loop(self):
+        try:
+            while True:
+                batch = self.queue.wait()
+                if batch is None:
+                    break
+                self.writer.send_frames(batch)
+        except OSError as e:
+            print("WebSocket 发送失败:", e)
+            self.queue.close()
+        self._sending = False
+
+    def get_send_stats(self):
+        return self.queue.get_stats() if self.queue else None
+
+    def _on_control(self, opcode, payload):
+        if opcode == OP_PING:
+            self._send_control(OP_PONG, payload)
+        elif opcode == OP_PONG:
+            if self.on_pong_callback:
+                self.on_pong_callback(bytes(payload))
+        elif opcode == OP_CLOSE and not self.reader.closed:
+            self._send_control(OP_CLOSE, payload[:2])
+
+    def ping(self, payload=b""):
+        # 发送 ping，对端的 pong 经 on_pong 回调返回（需要接收线程或调用方在读取消息）
+        self._send_control(OP_PING, payload)
+
+    def on_pong(self, callback):
+        # callback(payload)
+        self.on_pong_callback = callback
+
+    def recv_message(self):
+        """接收一条消息，返回 (opcode, memoryview)，memoryview 在下一次接收前有效"""
+        return self.reader.recv_message()
 
     def recv(self):
-        # 接收 WebSocket 数据帧
-        header = self.sock.recv(2)
-        if not header:
+        # 接收 WebSocket 消息：文本返回 str，二进制返回 memoryview，连接关闭返回 None
+        try:
+            opcode, payload = self.reader.recv_message()
+        except OSError:
+            if self.reader.closed:
+                return None
+            raise
+        if opcode == OP_CLOSE:
             return None
-        length = header[1] & 0x7F
-        if length == 126:
-            length = struct.unpack(">H", self.sock.recv(2))[0]
-        elif length == 127:
-            length = struct.unpack(">Q", self.sock.recv(8))[0]
-        return self.sock.recv(length).decode("utf-8")
+        if opcode & RSV1:
+            if not self.deflate:
+                raise OSError("收到未协商的压缩消息")
+            payload = self.deflate.decompress(payload)
+            opcode &= 0x0F
+        if opcode == OP_TEXT:
+            try:
+                return str(payload, "utf-8")
+            except UnicodeError:
+                # 文本帧不是合法 UTF-8：以 1007 关闭（RFC 6455 7.4.1），由接收线程走关闭流程
+                self._send_control(OP_CLOSE, b"\x03\xef")
+                raise OSError("文本消息不是合法的 UTF-8")
+        return payload
 
     def close(self):
-        # 关闭 WebSocket 连接
+        # 关闭 WebSocket 连接：先让发送线程写完已入队的数据（最多等待约 1 秒）
+        self.connected = False
+        if self.queue:
+            self.queue.close()
+            for _ in range(100):
+                if not self._sending:
+                    break
+                time.sleep_ms(10)
         if self.sock:  # 检查 self.sock 是否为 None
             self.sock.close()
             self.sock = None  # 确保关闭后将 self.sock 设置为 None
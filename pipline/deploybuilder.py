@@ -7,7 +7,9 @@ import time
 import logging
 import subprocess  # 用于调用外部命令
 
-rootfiles = ["application.py", "main.py"]
+# protocol/ 依赖根目录下的客户端模块，micropython_websocket_client.py 又引用了 wificonnections.py
+rootfiles = ["application.py", "main.py", "micropython_websocket_client.py", "async_websocket_client.py",
+             "micropython_mqtt_client.py", "wificonnections.py"]
 rootdir = "../"
 subdirs = [{
     "dir": "board",
@@ -21,6 +23,9 @@ subdirs = [{
 }, {
     "dir":"utils",
     "files": ["**"]
+}, {
+    "dir":"audio",
+    "files": ["**"]
 }]
 
 to_config = "./deploy.json"
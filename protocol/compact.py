@@ -0,0 +1,254 @@
+import struct
+
+# Compact control-message encoding: a MessagePack subset (nil, bool, int, float,
+# str, bin, array, map). Keys listed in KEYS travel as positive fixints, and the
+# top-level values listed in ENUMS travel as positive fixints as well. Both
+# tables are part of ENCODING: any change to them needs a new version string.
+# Once negotiated in the hello exchange, every binary frame starts with a one
+# byte kind (FRAME_AUDIO / FRAME_MESSAGE); text frames stay JSON.
+ENCODING = "msgpack/1"
+
+FRAME_AUDIO = 0
+FRAME_MESSAGE = 1
+AUDIO_HEADER = bytes((FRAME_AUDIO,))
+MESSAGE_HEADER = bytes((FRAME_MESSAGE,))
+
+KEYS = (
+    "type", "state", "mode", "reason", "text", "session_id", "update", "descriptors",
+    "states", "commands", "name", "method", "parameters", "description", "properties",
+    "methods", "emotion", "audio_params", "format", "sample_rate", "channels",
+    "frame_duration", "version", "transport", "encoding", "encodings",
+)
+
+ENUMS = {
+    "type": ("hello", "listen", "abort", "iot", "tts", "stt", "llm", "goodbye"),
+    "state": ("start", "stop", "detect", "sentence_start", "sentence_end"),
+    "mode": ("auto", "manual", "realtime"),
+    "reason": ("wake_word_detected",),
+}
+
+_KEY_IDS = {key: i for i, key in enumerate(KEYS)}
+_ENUM_IDS = {key: {value: i for i, value in enumerate(values)} for key, values in ENUMS.items()}
+
+# type byte -> (struct format, size) for fixed-size scalars
+_SCALARS = {
+    0xCA: (">f", 4), 0xCB: (">d", 8),
+    0xCC: (">B", 1), 0xCD: (">H", 2), 0xCE: (">I", 4), 0xCF: (">Q", 8),
+    0xD0: (">b", 1), 0xD1: (">h", 2), 0xD2: (">i", 4), 0xD3: (">q", 8),
+}
+
+
+def encode(message, head=b""):
+    """Encode a top-level message dict, appended to head (e.g. MESSAGE_HEADER)."""
+    buf = bytearray(head)
+    _pack_map(message, buf, _ENUM_IDS)
+    return buf
+
+
+def encode_value(value):
+    """Encode a nested value (e.g. one IoT descriptor) for use with encode_batch."""
+    buf = bytearray()
+    _pack(value, buf)
+    return buf
+
+
+def encode_batch(envelope, key, items, head=b""):
+    """Encode envelope plus key -> [items]; items are already encoded with encode_value."""
+    buf = bytearray(head)
+    _pack_map_header(len(envelope) + 1, buf)
+    for name, value in envelope.items():
+        _pack_field(name, value, buf, _ENUM_IDS)
+    buf.append(_KEY_IDS[key])
+    _pack_array_header(len(items), buf)
+    for item in items:
+        buf += item
+    return buf
+
+
+def decode(data):
+    """Decode one top-level message; raises ValueError on malformed input."""
+    data = memoryview(data)
+    try:
+        message, end = _unpack(data, 0, True)
+    except IndexError:
+        raise ValueError("truncated message")
+    if end != len(data):
+        raise ValueError("trailing bytes after message")
+    return message
+
+
+def _pack(obj, buf):
+    if obj is None:
+        buf.append(0xC0)
+    elif obj is True:
+        buf.append(0xC3)
+    elif obj is False:
+        buf.append(0xC2)
+    elif isinstance(obj, int):
+        _pack_int(obj, buf)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        n = len(data)
+        if n < 32:
+            buf.append(0xA0 | n)
+        elif n < 0x100:
+            buf += struct.pack(">BB", 0xD9, n)
+        elif n < 0x10000:
+            buf += struct.pack(">BH", 0xDA, n)
+        else:
+            buf += struct.pack(">BI", 0xDB, n)
+        buf += data
+    elif isinstance(obj, float):
+        # float32 when it round-trips exactly (always on single-precision ports)
+        packed = struct.pack(">f", obj)
+        if struct.unpack(">f", packed)[0] == obj:
+            buf.append(0xCA)
+            buf += packed
+        else:
+            buf += struct.pack(">Bd", 0xCB, obj)
+    elif isinstance(obj, dict):
+        _pack_map(obj, buf, None)
+    elif isinstance(obj, (list, tuple)):
+        _pack_array_header(len(obj), buf)
+        for item in obj:
+            _pack(item, buf)
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        n = len(obj)
+        if n < 0x100:
+            buf += struct.pack(">BB", 0xC4, n)
+        elif n < 0x10000:
+            buf += struct.pack(">BH", 0xC5, n)
+        else:
+            buf += struct.pack(">BI", 0xC6, n)
+        buf += obj
+    else:
+        raise TypeError("cannot encode %s" % type(obj).__name__)
+
+
+def _pack_int(n, buf):
+    if 0 <= n < 0x80:
+        buf.append(n)
+    elif -32 <= n < 0:
+        buf.append(n & 0xFF)
+    elif n >= 0:
+        if n < 0x100:
+            buf += struct.pack(">BB", 0xCC, n)
+        elif n < 0x10000:
+            buf += struct.pack(">BH", 0xCD, n)
+        elif n < 0x100000000:
+            buf += struct.pack(">BI", 0xCE, n)
+        else:
+            buf += struct.pack(">BQ", 0xCF, n)
+    elif n >= -0x80:
+        buf += struct.pack(">Bb", 0xD0, n)
+    elif n >= -0x8000:
+        buf += struct.pack(">Bh", 0xD1, n)
+    elif n >= -0x80000000:
+        buf += struct.pack(">Bi", 0xD2, n)
+    else:
+        buf += struct.pack(">Bq", 0xD3, n)
+
+
+def _pack_map_header(n, buf):
+    if n < 16:
+        buf.append(0x80 | n)
+    else:
+        buf += struct.pack(">BH", 0xDE, n)
+
+
+def _pack_array_header(n, buf):
+    if n < 16:
+        buf.append(0x90 | n)
+    else:
+        buf += struct.pack(">BH", 0xDC, n)
+
+
+def _pack_map(obj, buf, enums):
+    _pack_map_header(len(obj), buf)
+    for key, value in obj.items():
+        _pack_field(key, value, buf, enums)
+
+
+def _pack_field(key, value, buf, enums):
+    key_id = _KEY_IDS.get(key)
+    if key_id is None:
+        _pack(key, buf)
+    else:
+        buf.append(key_id)
+    if enums and isinstance(value, str):
+        ids = enums.get(key)
+        if ids and value in ids:
+            buf.append(ids[value])
+            return
+    _pack(value, buf)
+
+
+def _read(data, i, n):
+    if i + n > len(data):
+        raise ValueError("truncated message")
+    return data[i:i + n], i + n
+
+
+def _unpack(data, i, top=False):
+    b = data[i]
+    i += 1
+    if b < 0x80:
+        return b, i
+    if b >= 0xE0:
+        return b - 0x100, i
+    if b < 0x90:
+        return _unpack_map(data, i, b & 0x0F, top)
+    if b < 0xA0:
+        return _unpack_array(data, i, b & 0x0F)
+    if b < 0xC0:
+        raw, i = _read(data, i, b & 0x1F)
+        return str(raw, "utf-8"), i
+    if b == 0xC0:
+        return None, i
+    if b == 0xC2:
+        return False, i
+    if b == 0xC3:
+        return True, i
+    scalar = _SCALARS.get(b)
+    if scalar:
+        raw, i = _read(data, i, scalar[1])
+        return struct.unpack(scalar[0], raw)[0], i
+    if 0xC4 <= b <= 0xC6 or 0xD9 <= b <= 0xDB:
+        size = 1 << (b - 0xC4 if b <= 0xC6 else b - 0xD9)
+        raw, i = _read(data, i, size)
+        n = int.from_bytes(raw, "big")
+        raw, i = _read(data, i, n)
+        return (bytes(raw) if b <= 0xC6 else str(raw, "utf-8")), i
+    if b in (0xDC, 0xDD, 0xDE, 0xDF):
+        raw, i = _read(data, i, 2 if b in (0xDC, 0xDE) else 4)
+        n = int.from_bytes(raw, "big")
+        if b < 0xDE:
+            return _unpack_array(data, i, n)
+        return _unpack_map(data, i, n, top)
+    raise ValueError("unsupported type byte 0x%02x" % b)
+
+
+def _unpack_array(data, i, n):
+    items = []
+    for _ in range(n):
+        item, i = _unpack(data, i)
+        items.append(item)
+    return items, i
+
+
+def _unpack_map(data, i, n, top):
+    result = {}
+    for _ in range(n):
+        key, i = _unpack(data, i)
+        if isinstance(key, int):
+            if not 0 <= key < len(KEYS):
+                raise ValueError("unknown key id %d" % key)
+            key = KEYS[key]
+        value, i = _unpack(data, i)
+        if top and isinstance(value, int) and key in ENUMS:
+            values = ENUMS[key]
+            if not 0 <= value < len(values):
+                raise ValueError("unknown %s id %d" % (key, value))
+            value = values[value]
+        result[key] = value
+    return result, i
@@ -0,0 +1,181 @@
+import _thread
+import usocket as socket
+from utils.ticks import ticks_ms, ticks_diff, ticks_add, sleep_ms
+from micropython_websocket_client import parse_url
+
+try:
+    import random
+except ImportError:
+    import urandom as random
+
+
+class DnsCache:
+    """Caches getaddrinfo results per (host, port) for ttl_ms."""
+
+    def __init__(self, ttl_ms=300000):
+        self.ttl_ms = ttl_ms
+        self.entries = {}
+        self.lock = _thread.allocate_lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host, port):
+        key = (host, port)
+        now = ticks_ms()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and ticks_diff(entry[1], now) > 0:
+                self.hits += 1
+                return entry[0]
+        addr = socket.getaddrinfo(host, port)[0][-1]
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = (addr, ticks_add(now, self.ttl_ms))
+        return addr
+
+    def invalidate(self, host, port):
+        # Called after a failed connect: the cached address may be stale
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+
+class ConnectionManager:
+    """
+    Owns how the audio channel's WebSocket gets connected:
+    - resolved addresses come from a DnsCache, invalidated when a connect fails;
+    - connect() retries with jittered exponential backoff (each delay is drawn
+      from [backoff/2, backoff), backoff doubling up to max_backoff_ms);
+    - with warm=True, prewarm() opens the next connection in the background while
+      idle, so acquire() can hand it out without paying for TCP and the handshake;
+      the warm connection's receive thread runs from the start, so server pings are
+      answered and a close or reset drops it instead of leaving it looking connected;
+    - the client's connect timings (DNS, TCP, TTFB, handshake) are kept for each
+      successful connect, in a small ring of recent samples.
+    """
+
+    def __init__(self, url, client_factory, dns_cache=None, min_backoff_ms=250, max_backoff_ms=30000,
+                 max_attempts=6, warm=False, warm_max_age_ms=60000, samples=16):
+        self.url = url
+        self.host, self.port, _ = parse_url(url)
+        self.client_factory = client_factory  # client_factory(url) -> WebSocketClient
+        self.dns_cache = dns_cache or DnsCache()
+        self.min_backoff_ms = min_backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.max_attempts = max_attempts
+        self.warm = warm
+        self.warm_max_age_ms = warm_max_age_ms
+        self.lock = _thread.allocate_lock()
+        self._warm_client = None
+        self._warm_since = 0
+        self._warming = False
+        self.connects = 0
+        self.failures = 0
+        self.warm_hits = 0
+        self.last_timings = None
+        self.ttfb_samples = [0] * samples
+        self._sample_index = 0
+        self._sample_count = 0
+
+    def _backoff_delay(self, backoff):
+        half = backoff // 2
+        return half + (random.getrandbits(16) * half >> 16)
+
+    def connect(self):
+        """Open a new connection, retrying with backoff; raises OSError after max_attempts."""
+        backoff = self.min_backoff_ms
+        attempt = 0
+        while True:
+            attempt += 1
+            client = self.client_factory(self.url)
+            try:
+                client.connect(self.dns_cache.resolve(self.host, self.port))
+            except Exception as e:
+                self.failures += 1
+                self.dns_cache.invalidate(self.host, self.port)
+                if self.max_attempts and attempt >= self.max_attempts:
+                    raise OSError(f"connect failed after {attempt} attempts: {e}")
+                delay = self._backoff_delay(backoff)
+                print(f"Connect attempt {attempt} failed ({e}), retrying in {delay} ms")
+                sleep_ms(delay)
+                backoff = min(backoff * 2, self.max_backoff_ms)
+                continue
+            self._record(client.timings)
+            return client
+
+    def _record(self, timings):
+        with self.lock:
+            self.connects += 1
+            self.last_timings = timings
+            self.ttfb_samples[self._sample_index] = timings["ttfb_ms"]
+            self._sample_index = (self._sample_index + 1) % len(self.ttfb_samples)
+            self._sample_count = min(self._sample_count + 1, len(self.ttfb_samples))
+
+    def acquire(self):
+        """Return the warm connection if it is still usable, otherwise connect now."""
+        with self.lock:
+            client = self._warm_client
+            self._warm_client = None
+            fresh = client is not None and ticks_diff(ticks_ms(), self._warm_since) < self.warm_max_age_ms
+        if client is not None:
+            if fresh and client.connected:
+                self.warm_hits += 1
+                return client
+            client.close()
+        return self.connect()
+
+    def release(self, client):
+        """Close a connection that is no longer needed and, if enabled, start warming the next one."""
+        if client:
+            client.close()
+        if self.warm:
+            self.prewarm()
+
+    def prewarm(self):
+        with self.lock:
+            if self._warming or self._warm_client is not None:
+                return
+            self._warming = True
+        _thread.start_new_thread(self._prewarm, ())
+
+    def _prewarm(self):
+        try:
+            client = self.connect()
+        except OSError as e:
+            print(f"Prewarm failed: {e}")
+            client = None
+        with self.lock:
+            self._warming = False
+            if client is not None:
+                self._warm_client = client
+                self._warm_since = ticks_ms()
+        if client is not None:
+            # acquire() hands the client over with its receive thread already running;
+            # the protocol then replaces these callbacks with its own
+            client.on_close(lambda: self._on_warm_closed(client))
+            client.on_message(self._on_warm_message)
+
+    def _on_warm_closed(self, client):
+        with self.lock:
+            if self._warm_client is client:
+                self._warm_client = None
+        print("Warm connection closed by peer")
+
+    def _on_warm_message(self, message):
+        # Nothing is expected before the protocol sends hello
+        print("Dropped message on idle warm connection")
+
+    def get_stats(self):
+        with self.lock:
+            count = self._sample_count
+            samples = sorted(self.ttfb_samples[:count])
+            return {
+                "connects": self.connects,
+                "failures": self.failures,
+                "warm_hits": self.warm_hits,
+                "warm_ready": self._warm_client is not None,
+                "dns_hits": self.dns_cache.hits,
+                "dns_misses": self.dns_cache.misses,
+                "last_timings": self.last_timings,
+                "ttfb_ms_median": samples[count // 2] if count else None,
+                "ttfb_ms_max": samples[-1] if count else None,
+            }
@@ -0,0 +1,130 @@
+import struct
+from utils.ticks import ticks_ms, ticks_diff, ticks_add
+
+RTT_BUCKETS_MS = (10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000, 2000)
+
+
+class RttHistogram:
+    """Fixed-size RTT histogram plus smoothed RTT/variance (RFC 6298 style, integer ms)."""
+
+    def __init__(self):
+        self.histogram = [0] * (len(RTT_BUCKETS_MS) + 1)
+        self.count = 0
+        self.last = None
+        self.min = None
+        self.max = None
+        self.srtt = None
+        self.rttvar = None
+
+    def record(self, rtt_ms):
+        self.count += 1
+        self.last = rtt_ms
+        if self.min is None or rtt_ms < self.min:
+            self.min = rtt_ms
+        if self.max is None or rtt_ms > self.max:
+            self.max = rtt_ms
+        if self.srtt is None:
+            self.srtt = rtt_ms
+            self.rttvar = rtt_ms // 2
+        else:
+            self.rttvar += (abs(self.srtt - rtt_ms) - self.rttvar) // 4
+            self.srtt += (rtt_ms - self.srtt) // 8
+        for i, bound in enumerate(RTT_BUCKETS_MS):
+            if rtt_ms <= bound:
+                self.histogram[i] += 1
+                return
+        self.histogram[-1] += 1
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (None beyond the last bucket)."""
+        if not self.count:
+            return None
+        target = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if seen >= target:
+                return RTT_BUCKETS_MS[i] if i < len(RTT_BUCKETS_MS) else None
+        return None
+
+    def get_stats(self):
+        labels = ["<=%dms" % b for b in RTT_BUCKETS_MS] + [">%dms" % RTT_BUCKETS_MS[-1]]
+        return {
+            "samples": self.count,
+            "last_ms": self.last,
+            "min_ms": self.min,
+            "max_ms": self.max,
+            "srtt_ms": self.srtt,
+            "rttvar_ms": self.rttvar,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "histogram": {label: n for label, n in zip(labels, self.histogram) if n},
+        }
+
+
+class Keepalive:
+    """
+    WebSocket ping/pong keepalive with one ping in flight at a time.
+    poll() sends a ping every interval_ms; a ping still unanswered when the next
+    one is due counts as a missed pong, and max_missed consecutive misses declare
+    the connection dead (on_dead is called once). Each pong carries the ping's
+    sequence number, so late pongs from an earlier ping are ignored.
+    """
+
+    def __init__(self, send_ping, interval_ms=15000, max_missed=2, on_dead=None, rtt=None):
+        self.send_ping = send_ping  # send_ping(payload)
+        self.interval_ms = interval_ms
+        self.max_missed = max_missed
+        self.on_dead = on_dead
+        # Pass a shared RttHistogram to keep samples across reconnects
+        self.rtt = rtt or RttHistogram()
+        self.seq = 0
+        self.outstanding = None
+        self.sent_at = 0
+        self.next_at = ticks_ms()
+        self.missed = 0
+        self.total_missed = 0
+        self.dead = False
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def poll(self):
+        """Send a ping when due; returns ms until the next poll is needed."""
+        if self.dead or self.stopped:
+            return self.interval_ms
+        now = ticks_ms()
+        wait = ticks_diff(self.next_at, now)
+        if wait > 0:
+            return wait
+        if self.outstanding is not None:
+            self.missed += 1
+            self.total_missed += 1
+            if self.missed >= self.max_missed:
+                self.dead = True
+                if self.on_dead:
+                    self.on_dead()
+                return self.interval_ms
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self.outstanding = self.seq
+        self.sent_at = now
+        self.next_at = ticks_add(now, self.interval_ms)
+        self.send_ping(struct.pack(">I", self.seq))
+        return self.interval_ms
+
+    def on_pong(self, payload):
+        if self.outstanding is None or len(payload) != 4:
+            return
+        if struct.unpack(">I", payload)[0] != self.outstanding:
+            return
+        self.rtt.record(ticks_diff(ticks_ms(), self.sent_at))
+        self.outstanding = None
+        self.missed = 0
+
+    def get_stats(self):
+        stats = self.rtt.get_stats()
+        stats["pings"] = self.seq
+        stats["missed"] = self.total_missed
+        stats["dead"] = self.dead
+        return stats
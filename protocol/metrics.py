@@ -0,0 +1,117 @@
+from utils.ticks import ticks_ms, ticks_diff
+
+# Message types with their own counters; anything else is counted as "other"
+MESSAGE_TYPES = ("audio", "hello", "listen", "abort", "iot", "tts", "stt", "llm", "goodbye", "other")
+_SLOTS = {name: i for i, name in enumerate(MESSAGE_TYPES)}
+SLOT_AUDIO = _SLOTS["audio"]
+SLOT_OTHER = _SLOTS["other"]
+
+CALLBACK_BUCKETS_US = (100, 250, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+
+def message_slot(msg_type):
+    return _SLOTS.get(msg_type, SLOT_OTHER)
+
+
+class LatencyHistogram:
+    """Fixed-bucket execution-time histogram in microseconds."""
+
+    def __init__(self, bounds=CALLBACK_BUCKETS_US):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.calls = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, us):
+        self.calls += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+        i = 0
+        for bound in self.bounds:
+            if us <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (None beyond the last bucket)."""
+        if not self.calls:
+            return None
+        target = self.calls * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else None
+        return None
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.calls = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def snapshot(self):
+        labels = ["<=%dus" % b for b in self.bounds] + [">%dus" % self.bounds[-1]]
+        return {
+            "calls": self.calls,
+            "avg_us": self.total_us // self.calls if self.calls else 0,
+            "max_us": self.max_us,
+            "p50_us": self.percentile(50),
+            "p99_us": self.percentile(99),
+            "histogram": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+class ProtocolMetrics:
+    """
+    Message/byte counters per direction and message type, plus execution-time
+    histograms of the incoming audio and JSON callbacks. Everything is
+    allocated up front; recording only indexes preallocated lists, so it is
+    safe on the receive and capture paths. snapshot() builds a plain dict that
+    can be JSON-encoded, sent as an IoT state or printed over serial.
+    """
+
+    def __init__(self):
+        n = len(MESSAGE_TYPES)
+        self.messages_in = [0] * n
+        self.bytes_in = [0] * n
+        self.messages_out = [0] * n
+        self.bytes_out = [0] * n
+        self.audio_callback = LatencyHistogram()
+        self.json_callback = LatencyHistogram()
+        self.started = ticks_ms()
+
+    def count_in(self, slot, nbytes):
+        self.messages_in[slot] += 1
+        self.bytes_in[slot] += nbytes
+
+    def count_out(self, slot, nbytes):
+        self.messages_out[slot] += 1
+        self.bytes_out[slot] += nbytes
+
+    def reset(self):
+        for counters in (self.messages_in, self.bytes_in, self.messages_out, self.bytes_out):
+            for i in range(len(counters)):
+                counters[i] = 0
+        self.audio_callback.reset()
+        self.json_callback.reset()
+        self.started = ticks_ms()
+
+    def _direction(self, messages, nbytes):
+        return {name: {"messages": messages[i], "bytes": nbytes[i]}
+                for i, name in enumerate(MESSAGE_TYPES) if messages[i]}
+
+    def snapshot(self):
+        return {
+            "elapsed_ms": ticks_diff(ticks_ms(), self.started),
+            "in": self._direction(self.messages_in, self.bytes_in),
+            "out": self._direction(self.messages_out, self.bytes_out),
+            "callbacks": {
+                "audio": self.audio_callback.snapshot(),
+                "json": self.json_callback.snapshot(),
+            },
+        }
@@ -0,0 +1,229 @@
+import ujson
+import time
+import struct
+import _thread
+import usocket as socket
+import ubinascii
+from micropython_mqtt_client import MQTTClient
+from protocol.protocol import Protocol, SLOT_HELLO
+from protocol.metrics import message_slot, SLOT_AUDIO
+
+try:
+    import cryptolib
+except ImportError:
+    import ucryptolib as cryptolib
+
+AES_MODE_CTR = 6
+NONCE_SIZE = 16
+PACKET_TYPE_AUDIO = 0x01
+MAX_AUDIO_PAYLOAD = 1500 - 28 - NONCE_SIZE  # one Ethernet MTU minus IP/UDP headers
+SERVER_HELLO_TIMEOUT_MS = 10000
+
+
+class MqttUdpProtocol(Protocol):
+    """
+    Control messages (JSON) over MQTT, audio over UDP, following the xiaozhi
+    MQTT+UDP transport. The server hello carries the UDP endpoint plus an
+    AES-128 key and a 16-byte nonce template; every audio datagram is
+
+        nonce (16 B, sent in clear) + AES-CTR(key, counter block = nonce)(payload)
+
+    with the nonce laid out as type(1) flags(1) payload_len(2) ssrc(4)
+    timestamp(4) sequence(4), all big endian. Sequence numbers start at 1 per
+    session; older datagrams are dropped and gaps are counted as lost, so one
+    lost packet never delays the frames behind it.
+
+    config: endpoint ("host" or "host:port"), client_id, username, password,
+    publish_topic, subscribe_topic, keepalive (seconds).
+    """
+
+    def __init__(self, config, mqtt_factory=MQTTClient):
+        super().__init__()
+        self.config = config
+        self.mqtt_factory = mqtt_factory
+        self.mqtt = None
+        self.udp = None
+        self.udp_server = None
+        self.aes_key = None
+        self.session_id = None
+        # Uplink datagram buffer: the nonce is rewritten and the payload encrypted in place
+        self.packet = bytearray(NONCE_SIZE + MAX_AUDIO_PAYLOAD)
+        self.local_sequence = 0
+        self.remote_sequence = 0
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.packets_lost = 0
+        self.packets_late = 0
+        self.packets_invalid = 0
+        self.json_handlers["goodbye"] = self._on_goodbye
+
+    def start(self):
+        self._connect_mqtt()
+
+    def _connect_mqtt(self):
+        config = self.config
+        host, _, port = config["endpoint"].partition(":")
+        mqtt = self.mqtt_factory(config["client_id"], host, int(port) if port else 1883,
+                                 config.get("username") or None, config.get("password") or None,
+                                 config.get("keepalive", 90))
+        mqtt.on_message(self._on_mqtt_message)
+        mqtt.on_close(self._on_mqtt_close)
+        try:
+            mqtt.connect()
+            if config.get("subscribe_topic"):
+                mqtt.subscribe(config["subscribe_topic"])
+        except Exception as e:
+            self.set_error(f"Failed to connect to MQTT broker: {str(e)}")
+            return False
+        self.mqtt = mqtt
+        return True
+
+    def send_text(self, text):
+        if not self.mqtt:
+            return False
+        try:
+            self.mqtt.publish(self.config["publish_topic"], text)
+            return True
+        except Exception as e:
+            self.set_error(f"Failed to publish control message: {str(e)}")
+            return False
+
+    def send_message(self, message):
+        # The MQTT control channel is always JSON
+        message["session_id"] = self.session_id
+        text = ujson.dumps(message)
+        if self.send_text(text):
+            self.metrics.count_out(message_slot(message.get("type")), len(text))
+
+    def send_audio(self, data):
+        udp = self.udp
+        if udp is None:
+            return False
+        n = len(data)
+        if n > MAX_AUDIO_PAYLOAD:
+            return False
+        packet = self.packet
+        self.local_sequence = (self.local_sequence + 1) & 0xFFFFFFFF
+        struct.pack_into(">H", packet, 2, n)
+        struct.pack_into(">II", packet, 8, time.ticks_ms(), self.local_sequence)
+        cipher = cryptolib.aes(self.aes_key, AES_MODE_CTR, bytes(packet[:NONCE_SIZE]))
+        cipher.encrypt(data, memoryview(packet)[NONCE_SIZE:NONCE_SIZE + n])
+        try:
+            udp.send(memoryview(packet)[:NONCE_SIZE + n])
+        except OSError:
+            return False
+        self.packets_sent += 1
+        self.metrics.count_out(SLOT_AUDIO, n)
+        return True
+
+    def open_audio_channel(self, url=None, headers=None):
+        # url/headers are unused: the broker comes from config, the UDP endpoint from the server hello
+        if not self.mqtt or not self.mqtt.connected:
+            if not self._connect_mqtt():
+                return False
+        self.error_occurred = False
+        hello = self._hello_message({
+            "type": "hello", "version": 3, "transport": "udp",
+            "audio_params": {"format": "opus", "sample_rate": 16000, "channels": 1, "frame_duration": 60},
+        })
+        if self.send_text(hello):
+            self.metrics.count_out(SLOT_HELLO, len(hello))
+        deadline = time.ticks_add(time.ticks_ms(), SERVER_HELLO_TIMEOUT_MS)
+        while not self.server_hello_received:
+            if self.error_occurred or time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                self.set_error("Server hello timeout")
+                return False
+            time.sleep_ms(10)
+        try:
+            udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            udp.settimeout(1)  # lets the receive thread notice the channel was closed
+            udp.connect(socket.getaddrinfo(self.udp_server[0], self.udp_server[1])[0][-1])
+        except Exception as e:
+            self.set_error(f"Failed to open UDP channel: {str(e)}")
+            return False
+        self.udp = udp
+        self.last_incoming_time = time.ticks_ms()
+        _thread.start_new_thread(self._udp_loop, (udp,))
+        if hasattr(self, "on_audio_channel_opened_callback"):
+            self.on_audio_channel_opened_callback()
+        return True
+
+    def close_audio_channel(self):
+        if self.session_id:
+            self.send_message({"type": "goodbye"})
+        self._close_udp()
+
+    def is_audio_channel_opened(self):
+        return self.udp is not None and not self.error_occurred and not self.is_timeout()
+
+    def get_audio_stats(self):
+        return {
+            "sent": self.packets_sent,
+            "received": self.packets_received,
+            "lost": self.packets_lost,
+            "late": self.packets_late,
+            "invalid": self.packets_invalid,
+        }
+
+    def get_send_stats(self):
+        return self.get_audio_stats()
+
+    def get_rtt_stats(self):
+        return None  # no ping/pong on this transport; MQTT keepalive covers liveness
+
+    def _close_udp(self):
+        udp = self.udp
+        self.udp = None
+        self.session_id = None
+        if udp:
+            udp.close()
+            if hasattr(self, "on_audio_channel_closed_callback"):
+                self.on_audio_channel_closed_callback()
+
+    def _parse_server_hello(self, data):
+        if data.get("transport") != "udp" or "udp" not in data:
+            print("Unsupported transport in server hello:", data.get("transport"))
+            return
+        udp = data["udp"]
+        self.session_id = data.get("session_id")
+        self.udp_server = (udp["server"], udp["port"])
+        self.aes_key = ubinascii.unhexlify(udp["key"])
+        self.packet[:NONCE_SIZE] = ubinascii.unhexlify(udp["nonce"])
+        self.local_sequence = 0
+        self.remote_sequence = 0
+        # After the session fields: the server hello callback may already send control messages
+        super()._parse_server_hello(data)
+
+    def _on_goodbye(self, data):
+        session_id = data.get("session_id")
+        if session_id is None or session_id == self.session_id:
+            self._close_udp()
+
+    def _on_mqtt_message(self, topic, payload):
+        self._on_text(payload)
+
+    def _on_mqtt_close(self):
+        print("MQTT connection lost")
+        self.mqtt = None
+        self._close_udp()
+
+    def _udp_loop(self, udp):
+        while self.udp is udp:
+            try:
+                data = udp.recv(NONCE_SIZE + MAX_AUDIO_PAYLOAD)
+            except OSError:
+                continue  # receive timeout, or ICMP unreachable while the server restarts
+            if len(data) < NONCE_SIZE or data[0] != PACKET_TYPE_AUDIO:
+                self.packets_invalid += 1
+                continue
+            sequence = struct.unpack_from(">I", data, 12)[0]
+            if sequence <= self.remote_sequence:
+                self.packets_late += 1  # duplicate or overtaken by a newer datagram
+                continue
+            if sequence != self.remote_sequence + 1:
+                self.packets_lost += sequence - self.remote_sequence - 1
+            self.remote_sequence = sequence
+            self.packets_received += 1
+            self.last_incoming_time = time.ticks_ms()
+            cipher = cryptolib.aes(self.aes_key, AES_MODE_CTR, data[:NONCE_SIZE])
+            self._handle_audio(cipher.decrypt(memoryview(data)[NONCE_SIZE:]))
@@ -1,7 +1,22 @@
 import ujson
 import time
+import _thread
 import machine
 import ubinascii
+from utils.ticks import ticks_us, ticks_diff
+from protocol.keepalive import Keepalive, RttHistogram
+from protocol.metrics import ProtocolMetrics, message_slot, SLOT_AUDIO
+from protocol.compact import (ENCODING as COMPACT_ENCODING, AUDIO_HEADER, MESSAGE_HEADER, FRAME_AUDIO,
+                              FRAME_MESSAGE, encode, encode_value, encode_batch, decode)
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+SLOT_IOT = message_slot("iot")
+SLOT_HELLO = message_slot("hello")
+
 
 class Protocol:
     def __init__(self):
@@ -10,6 +25,26 @@ class Protocol:
         self.session_id = self._generate_session_id()
         self.error_occurred = False
         self.last_incoming_time = time.ticks_ms()
+        self.on_incoming_audio_callback = None
+        self.on_incoming_json_callback = None
+        # JSON message type -> handler(data); types without a handler go to on_incoming_json
+        self.json_handlers = {"hello": self._parse_server_hello}
+        # Upper bound on the serialized length of one batched IoT message
+        self.iot_batch_size = 2048
+        # Control message encoding: "json", or COMPACT_ENCODING once the server accepts
+        # the offer made in hello (only offered when compact_encoding is set)
+        self.compact_encoding = False
+        self.encoding = "json"
+        # Traffic counters and callback timings; accumulate across reconnects
+        self.metrics = ProtocolMetrics()
+        # IoT descriptors hash offered in hello; the server hello echoes the hash it
+        # has cached for this device, so unchanged descriptors are not resent
+        self.iot_descriptors_hash_provider = None
+        self.iot_descriptors_hash = None
+        self.iot_descriptors_known = False
+        self.on_server_hello_callback = None
+        # Reset when our hello goes out; servers that never answer it are still usable
+        self.server_hello_received = False
 
     def _generate_session_id(self):
         # 使用设备的MAC地址生成唯一的会话ID
@@ -22,6 +57,16 @@ class Protocol:
     def on_incoming_json(self, callback):
         self.on_incoming_json_callback = callback
 
+    def on_json_message(self, msg_type, handler):
+        self.json_handlers[msg_type] = handler
+
+    def on_server_hello(self, callback):
+        self.on_server_hello_callback = callback
+
+    def on_iot_descriptors_hash(self, provider):
+        # provider() returns the current descriptors hash (ThingManager.get_descriptors_hash)
+        self.iot_descriptors_hash_provider = provider
+
     def on_audio_channel_opened(self, callback):
         self.on_audio_channel_opened_callback = callback
 
@@ -32,8 +77,31 @@ class Protocol:
         self.on_network_error_callback = callback
 
     def send_text(self, text):
+        # Returns True when the message was handed to the transport
         raise NotImplementedError("send_text must be implemented by subclasses")
 
+    def send_compact(self, data):
+        raise NotImplementedError("send_compact must be implemented by subclasses")
+
+    def send_message(self, message):
+        # Serialize a control message once, in the negotiated encoding. The compact
+        # encoding omits session_id: the session is implied by the connection.
+        slot = message_slot(message.get("type"))
+        if self.encoding == COMPACT_ENCODING:
+            data = encode(message, MESSAGE_HEADER)
+            sent = self.send_compact(data)
+        else:
+            message["session_id"] = self.session_id
+            data = ujson.dumps(message)
+            sent = self.send_text(data)
+        if sent:
+            self.metrics.count_out(slot, len(data))
+
+    def get_metrics(self):
+        # Snapshot of per-type message/byte counters and callback execution-time
+        # histograms as a plain dict: JSON-serializable, fit for an IoT state or a serial dump
+        return self.metrics.snapshot()
+
     def set_error(self, message):
         self.error_occurred = True
         if hasattr(self, "on_network_error_callback"):
@@ -44,79 +112,276 @@ class Protocol:
         elapsed_time = time.ticks_diff(time.ticks_ms(), self.last_incoming_time)
         return elapsed_time > timeout_seconds
 
+    def _on_text(self, message):
+        try:
+            data = ujson.loads(message)
+        except ValueError:
+            print("Dropped malformed JSON message")
+            return
+        self.last_incoming_time = time.ticks_ms()
+        self._handle_message(data, len(message))
+
+    def _handle_message(self, data, size):
+        # Valid JSON/msgpack need not be an object ("[1,2]", "5"): drop it here rather
+        # than let .get() raise and close the connection
+        if not isinstance(data, dict):
+            print("Dropped non-object message")
+            return
+        msg_type = data.get("type")
+        self.metrics.count_in(message_slot(msg_type), size)
+        handler = self.json_handlers.get(msg_type) or self.on_incoming_json_callback
+        if handler:
+            start = ticks_us()
+            # A failing handler (e.g. an iot command for an unknown thing) must not
+            # take down the transport's receive thread
+            try:
+                handler(data)
+            except Exception as e:
+                print(f"Error handling {msg_type} message: {str(e)}")
+            self.metrics.json_callback.record(ticks_diff(ticks_us(), start))
+
+    def _handle_audio(self, data):
+        self.metrics.count_in(SLOT_AUDIO, len(data))
+        callback = self.on_incoming_audio_callback
+        if callback:
+            start = ticks_us()
+            try:
+                callback(data)
+            except Exception as e:
+                print(f"Error handling incoming audio: {str(e)}")
+            self.metrics.audio_callback.record(ticks_diff(ticks_us(), start))
+
+    def _on_binary(self, data):
+        # Binary frames are downlink audio: no JSON parse on the hot path. With the
+        # compact encoding the first byte tells audio and control messages apart.
+        self.last_incoming_time = time.ticks_ms()
+        if not data:
+            return
+        if self.encoding == COMPACT_ENCODING:
+            kind = data[0]
+            data = memoryview(data)[1:]
+            if kind == FRAME_MESSAGE:
+                try:
+                    message = decode(data)
+                except ValueError:
+                    print("Dropped malformed compact message")
+                    return
+                self._handle_message(message, len(data))
+                return
+            if kind != FRAME_AUDIO:
+                return
+        self._handle_audio(data)
+
+    def _hello_message(self, hello=None):
+        if hello is None:
+            hello = {"type": "hello", "version": 1}
+        if self.compact_encoding:
+            hello["encodings"] = [COMPACT_ENCODING, "json"]
+        self.iot_descriptors_known = False
+        self.server_hello_received = False
+        if self.iot_descriptors_hash_provider:
+            self.iot_descriptors_hash = self.iot_descriptors_hash_provider()
+            hello["iot"] = {"descriptors_hash": self.iot_descriptors_hash}
+        return ujson.dumps(hello)
+
+    def _parse_server_hello(self, data):
+        if "audio_params" in data:
+            params = data["audio_params"]
+            self.server_sample_rate = params.get("sample_rate", self.server_sample_rate)
+            self.server_frame_duration = params.get("frame_duration", self.server_frame_duration)
+        # Servers that do not know the compact encoding leave "encoding" out: stay on JSON
+        if self.compact_encoding and data.get("encoding") == COMPACT_ENCODING:
+            self.encoding = COMPACT_ENCODING
+        else:
+            self.encoding = "json"
+        # Servers without a descriptor cache leave "iot" out: descriptors must be sent in full
+        iot = data.get("iot") or {}
+        self.iot_descriptors_known = (self.iot_descriptors_hash is not None
+                                      and iot.get("descriptors_hash") == self.iot_descriptors_hash)
+        self.server_hello_received = True
+        if self.on_server_hello_callback:
+            self.on_server_hello_callback()
+
     def send_abort_speaking(self, reason):
-        message = {"session_id": self.session_id, "type": "abort", "reason": reason}
-        self.send_text(ujson.dumps(message))
+        self.send_message({"type": "abort", "reason": reason})
 
     def send_start_listening(self, mode):
-        message = {"session_id": self.session_id, "type": "listen", "state": "start", "mode": mode}
-        self.send_text(ujson.dumps(message))
+        self.send_message({"type": "listen", "state": "start", "mode": mode})
 
     def send_stop_listening(self):
-        message = {"session_id": self.session_id, "type": "listen", "state": "stop"}
-        self.send_text(ujson.dumps(message))
+        self.send_message({"type": "listen", "state": "stop"})
 
-    def send_iot_descriptors(self, descriptors):
-        try:
-            descriptor_list = ujson.loads(descriptors)
-            if not isinstance(descriptor_list, list):
-                raise ValueError("Descriptors should be a list")
-            for descriptor in descriptor_list:
-                message = {
-                    "session_id": self.session_id,
-                    "type": "iot",
-                    "update": True,
-                    "descriptors": [descriptor],
-                }
-                self.send_text(ujson.dumps(message))
-        except ValueError as e:
-            self.set_error(f"Failed to parse IoT descriptors: {str(e)}")
+    def send_iot_descriptors(self, descriptors, descriptors_hash=None):
+        # descriptors: list of descriptor dicts (ThingManager.get_descriptors()); with
+        # descriptors_hash every batch carries it, for the server to cache them under
+        self._send_iot_batches("descriptors", descriptors, descriptors_hash)
 
     def send_iot_states(self, states):
-        message = {
-            "session_id": self.session_id,
-            "type": "iot",
-            "update": True,
-            "states": ujson.loads(states),
-        }
-        self.send_text(ujson.dumps(message))
+        # states: list of state dicts (ThingManager.get_states())
+        self._send_iot_batches("states", states)
+
+    def _send_iot_batches(self, key, items, descriptors_hash=None):
+        # Each item is serialized exactly once; the envelope is assembled around the
+        # serialized items and split so no message exceeds iot_batch_size characters
+        # (bytes for the compact encoding; a single oversized item is sent on its own).
+        if self.encoding == COMPACT_ENCODING:
+            envelope = {"type": "iot", "update": True}
+            if descriptors_hash:
+                envelope["descriptors_hash"] = descriptors_hash
+            for batch in self._batches(items, encode_value, 10):
+                data = encode_batch(envelope, key, batch, MESSAGE_HEADER)
+                if self.send_compact(data):
+                    self.metrics.count_out(SLOT_IOT, len(data))
+            return
+        head = '{"session_id": %s, "type": "iot", "update": true, ' % ujson.dumps(self.session_id)
+        if descriptors_hash:
+            head += '"descriptors_hash": %s, ' % ujson.dumps(descriptors_hash)
+        head += '"%s": [' % key
+        for batch in self._batches(items, ujson.dumps, len(head) + 2):
+            text = head + ",".join(batch) + "]}"
+            if self.send_text(text):
+                self.metrics.count_out(SLOT_IOT, len(text))
+
+    def _batches(self, items, serialize, overhead):
+        batch = []
+        size = overhead
+        for item in items:
+            data = serialize(item)
+            if batch and size + len(data) + 1 > self.iot_batch_size:
+                yield batch
+                batch = []
+                size = overhead
+            batch.append(data)
+            size += len(data) + 1
+        if batch:
+            yield batch
 
 
 class WebsocketProtocol(Protocol):
-    def __init__(self, websocket):
+    def __init__(self, websocket, connection_manager=None, ping_interval_ms=15000, max_missed_pongs=2,
+                 compact_encoding=False):
         super().__init__()
         self.websocket = websocket
+        # Offer the compact binary control encoding in hello; JSON is used unless the server accepts
+        self.compact_encoding = compact_encoding
+        # Optional ConnectionManager: DNS cache, retry with backoff, warm connections
+        self.connection_manager = connection_manager
+        self._channel_args = None
+        # Keepalive: ping every ping_interval_ms (0 disables), dead after max_missed_pongs misses.
+        # RTT samples accumulate across reconnects.
+        self.ping_interval_ms = ping_interval_ms
+        self.max_missed_pongs = max_missed_pongs
+        self.keepalive = None
+        self.rtt = RttHistogram()
 
     def start(self):
         pass  # Placeholder for starting the protocol
 
     def send_audio(self, data):
+        # Returns False when the frame was dropped because the send queue is backpressured
         if not self.websocket:
-            return
-        self.websocket.send(data)
+            return False
+        if self.encoding == COMPACT_ENCODING:
+            # One copy, the same as the queue would make for a non-bytes buffer
+            sent = self.websocket.send_binary(AUDIO_HEADER + data)
+        else:
+            sent = self.websocket.send_binary(data)
+        if sent:
+            self.metrics.count_out(SLOT_AUDIO, len(data))
+        return sent
 
     def send_text(self, text):
+        return self._send_control(text)
+
+    def send_compact(self, data):
+        return self._send_control(data)
+
+    def _send_control(self, message):
+        # str goes out as a text frame, compact messages as a binary frame, both on the control lane
         if not self.websocket:
-            return
+            return False
         try:
-            self.websocket.send(text)
+            if self.websocket.send(message):
+                return True
+            print("Send queue full, dropped control message")
         except Exception as e:
-            self.set_error(f"Failed to send text: {str(e)}")
+            self.set_error(f"Failed to send control message: {str(e)}")
+        return False
+
+    def _send_hello(self):
+        hello = self._hello_message()
+        if self.websocket.send(hello):
+            self.metrics.count_out(SLOT_HELLO, len(hello))
+
+    def get_send_stats(self):
+        # Send queue depth, drops and backpressure stall time of the current connection
+        if not self.websocket:
+            return None
+        return self.websocket.get_send_stats()
 
     def is_audio_channel_opened(self):
         return self.websocket is not None and not self.error_occurred and not self.is_timeout()
 
-    def close_audio_channel(self):
+    def is_timeout(self):
+        if self.keepalive and self.keepalive.dead:
+            return True
+        return super().is_timeout()
+
+    def get_rtt_stats(self):
+        stats = self.rtt.get_stats()
+        if self.keepalive:
+            stats["missed"] = self.keepalive.total_missed
+            stats["dead"] = self.keepalive.dead
+        return stats
+
+    def _start_keepalive(self):
+        self._stop_keepalive()
+        if not self.ping_interval_ms:
+            return
+        keepalive = Keepalive(self.websocket.ping, self.ping_interval_ms, self.max_missed_pongs,
+                              self._on_keepalive_dead, self.rtt)
+        self.websocket.on_pong(keepalive.on_pong)
+        self.keepalive = keepalive
+        _thread.start_new_thread(self._keepalive_loop, (keepalive,))
+
+    def _keepalive_loop(self, keepalive):
+        # Ends when the channel is closed (keepalive stopped) or declared dead
+        while not keepalive.stopped and not keepalive.dead:
+            wait = keepalive.poll()
+            time.sleep_ms(min(wait, 1000))
+
+    def _on_keepalive_dead(self):
+        print(f"No pong for {self.max_missed_pongs} pings, closing audio channel")
         if self.websocket:
             self.websocket.close()
+        self._on_close()
+
+    def close_audio_channel(self):
+        self._channel_args = None
+        self._stop_keepalive()
+        if self.websocket:
+            websocket = self.websocket
             self.websocket = None
+            if self.connection_manager:
+                self.connection_manager.release(websocket)
+            else:
+                websocket.close()
 
     def open_audio_channel(self, url, headers):
         try:
-            self.websocket.connect(url, headers=headers)
-            self.websocket.on_message(self._on_message)
+            self.error_occurred = False
+            self.encoding = "json"
+            self.last_incoming_time = time.ticks_ms()
+            if self.connection_manager:
+                self.websocket = self.connection_manager.acquire()
+                self._channel_args = (url, headers)
+            else:
+                self.websocket.connect()
+            self.websocket.on_message(self._on_text)
+            self.websocket.on_binary(self._on_binary)
             self.websocket.on_close(self._on_close)
-            self.websocket.send(ujson.dumps({"type": "hello", "version": 1}))
+            self._send_hello()
+            self._start_keepalive()
             if hasattr(self, "on_audio_channel_opened_callback"):
                 self.on_audio_channel_opened_callback()
             return True
@@ -124,24 +389,87 @@ class WebsocketProtocol(Protocol):
             self.set_error(f"Failed to open audio channel: {str(e)}")
             return False
 
-    def _on_message(self, message):
-        try:
-            data = ujson.loads(message)
-            if "type" in data and data["type"] == "hello":
-                self._parse_server_hello(data)
-            elif hasattr(self, "on_incoming_json_callback"):
-                self.on_incoming_json_callback(data)
-            self.last_incoming_time = time.ticks_ms()
-        except ValueError:
-            if hasattr(self, "on_incoming_audio_callback"):
-                self.on_incoming_audio_callback(message)
+    def _stop_keepalive(self):
+        if self.keepalive:
+            self.keepalive.stop()
 
     def _on_close(self):
+        self._stop_keepalive()
+        if self.connection_manager and self._channel_args:
+            # Dropped by the peer or the network while open: reconnect before reporting it closed
+            self.websocket = None
+            _thread.start_new_thread(self._reconnect, ())
+            return
         if hasattr(self, "on_audio_channel_closed_callback"):
             self.on_audio_channel_closed_callback()
 
-    def _parse_server_hello(self, data):
-        if "audio_params" in data:
-            params = data["audio_params"]
-            self.server_sample_rate = params.get("sample_rate", self.server_sample_rate)
-            self.server_frame_duration = params.get("frame_duration", self.server_frame_duration)
+    def _reconnect(self):
+        url, headers = self._channel_args
+        print("Audio channel lost, reconnecting")
+        if not self.open_audio_channel(url, headers):
+            self._channel_args = None
+            if hasattr(self, "on_audio_channel_closed_callback"):
+                self.on_audio_channel_closed_callback()
+        else:
+            print("Reconnected:", self.connection_manager.last_timings)
+
+
+class AsyncWebsocketProtocol(WebsocketProtocol):
+    """
+    WebsocketProtocol running on uasyncio/asyncio with an AsyncWebSocketClient.
+    send_text/send_audio only enqueue onto the client's writer task, so they stay
+    non-blocking and may be called from the capture thread; incoming messages are
+    dispatched from the client's reader task on the event loop.
+    """
+
+    async def open_audio_channel(self, url, headers):
+        try:
+            self.encoding = "json"
+            # Register callbacks first: the reader task starts inside connect()
+            self.websocket.on_message(self._on_text)
+            self.websocket.on_binary(self._on_binary)
+            self.websocket.on_close(self._on_close)
+            self.websocket.on_error(lambda e: self.set_error(f"WebSocket error: {str(e)}"))
+            await self.websocket.connect()
+            self._send_hello()
+            self._start_keepalive()
+            if hasattr(self, "on_audio_channel_opened_callback"):
+                self.on_audio_channel_opened_callback()
+            return True
+        except Exception as e:
+            self.set_error(f"Failed to open audio channel: {str(e)}")
+            return False
+
+    def _start_keepalive(self):
+        self._stop_keepalive()
+        if not self.ping_interval_ms:
+            return
+        keepalive = Keepalive(self.websocket.ping, self.ping_interval_ms, self.max_missed_pongs,
+                              self._on_keepalive_dead, self.rtt)
+        self.websocket.on_pong(keepalive.on_pong)
+        self.keepalive = keepalive
+        asyncio.create_task(self._keepalive_task(keepalive))
+
+    async def _keepalive_task(self, keepalive):
+        while not keepalive.stopped and not keepalive.dead:
+            try:
+                wait = keepalive.poll()
+            except OSError:
+                return  # connection already gone
+            await asyncio.sleep(min(wait, 1000) / 1000)
+
+    def _on_keepalive_dead(self):
+        print(f"No pong for {self.max_missed_pongs} pings, closing audio channel")
+        # The client's shutdown calls on_close, which reports the channel closed
+        if self.websocket:
+            asyncio.create_task(self.websocket.close())
+
+    async def close_audio_channel(self):
+        self._stop_keepalive()
+        if self.websocket:
+            websocket = self.websocket
+            self.websocket = None
+            await websocket.close()
+
+    def is_audio_channel_opened(self):
+        return self.websocket is not None and self.websocket.connected and not self.error_occurred and not self.is_timeout()
@@ -0,0 +1,91 @@
+# bluetooth 模块替身：GATT 服务注册、广播、特征值读写，
+# 并提供 sim_connect / sim_write / sim_disconnect 模拟手机端（central）的操作。
+FLAG_READ = 0x0002
+FLAG_WRITE_NO_RESPONSE = 0x0004
+FLAG_WRITE = 0x0008
+FLAG_NOTIFY = 0x0010
+
+_IRQ_CENTRAL_CONNECT = 1
+_IRQ_CENTRAL_DISCONNECT = 2
+_IRQ_GATTS_WRITE = 3
+
+
+class UUID:
+    def __init__(self, value):
+        if isinstance(value, int):
+            self._bytes = value.to_bytes(2, "little")
+        else:
+            self._bytes = bytes.fromhex(value.replace("-", ""))[::-1]
+        self.value = value
+
+    def __bytes__(self):
+        return self._bytes
+
+    def __eq__(self, other):
+        return isinstance(other, UUID) and self._bytes == other._bytes
+
+    def __hash__(self):
+        return hash(self._bytes)
+
+    def __repr__(self):
+        return "UUID(%r)" % (self.value,)
+
+
+class BLE:
+    def __init__(self):
+        self._active = False
+        self._irq = None
+        self._values = {}
+        self._next_handle = 1
+        self.advertising = None
+        self._next_conn = 0
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        self._active = bool(state)
+
+    def irq(self, handler):
+        self._irq = handler
+
+    def config(self, *args, **kwargs):
+        if args and args[0] == "mac":
+            return (0, b"\x24\x6f\x28\xaa\xbb\xcd")
+
+    def gatts_register_services(self, services):
+        result = []
+        for _, characteristics in services:
+            handles = []
+            for _characteristic in characteristics:
+                handle = self._next_handle
+                self._next_handle += 1
+                self._values[handle] = b""
+                handles.append(handle)
+            result.append(tuple(handles))
+        return tuple(result)
+
+    def gap_advertise(self, interval_us, adv_data=None, resp_data=None, connectable=True):
+        self.advertising = None if interval_us is None else bytes(adv_data or b"")
+
+    def gatts_read(self, value_handle):
+        return self._values[value_handle]
+
+    def gatts_write(self, value_handle, data, send_update=False):
+        self._values[value_handle] = bytes(data)
+
+    def gatts_notify(self, conn_handle, value_handle, data=None):
+        pass
+
+    # --- 以下为模拟手机端的辅助方法 ---
+    def sim_connect(self):
+        conn = self._next_conn
+        self._next_conn += 1
+        self._irq(_IRQ_CENTRAL_CONNECT, (conn, 0, b"\x00" * 6))
+        return conn
+
+    def sim_write(self, conn, value_handle, data):
+        self._values[value_handle] = bytes(data)
+        self._irq(_IRQ_GATTS_WRITE, (conn, value_handle))
+
+    def sim_disconnect(self, conn):
+        self._irq(_IRQ_CENTRAL_DISCONNECT, (conn, 0, b"\x00" * 6))
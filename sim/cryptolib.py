@@ -0,0 +1,38 @@
+# cryptolib 替身：用 cryptography 实现 MicroPython cryptolib.aes 的接口（ECB/CBC/CTR）。
+# 与设备一致：一个 aes 对象只用于加密或只用于解密，CTR 的 iv 即初始计数块（整块大端递增）。
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+MODE_ECB = 1
+MODE_CBC = 2
+MODE_CTR = 6
+
+
+class aes:
+    def __init__(self, key, mode, iv=None):
+        if mode == MODE_ECB:
+            cipher_mode = modes.ECB()
+        elif mode == MODE_CBC:
+            cipher_mode = modes.CBC(bytes(iv))
+        elif mode == MODE_CTR:
+            cipher_mode = modes.CTR(bytes(iv))
+        else:
+            raise ValueError("mode")
+        self._mode = mode
+        self._cipher = Cipher(algorithms.AES(bytes(key)), cipher_mode)
+        self._context = None
+
+    def _run(self, encrypt, in_buf, out_buf):
+        if self._mode != MODE_CTR and len(in_buf) % 16:
+            raise ValueError("blksize")
+        if self._context is None:
+            self._context = self._cipher.encryptor() if encrypt else self._cipher.decryptor()
+        data = self._context.update(bytes(in_buf))
+        if out_buf is None:
+            return data
+        out_buf[:len(data)] = data
+
+    def encrypt(self, in_buf, out_buf=None):
+        return self._run(True, in_buf, out_buf)
+
+    def decrypt(self, in_buf, out_buf=None):
+        return self._run(False, in_buf, out_buf)
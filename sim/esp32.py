@@ -0,0 +1,49 @@
+# esp32 模块替身：内存中的 NVS，按命名空间隔离，行为与 ESP-IDF 一致：
+# 不存在的键或类型不匹配时抛出 OSError，写入在 commit() 前同样可读。
+import errno
+
+_storage = {}
+
+
+class NVS:
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._data = _storage.setdefault(namespace, {})
+
+    def _get(self, key, kind):
+        entry = self._data.get(key)
+        if entry is None or entry[0] != kind:
+            raise OSError(errno.ENOENT, "ESP_ERR_NVS_NOT_FOUND")
+        return entry[1]
+
+    def set_i32(self, key, value):
+        self._data[key] = ("i32", int(value))
+
+    def get_i32(self, key):
+        return self._get(key, "i32")
+
+    def set_blob(self, key, value):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self._data[key] = ("blob", bytes(value))
+
+    def get_blob(self, key, buffer):
+        value = self._get(key, "blob")
+        if len(value) > len(buffer):
+            raise OSError(errno.EINVAL, "ESP_ERR_NVS_INVALID_LENGTH")
+        buffer[:len(value)] = value
+        return len(value)
+
+    def erase_key(self, key):
+        if key not in self._data:
+            raise OSError(errno.ENOENT, "ESP_ERR_NVS_NOT_FOUND")
+        del self._data[key]
+
+    def commit(self):
+        pass
+
+
+def reset_storage():
+    """清空所有命名空间（场景之间复位）"""
+    for data in _storage.values():
+        data.clear()
@@ -0,0 +1,140 @@
+# machine 模块替身：unique_id、Pin、I2S（合成采集源 / 记录播放）、SPI 与内存探针
+import math
+import random
+import struct
+import time
+from array import array
+import simenv
+
+
+def unique_id():
+    return simenv.config["unique_id"]
+
+
+def mem_free():
+    return simenv.config["mem_free"]
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def freq(hz=None):
+    return 240000000
+
+
+class _Mem:
+    def __getitem__(self, addr):
+        return 0
+
+    def __setitem__(self, addr, value):
+        pass
+
+
+mem8 = mem16 = mem32 = _Mem()
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    PULL_UP = 2
+    PULL_DOWN = 1
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = value or 0
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+
+class SPI:
+    def __init__(self, id, *args, **kwargs):
+        self.id = id
+
+    def write(self, buf):
+        pass
+
+    def deinit(self):
+        pass
+
+
+def speech_source(samples, start_index, rate=16000):
+    """默认合成采集源：1.5s 语音样（两个谐波 + 噪声）与 1.5s 静音交替，叠加直流偏移"""
+    out = []
+    for i in range(samples):
+        n = start_index + i
+        value = 300 + random.gauss(0, 30)
+        if (n // int(rate * 1.5)) % 2 == 0:
+            t = n / rate
+            envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 3 * t)
+            value += envelope * (5000 * math.sin(2 * math.pi * 220 * t) + 2000 * math.sin(2 * math.pi * 660 * t))
+        out.append(max(-32768, min(32767, int(value))))
+    return out
+
+
+def _samples_view(buf):
+    if isinstance(buf, array):
+        return buf, len(buf)
+    view = memoryview(buf)
+    if view.format == "h":
+        return view, len(view)
+    return None, len(view) // 2
+
+
+class I2S:
+    RX = 0
+    TX = 1
+    MONO = 0
+    STEREO = 1
+
+    def __init__(self, id, sck=None, ws=None, sd=None, mode=RX, bits=16, format=MONO, rate=16000, ibuf=20000):
+        self.id = id
+        self.mode = mode
+        self.rate = rate
+        self.ibuf = ibuf
+        self.sample_index = 0
+        self.samples_written = 0
+        self.recorded = None  # 置为 list 时记录 TX 写入的采样
+        self._next_time = time.monotonic()
+
+    def _pace(self, samples):
+        # RX：数据按采样率产生，读取会阻塞到这批采样“录完”；
+        # TX：允许领先 ibuf 大小的缓冲，超出后阻塞，与 DMA 行为一致
+        self._next_time = max(self._next_time, time.monotonic() - self.ibuf / 2 / self.rate) + samples / self.rate
+        lead = self.ibuf / 2 / self.rate if self.mode == I2S.TX else 0
+        delay = self._next_time - time.monotonic() - lead
+        if delay > 0:
+            time.sleep(delay)
+
+    def readinto(self, buf):
+        view, count = _samples_view(buf)
+        self._pace(count)
+        source = simenv.config["i2s_source"] or speech_source
+        data = source(count, self.sample_index)
+        self.sample_index += count
+        if view is not None:
+            for i in range(count):
+                view[i] = data[i]
+        else:
+            struct.pack_into("<%dh" % count, buf, 0, *data)
+        return count * 2
+
+    def write(self, buf):
+        view, count = _samples_view(buf)
+        self._pace(count)
+        self.samples_written += count
+        if self.recorded is not None:
+            self.recorded.extend(view[:count] if view is not None else struct.unpack_from("<%dh" % count, buf))
+        return count * 2
+
+    def deinit(self):
+        pass
@@ -0,0 +1,15 @@
+# micropython 模块替身：const 与代码发射器装饰器在 CPython 上均为原样返回
+def const(value):
+    return value
+
+
+def native(f):
+    return f
+
+
+def viper(f):
+    return f
+
+
+def mem_info(*args):
+    print("mem: simulated")
@@ -0,0 +1,89 @@
+# network 模块替身：STA/AP 接口，可配置的连接延迟与可连接热点列表（见 simenv.config）
+import time
+import simenv
+
+STA_IF = 0
+AP_IF = 1
+WIFI_PS_NONE = 0
+WIFI_PS_MIN_MODEM = 1
+WIFI_PS_MAX_MODEM = 2
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_WRONG_PASSWORD = 202
+STAT_NO_AP_FOUND = 201
+
+_interfaces = {}
+
+
+class WLAN:
+    IF_STA = STA_IF
+    IF_AP = AP_IF
+
+    def __new__(cls, interface=STA_IF):
+        # 与设备一致：同一接口多次构造得到同一对象
+        if interface not in _interfaces:
+            obj = super().__new__(cls)
+            obj._init(interface)
+            _interfaces[interface] = obj
+        return _interfaces[interface]
+
+    def _init(self, interface):
+        self.interface = interface
+        self._active = False
+        self._ssid = None
+        self._status = STAT_IDLE
+        self._connected_at = None
+        self._config = {"pm": WIFI_PS_MIN_MODEM, "mac": simenv.config["mac"], "essid": ""}
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        self._active = bool(state)
+        if not self._active:
+            self.disconnect()
+
+    def connect(self, ssid=None, key=None):
+        if not self._active:
+            raise OSError("Wifi Not Started")
+        self._ssid = ssid
+        self._config["essid"] = ssid
+        networks = simenv.config["networks"]
+        if ssid not in networks:
+            self._status = STAT_NO_AP_FOUND
+            self._connected_at = None
+        elif networks[ssid] != key:
+            self._status = STAT_WRONG_PASSWORD
+            self._connected_at = None
+        else:
+            self._status = STAT_CONNECTING
+            self._connected_at = time.monotonic() + simenv.config["connect_latency_ms"] / 1000
+
+    def disconnect(self):
+        self._status = STAT_IDLE
+        self._connected_at = None
+
+    def isconnected(self):
+        if self._status == STAT_CONNECTING and time.monotonic() >= self._connected_at:
+            self._status = STAT_GOT_IP
+        return self._status == STAT_GOT_IP
+
+    def status(self, param=None):
+        if param == "rssi":
+            return simenv.config["rssi"]
+        self.isconnected()
+        return self._status
+
+    def ifconfig(self, config=None):
+        if self.isconnected():
+            return ("192.168.4.2", "255.255.255.0", "192.168.4.1", "192.168.4.1")
+        return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self._config[args[0]]
+        self._config.update(kwargs)
+
+    def scan(self):
+        return [(ssid.encode(), simenv.config["mac"], 6, simenv.config["rssi"], 3, False)
+                for ssid in simenv.config["networks"]]
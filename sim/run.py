@@ -0,0 +1,95 @@
+# 在 Linux 上端到端运行设备侧代码。
+# 用法: python sim/run.py app|capture|ble [秒数]
+#   app      Application.start()（含麦克风采集与 VAD 上行，发往本地参考接收端），并向下行注入模拟 TTS 帧，经抖动缓冲播放到模拟 I2S TX
+#   capture  inmp441_reader2.main()：合成 I2S 源 -> DSP/VAD -> UDP，发往本地参考接收端并打印流统计
+#   ble      无已存 Wi-Fi 时启动 BLE 配网，模拟手机分片写入 ssid/password，直到 Wi-Fi 连接并关闭 BLE
+import os
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import simenv
+
+simenv.install(start_ms=(1 << 30) - 5000)  # 5 秒后 ticks 回绕，顺带验证回绕处理
+
+
+def run_app(seconds):
+    from machine import I2S
+    from application import Application
+    from tools.audio_receiver import serve
+    import inmp441_reader2
+
+    # 上行音频发往本地参考接收端
+    loop = asyncio.new_event_loop()
+    transport, receiver = loop.run_until_complete(serve("127.0.0.1", 0))
+    inmp441_reader2.SERVER_IP, inmp441_reader2.SERVER_PORT = transport.get_extra_info("sockname")
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    app = Application.get_instance()
+    app.start()
+    speaker = I2S(1, mode=I2S.TX, rate=16000, ibuf=8000)
+    app.set_speaker(speaker, 16000)
+
+    frame_ms = app.protocol.server_frame_duration
+    frame = bytes(app.protocol.server_sample_rate * frame_ms // 1000 * 2)
+    deadline = time.monotonic() + seconds
+    voice_frames = 0
+    while time.monotonic() < deadline:
+        app.protocol._on_binary(frame)
+        voice_frames += app.voice_detected
+        time.sleep(frame_ms / 1000)
+    print("device state:", app.device_state)
+    print(f"voice_detected in {voice_frames} frames")
+    print("playout:", app.playout.get_stats())
+    print("speaker samples written:", speaker.samples_written)
+
+
+def run_capture(seconds):
+    from tools.audio_receiver import serve
+    from audio.packet import PACKET_VERSION_STREAM
+    import inmp441_reader2
+
+    loop = asyncio.new_event_loop()
+    transport, receiver = loop.run_until_complete(serve("127.0.0.1", 0))
+    inmp441_reader2.SERVER_IP, inmp441_reader2.SERVER_PORT = transport.get_extra_info("sockname")
+    # 本地参考接收端支持 v2，用带序号的格式统计流健康度
+    inmp441_reader2.PACKET_VERSION = PACKET_VERSION_STREAM
+    threading.Thread(target=inmp441_reader2.main, daemon=True).start()
+    loop.run_until_complete(asyncio.sleep(seconds))
+    transport.close()
+    for device_id, report in receiver.report().items():
+        print(device_id, report)
+
+
+def run_ble(seconds):
+    import simenv
+    from board.board import BLEWifiBoard
+
+    simenv.config["connect_latency_ms"] = 1500
+    board = BLEWifiBoard()
+    start = time.monotonic()
+    board.start_network()
+    print("advertising:", board._ble.advertising)
+
+    # 手机端：连接后分两片写入配网 JSON
+    ble = board._ble
+    conn = ble.sim_connect()
+    payload = b'{"user_id": "u1", "ssid": "SimWiFi", "password": "simpassword"}'
+    ble.sim_write(conn, board._rx_handle, payload[:20])
+    ble.sim_write(conn, board._rx_handle, payload[20:])
+    while not board.wifi.isconnected() and time.monotonic() - start < seconds:
+        time.sleep(0.1)
+    print(f"wifi connected: {board.wifi.isconnected()} after {time.monotonic() - start:.2f}s, "
+          f"ble active: {ble.active()}")
+    from utils.persist import get_wifi_list
+    print("saved networks:", get_wifi_list())
+
+
+SCENARIOS = {"app": run_app, "capture": run_capture, "ble": run_ble}
+
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else "app"
+    SCENARIOS[name](float(sys.argv[2]) if len(sys.argv) > 2 else 5)
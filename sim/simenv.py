@@ -0,0 +1,77 @@
+# 主机模拟环境：共享配置与模拟时钟。
+# sim/ 目录加入 sys.path 后，machine/network/esp32/bluetooth 等模块即解析到这里的替身，
+# install() 还会在 time 模块上补齐 MicroPython 的 ticks_*/sleep_ms/sleep_us。
+import os
+import sys
+import time
+
+TICKS_PERIOD = 1 << 30  # 与 MicroPython 一致，ticks 在 2^30 处回绕
+_TICKS_HALF = TICKS_PERIOD // 2
+
+# 可在 install() 时覆盖的默认配置
+config = {
+    "unique_id": b"\x24\x6f\x28\xaa\xbb\xcc",
+    "mac": b"\x24\x6f\x28\xaa\xbb\xcc",
+    "networks": {"SimWiFi": "simpassword"},  # 模拟可连接的热点: ssid -> 密码
+    "connect_latency_ms": 800,               # WLAN.connect 到 isconnected() 为真的延迟
+    "rssi": -55,
+    "mem_free": 120000,
+    "i2s_source": None,                      # i2s_source(buf_samples, start_index) 自定义采集数据
+}
+
+
+class SimClock:
+    """MicroPython ticks 语义的模拟时钟：基于单调时钟，带起始偏移，可用于验证回绕处理"""
+
+    def __init__(self, start_ms=0):
+        self._origin = time.monotonic_ns()
+        self.start_ms = start_ms
+
+    def _elapsed_us(self):
+        return (time.monotonic_ns() - self._origin) // 1000
+
+    def ticks_ms(self):
+        return (self.start_ms + self._elapsed_us() // 1000) % TICKS_PERIOD
+
+    def ticks_us(self):
+        return (self.start_ms * 1000 + self._elapsed_us()) % TICKS_PERIOD
+
+    def ticks_cpu(self):
+        return self.ticks_us()
+
+    @staticmethod
+    def ticks_add(ticks, delta):
+        return (ticks + delta) % TICKS_PERIOD
+
+    @staticmethod
+    def ticks_diff(end, start):
+        return ((end - start + _TICKS_HALF) % TICKS_PERIOD) - _TICKS_HALF
+
+    @staticmethod
+    def sleep_ms(ms):
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    @staticmethod
+    def sleep_us(us):
+        if us > 0:
+            time.sleep(us / 1000000)
+
+
+clock = SimClock()
+
+
+def install(start_ms=0, **overrides):
+    """在导入任何设备侧模块之前调用"""
+    global clock
+    config.update(overrides)
+    clock = SimClock(start_ms)
+    for name in ("ticks_ms", "ticks_us", "ticks_cpu", "ticks_add", "ticks_diff", "sleep_ms", "sleep_us"):
+        setattr(time, name, getattr(clock, name))
+    sim_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(sim_dir)
+    for path in (root_dir, sim_dir):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+    return clock
@@ -0,0 +1 @@
+from socket import *  # noqa: F401,F403
@@ -0,0 +1,222 @@
+# 主机侧 UDP 音频参考接收端（asyncio），按设备ID统计流健康度：
+# 丢包、乱序、重复、RFC 3550 到达间隔抖动，以及时延直方图。
+# 设备重启后序号从头开始：同一序号但采集时刻不同，或序号比已见最大序号落后超过去重窗口，
+# 都视为新的一段流（restarts 计数），之前一段的期望帧数累计保留，序号与时刻从新段重新统计。
+# 设备与接收端时钟不同步，时延取 (到达时刻 - 采集时刻) 相对于观测到的最小值，即排队/网络带来的额外时延；
+# 若发送端与接收端同机（模拟/基准），两者使用同一单调时钟，此时 offset 即为绝对时延。
+# 用法: python tools/audio_receiver.py [--host 0.0.0.0] [--port 7676] [--interval 5]
+import os
+import sys
+import time
+import struct
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from audio.packet import parse_packet, FLAG_SPEECH_START, PACKET_VERSION_STREAM
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+_SEQ_MOD = 1 << 32
+_TICKS_PERIOD = 1 << 30  # MicroPython ticks_ms 在 2^30 处回绕
+_DUP_WINDOW = 1024
+
+
+def _now_ms():
+    return time.monotonic_ns() // 1000000
+
+
+def _seq_diff(a, b):
+    """a - b，考虑 32 位回绕"""
+    d = (a - b) % _SEQ_MOD
+    return d - _SEQ_MOD if d >= _SEQ_MOD // 2 else d
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+
+    def add(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += 1
+
+    def percentile(self, p):
+        if not self.total:
+            return 0
+        target = self.total * p / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def to_dict(self):
+        labels = ["<=%d" % b for b in self.buckets] + [">%d" % self.buckets[-1]]
+        return {label: count for label, count in zip(labels, self.counts) if count}
+
+
+class StreamStats:
+    def __init__(self):
+        self.received = 0
+        self.bytes = 0
+        self.legacy = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.restarts = 0
+        self.prior_expected = 0
+        self.base_seq = None
+        self.max_seq = None
+        self.recent = {}  # 序号 -> 采集时刻，用于去重与识别重启
+        self.jitter = 0.0
+        self.last_transit = None
+        self.min_offset = None
+        self.latency = Histogram()
+        self.tick_epoch = 0
+        self.last_tick = None
+
+    def on_packet(self, packet, arrival_ms, size):
+        self.bytes += size
+        if packet.version != PACKET_VERSION_STREAM:
+            # 旧格式没有序号与时刻，只计数
+            self.legacy += 1
+            self.received += 1
+            return
+        seq = packet.seq
+        tick = self.recent.get(seq)
+        if tick == packet.tick:
+            self.duplicates += 1
+            return
+        if tick is not None or (self.max_seq is not None and _seq_diff(seq, self.max_seq) < -_DUP_WINDOW):
+            self._restart()
+        self.recent[seq] = packet.tick
+        if len(self.recent) > _DUP_WINDOW:
+            self.recent = {s: t for s, t in self.recent.items() if _seq_diff(seq, s) < _DUP_WINDOW // 2}
+        self.received += 1
+
+        if self.max_seq is None:
+            self.base_seq = self.max_seq = seq
+        elif _seq_diff(seq, self.max_seq) > 0:
+            self.max_seq = seq
+        else:
+            self.reordered += 1
+
+        transit = arrival_ms - self._unwrap_tick(packet.tick)
+        if self.last_transit is not None and not (packet.flags & FLAG_SPEECH_START):
+            d = abs(transit - self.last_transit)
+            self.jitter += (d - self.jitter) / 16
+        self.last_transit = transit
+
+        if self.min_offset is None or transit < self.min_offset:
+            self.min_offset = transit
+        self.latency.add(transit - self.min_offset)
+
+    def _restart(self):
+        self.restarts += 1
+        self.prior_expected += self.expected
+        self.base_seq = self.max_seq = None
+        self.recent = {}
+        # 重启后设备 ticks 也从头开始，时刻续接与时延基准都要重新建立
+        self.last_transit = None
+        self.min_offset = None
+        self.tick_epoch = 0
+        self.last_tick = None
+
+    def _unwrap_tick(self, tick):
+        # 设备 ticks 回绕后向前续接，避免时延出现 2^30 的跳变
+        if self.last_tick is not None:
+            if tick < self.last_tick - _TICKS_PERIOD // 2:
+                self.tick_epoch += _TICKS_PERIOD
+            elif tick > self.last_tick + _TICKS_PERIOD // 2:
+                # 回绕前发出、回绕后才到达的乱序帧
+                return tick + self.tick_epoch - _TICKS_PERIOD
+        self.last_tick = tick
+        return tick + self.tick_epoch
+
+    @property
+    def expected(self):
+        if self.max_seq is None:
+            return self.prior_expected
+        return self.prior_expected + _seq_diff(self.max_seq, self.base_seq) + 1
+
+    def report(self):
+        streamed = self.received - self.legacy
+        lost = max(0, self.expected - streamed)
+        return {
+            "received": self.received,
+            "bytes": self.bytes,
+            "legacy": self.legacy,
+            "lost": lost,
+            "loss_pct": round(100 * lost / self.expected, 2) if self.expected else 0,
+            "reordered": self.reordered,
+            "duplicates": self.duplicates,
+            "restarts": self.restarts,
+            "jitter_ms": round(self.jitter, 2),
+            "min_offset_ms": self.min_offset,
+            "latency_p50_ms": self.latency.percentile(50),
+            "latency_p99_ms": self.latency.percentile(99),
+            "latency_hist_ms": self.latency.to_dict(),
+        }
+
+
+class AudioReceiver(asyncio.DatagramProtocol):
+    def __init__(self, clock=_now_ms):
+        self.clock = clock
+        self.streams = {}
+        self.invalid = 0
+
+    def datagram_received(self, data, addr):
+        arrival = self.clock()
+        try:
+            packet = parse_packet(data)
+        except (ValueError, struct.error):
+            self.invalid += 1
+            return
+        stats = self.streams.get(packet.device_id)
+        if stats is None:
+            stats = self.streams[packet.device_id] = StreamStats()
+        stats.on_packet(packet, arrival, len(data))
+
+    def report(self):
+        return {device_id.decode("utf-8", "replace"): stats.report()
+                for device_id, stats in self.streams.items()}
+
+
+async def serve(host, port, clock=_now_ms):
+    loop = asyncio.get_running_loop()
+    transport, receiver = await loop.create_datagram_endpoint(
+        lambda: AudioReceiver(clock), local_addr=(host, port))
+    return transport, receiver
+
+
+async def main(host, port, interval):
+    transport, receiver = await serve(host, port)
+    print(f"listening on {host}:{port}")
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            for device_id, report in receiver.report().items():
+                print(device_id, report)
+            if receiver.invalid:
+                print("invalid packets:", receiver.invalid)
+    finally:
+        transport.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UDP audio reference receiver")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=7676)
+    parser.add_argument("--interval", type=float, default=5)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.host, args.port, args.interval))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,262 @@
+# 设备集群负载模拟：用 websocket_client.WebSocketClient 在一个进程里模拟成百上千台设备，
+# 每台设备按真实节奏跑完整会话：连接 -> hello -> listen start -> 按帧周期上行音频 -> listen stop
+# -> 等待服务端 stt/tts 下行音频，期间周期性上报 IoT 状态。
+# 报告连接 / hello / 响应延迟（listen stop 到首个下行音频帧）分位数、音频帧发送滞后与双向吞吐。
+# 不指定 --url 时自动在子进程中启动 tools/standin_server.py 作为本地替身服务端。
+# 用法: python tools/fleet_sim.py [--url ws://host:port] [--devices 200] [--duration 20] [--ramp 50]
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from websocket_client import WebSocketClient
+
+
+class FleetStats:
+    def __init__(self):
+        self.connect_ms = []
+        self.hello_ms = []
+        self.response_ms = []
+        self.lateness_ms = []
+        self.connected = 0
+        self.active = 0
+        self.failed = 0
+        self.dropped = 0
+        self.sessions = 0
+        self.no_response = 0
+        self.msgs_out = 0
+        self.bytes_out = 0
+        self.msgs_in = 0
+        self.bytes_in = 0
+
+    def sent(self, n):
+        self.msgs_out += 1
+        self.bytes_out += n
+
+
+class Device:
+    def __init__(self, index, args, stats):
+        self.index = index
+        self.args = args
+        self.stats = stats
+        mac = "02:00:%02x:%02x:%02x:%02x" % ((index >> 24) & 0xFF, (index >> 16) & 0xFF, (index >> 8) & 0xFF, index & 0xFF)
+        self.client = WebSocketClient("fleet-token", mac, "fleet-%06d" % index, url=args.url)
+        self.frame = bytes(args.frame_bytes)
+        self.listen_stopped_at = None
+        self.first_audio = asyncio.Event()
+        self.tts_done = asyncio.Event()
+
+    async def send_json(self, message):
+        text = json.dumps(message)
+        await self.client.send_json(message)
+        self.stats.sent(len(text))
+
+    async def receive(self):
+        stats = self.stats
+        while True:
+            message = await self.client.recv()
+            stats.msgs_in += 1
+            stats.bytes_in += len(message)
+            if isinstance(message, bytes):
+                if self.listen_stopped_at is not None and not self.first_audio.is_set():
+                    stats.response_ms.append((time.perf_counter() - self.listen_stopped_at) * 1000)
+                    self.first_audio.set()
+                continue
+            data = json.loads(message)
+            if data.get("type") == "tts" and data.get("state") == "stop":
+                self.tts_done.set()
+
+    async def report_states(self):
+        while True:
+            await asyncio.sleep(self.args.iot_interval)
+            await self.send_json({"type": "iot", "states": [
+                {"name": "Speaker", "state": {"volume": 60 + self.index % 40, "muted": False}},
+                {"name": "Battery", "state": {"level": 90, "charging": False}},
+            ]})
+
+    async def utterance(self):
+        args = self.args
+        period = args.frame_duration / 1000
+        frames = max(1, args.utterance_ms // args.frame_duration)
+        await self.send_json({"type": "listen", "state": "start", "mode": "manual"})
+        # 按绝对截止时间排帧，滞后不会累积；记录每帧实际发送时刻相对截止时间的滞后
+        deadline = time.perf_counter()
+        for _ in range(frames):
+            now = time.perf_counter()
+            if deadline > now:
+                await asyncio.sleep(deadline - now)
+                now = time.perf_counter()
+            self.stats.lateness_ms.append((now - deadline) * 1000)
+            await self.client.send_audio(self.frame)
+            self.stats.sent(len(self.frame))
+            deadline += period
+        self.first_audio.clear()
+        self.tts_done.clear()
+        self.listen_stopped_at = time.perf_counter()
+        await self.send_json({"type": "listen", "state": "stop"})
+        try:
+            await asyncio.wait_for(self.tts_done.wait(), args.response_timeout)
+        except asyncio.TimeoutError:
+            self.stats.no_response += 1
+        self.listen_stopped_at = None
+        self.stats.sessions += 1
+
+    async def run(self, stop_at):
+        stats = self.stats
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.client.connect(ping_interval=None, compression=None),
+                                   self.args.connect_timeout)
+        except Exception as e:
+            stats.failed += 1
+            if stats.failed <= 3:
+                print(f"device {self.index} connect failed: {e!r}")
+            return
+        stats.connect_ms.append((time.perf_counter() - t0) * 1000)
+        stats.connected += 1
+        stats.active += 1
+        tasks = []
+        try:
+            t0 = time.perf_counter()
+            await self.client.hello(frame_duration=self.args.frame_duration)
+            stats.hello_ms.append((time.perf_counter() - t0) * 1000)
+            tasks = [asyncio.create_task(self.receive()), asyncio.create_task(self.report_states())]
+            while time.perf_counter() < stop_at and not tasks[0].done():
+                await self.utterance()
+                await asyncio.sleep(self.args.pause_ms / 1000)
+        except Exception as e:
+            stats.dropped += 1
+            if stats.dropped <= 3:
+                print(f"device {self.index} dropped: {e!r}")
+        finally:
+            stats.active -= 1
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self.client.close()
+            except Exception:
+                pass
+
+
+def percentiles(samples):
+    if not samples:
+        return "-"
+    samples = sorted(samples)
+    n = len(samples)
+
+    def pick(p):
+        return samples[min(n - 1, int(n * p / 100))]
+
+    return f"p50 {pick(50):7.1f}  p90 {pick(90):7.1f}  p99 {pick(99):7.1f}  max {samples[-1]:7.1f} ms  (n={n})"
+
+
+async def progress(stats, interval):
+    last_out = last_in = 0
+    while True:
+        await asyncio.sleep(interval)
+        print(f"  active {stats.active:5d}  up {(stats.msgs_out - last_out) / interval:8.0f} msg/s  "
+              f"down {(stats.msgs_in - last_in) / interval:8.0f} msg/s  sessions {stats.sessions}")
+        last_out, last_in = stats.msgs_out, stats.msgs_in
+
+
+async def run_fleet(args):
+    stats = FleetStats()
+    started = time.perf_counter()
+    stop_at = started + args.ramp_seconds + args.duration
+    reporter = asyncio.create_task(progress(stats, args.interval))
+    devices = []
+    for i in range(args.devices):
+        # 按 --ramp（台/秒）错开上线，避免瞬时连接风暴掩盖稳态指标
+        delay = started + i / args.ramp - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        devices.append(asyncio.create_task(Device(i, args, stats).run(stop_at)))
+    await asyncio.gather(*devices)
+    reporter.cancel()
+    elapsed = time.perf_counter() - started
+
+    print(f"\n设备 {args.devices}：连接成功 {stats.connected}，失败 {stats.failed}，中途断开 {stats.dropped}，"
+          f"会话 {stats.sessions}（无响应 {stats.no_response}），用时 {elapsed:.1f} s")
+    print(f"connect   {percentiles(stats.connect_ms)}")
+    print(f"hello     {percentiles(stats.hello_ms)}")
+    print(f"response  {percentiles(stats.response_ms)}")
+    print(f"lateness  {percentiles(stats.lateness_ms)}")
+    print(f"上行 {stats.msgs_out / elapsed:8.0f} msg/s {stats.bytes_out / elapsed / 1024:8.1f} KiB/s；"
+          f"下行 {stats.msgs_in / elapsed:8.0f} msg/s {stats.bytes_in / elapsed / 1024:8.1f} KiB/s")
+    return stats
+
+
+def raise_fd_limit(devices):
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = devices * 2 + 64
+    if soft < want:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(want, hard), hard))
+
+
+def serve_standin(host, port, frame_duration):
+    import standin_server
+    try:
+        asyncio.run(standin_server.main(host, port, 3600, frame_duration=frame_duration))
+    except KeyboardInterrupt:
+        pass
+
+
+def start_standin(frame_duration):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    process = multiprocessing.Process(target=serve_standin, args=("127.0.0.1", port, frame_duration), daemon=True)
+    process.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return process, f"ws://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a fleet of voice devices against a WebSocket server")
+    parser.add_argument("--url", help="server URL; defaults to a local stand-in server")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of steady state after ramp-up")
+    parser.add_argument("--ramp", type=float, default=50, help="devices brought online per second")
+    parser.add_argument("--frame-duration", type=int, default=60, help="audio frame duration in ms")
+    parser.add_argument("--frame-bytes", type=int, default=120, help="uplink opus frame size")
+    parser.add_argument("--utterance-ms", type=int, default=1500)
+    parser.add_argument("--pause-ms", type=int, default=500, help="idle time between utterances")
+    parser.add_argument("--iot-interval", type=float, default=5, help="seconds between IoT state reports")
+    parser.add_argument("--connect-timeout", type=float, default=10)
+    parser.add_argument("--response-timeout", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=5, help="progress report interval")
+    args = parser.parse_args()
+    args.ramp_seconds = args.devices / args.ramp
+
+    raise_fd_limit(args.devices)
+    standin = None
+    if not args.url:
+        standin, args.url = start_standin(args.frame_duration)
+        print(f"using local stand-in server at {args.url}")
+    try:
+        asyncio.run(run_fleet(args))
+    finally:
+        if standin:
+            standin.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# 本地 MQTT + UDP 替身服务端（asyncio），用于离线验证 MqttUdpProtocol 与对比传输延迟：
+# - 精简 MQTT 3.1.1 broker：CONNECT/SUBSCRIBE/PUBLISH(QoS 0/1)/PINGREQ/DISCONNECT，支持 + 与 # 通配；
+# - 内置语音服务端：订阅设备发布主题（默认 device-server），hello -> 分配会话、AES-128 密钥与 nonce 模板，
+#   经 UDP 收发 AES-CTR 加密音频；listen stop -> stt + tts 下行音频帧；goodbye 结束会话；
+#   echo=True 时把每个上行音频帧原样加密回发（测往返延迟），loss 为下行按比例丢包（模拟弱网）。
+# 回复发往设备自己的主题 devices/<client_id>；带 descriptors_hash 的 iot 描述符按 client_id 记住，之后的 hello 回带该哈希。
+# 用法: python tools/mqtt_udp_standin.py [--host 127.0.0.1] [--mqtt-port 1883] [--udp-port 8884] [--echo] [--loss 0.05]
+import os
+import json
+import time
+import struct
+import random
+import asyncio
+import argparse
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+SERVER_TOPIC = "device-server"
+NONCE_SIZE = 16
+
+
+def aes_ctr(key, nonce, data):
+    return Cipher(algorithms.AES(key), modes.CTR(nonce)).encryptor().update(data)
+
+
+def encode_length(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        out.append(byte | 0x80 if n else byte)
+        if not n:
+            return bytes(out)
+
+
+def encode_string(s):
+    s = s.encode("utf-8")
+    return struct.pack("!H", len(s)) + s
+
+
+def topic_matches(pattern, topic):
+    pattern, topic = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(pattern):
+        if part == "#":
+            return True
+        if i >= len(topic) or (part != "+" and part != topic[i]):
+            return False
+    return len(pattern) == len(topic)
+
+
+class MqttSession:
+    def __init__(self, writer):
+        self.writer = writer
+        self.client_id = None
+        self.subscriptions = []
+
+    def send(self, header, body):
+        self.writer.write(bytes((header,)) + encode_length(len(body)) + body)
+
+    def publish(self, topic, payload):
+        self.send(0x30, encode_string(topic) + payload)
+
+
+class VoiceSession:
+    def __init__(self, client_id, session_id, ssrc):
+        self.client_id = client_id
+        self.session_id = session_id
+        self.key = os.urandom(16)
+        self.nonce = bytearray(NONCE_SIZE)
+        self.nonce[0] = 0x01
+        self.nonce[4:8] = ssrc
+        self.addr = None
+        self.remote_sequence = 0
+        self.local_sequence = 0
+        self.received = 0
+        self.lost = 0
+        self.speaking = None
+
+
+class StandinServer:
+    def __init__(self, host, udp_port, echo=False, loss=0.0, tts_frames=20, frame_duration=60):
+        self.host = host
+        self.udp_port = udp_port
+        self.echo = echo
+        self.loss = loss
+        self.tts_frames = tts_frames
+        self.frame_duration = frame_duration
+        self.clients = {}
+        self.sessions = {}  # ssrc -> VoiceSession
+        self.descriptors_hashes = {}  # client_id -> 已缓存描述符的哈希
+        self.transport = None
+        self.stats = {"mqtt_in": 0, "mqtt_out": 0, "udp_in": 0, "udp_out": 0, "udp_dropped": 0}
+
+    # ---- MQTT broker ----
+
+    async def handle_mqtt(self, reader, writer):
+        session = MqttSession(writer)
+        try:
+            while True:
+                header = (await reader.readexactly(1))[0]
+                n = shift = 0
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    n |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(n) if n else b""
+                kind = header & 0xF0
+                if kind == 0x10:
+                    length = struct.unpack_from("!H", body, 0)[0]
+                    offset = 2 + length + 4  # 协议名 + 版本 + 标志 + keepalive
+                    length = struct.unpack_from("!H", body, offset)[0]
+                    session.client_id = body[offset + 2:offset + 2 + length].decode()
+                    self.clients[session.client_id] = session
+                    session.send(0x20, b"\x00\x00")
+                elif kind == 0x80:
+                    packet_id, offset, granted = body[:2], 2, b""
+                    while offset < len(body):
+                        length = struct.unpack_from("!H", body, offset)[0]
+                        session.subscriptions.append(body[offset + 2:offset + 2 + length].decode())
+                        offset += 2 + length + 1
+                        granted += b"\x00"
+                    session.send(0x90, packet_id + granted)
+                elif kind == 0x30:
+                    length = struct.unpack_from("!H", body, 0)[0]
+                    topic = body[2:2 + length].decode()
+                    offset = 2 + length
+                    if (header >> 1) & 0x03:
+                        session.send(0x40, body[offset:offset + 2])
+                        offset += 2
+                    self.route(session, topic, body[offset:])
+                elif kind == 0xC0:
+                    session.send(0xD0, b"")
+                elif kind == 0xE0:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if self.clients.get(session.client_id) is session:
+                del self.clients[session.client_id]
+            writer.close()
+
+    def route(self, sender, topic, payload):
+        for client in list(self.clients.values()):
+            if client is not sender and any(topic_matches(p, topic) for p in client.subscriptions):
+                client.publish(topic, payload)
+        if topic == SERVER_TOPIC:
+            self.stats["mqtt_in"] += 1
+            self.on_device_message(sender, json.loads(payload))
+
+    def reply(self, client_id, message):
+        client = self.clients.get(client_id)
+        if client:
+            self.stats["mqtt_out"] += 1
+            client.publish(f"devices/{client_id}", json.dumps(message).encode())
+
+    # ---- 语音服务端 ----
+
+    def on_device_message(self, sender, message):
+        kind = message.get("type")
+        if kind == "hello":
+            ssrc = os.urandom(4)
+            session = VoiceSession(sender.client_id, "session-%s" % ssrc.hex(), ssrc)
+            self.sessions[ssrc] = session
+            hello = {
+                "type": "hello", "transport": "udp", "session_id": session.session_id,
+                "udp": {"server": self.host, "port": self.udp_port, "key": session.key.hex(),
+                        "nonce": session.nonce.hex()},
+                "audio_params": {"format": "opus", "sample_rate": 24000, "channels": 1,
+                                 "frame_duration": self.frame_duration},
+            }
+            if sender.client_id in self.descriptors_hashes:
+                hello["iot"] = {"descriptors_hash": self.descriptors_hashes[sender.client_id]}
+            self.reply(sender.client_id, hello)
+            return
+        session = self.find_session(message.get("session_id"))
+        if session is None:
+            return
+        if kind == "iot" and message.get("descriptors_hash"):
+            self.descriptors_hashes[session.client_id] = message["descriptors_hash"]
+        elif kind == "listen" and message.get("state") == "stop":
+            session.speaking = asyncio.get_running_loop().create_task(self.speak(session))
+        elif kind == "abort" and session.speaking:
+            session.speaking.cancel()
+        elif kind == "goodbye":
+            if session.speaking:
+                session.speaking.cancel()
+            self.sessions.pop(bytes(session.nonce[4:8]), None)
+
+    def find_session(self, session_id):
+        for session in self.sessions.values():
+            if session.session_id == session_id:
+                return session
+        return None
+
+    def send_audio(self, session, payload):
+        if session.addr is None:
+            return
+        session.local_sequence += 1
+        if self.loss and random.random() < self.loss:
+            self.stats["udp_dropped"] += 1
+            return
+        nonce = bytearray(session.nonce)
+        struct.pack_into(">H", nonce, 2, len(payload))
+        struct.pack_into(">II", nonce, 8, int(time.monotonic() * 1000) & 0xFFFFFFFF, session.local_sequence)
+        self.stats["udp_out"] += 1
+        self.transport.sendto(bytes(nonce) + aes_ctr(session.key, bytes(nonce), payload), session.addr)
+
+    async def speak(self, session):
+        self.reply(session.client_id, {"type": "stt", "text": "你好", "session_id": session.session_id})
+        self.reply(session.client_id, {"type": "tts", "state": "start", "session_id": session.session_id})
+        deadline = time.monotonic()
+        for _ in range(self.tts_frames):
+            self.send_audio(session, bytes(180))
+            deadline += self.frame_duration / 1000
+            await asyncio.sleep(max(0, deadline - time.monotonic()))
+        self.reply(session.client_id, {"type": "tts", "state": "stop", "session_id": session.session_id})
+
+    # asyncio.DatagramProtocol
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < NONCE_SIZE or data[0] != 0x01:
+            return
+        session = self.sessions.get(bytes(data[4:8]))
+        if session is None:
+            return
+        size, sequence = struct.unpack_from(">H", data, 2)[0], struct.unpack_from(">I", data, 12)[0]
+        if sequence <= session.remote_sequence or size != len(data) - NONCE_SIZE:
+            return
+        session.lost += sequence - session.remote_sequence - 1
+        session.remote_sequence = sequence
+        session.received += 1
+        session.addr = addr
+        self.stats["udp_in"] += 1
+        payload = aes_ctr(session.key, bytes(data[:NONCE_SIZE]), bytes(data[NONCE_SIZE:]))
+        if self.echo:
+            self.send_audio(session, payload)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        pass
+
+
+async def serve(host, mqtt_port, udp_port, **kwargs):
+    server = StandinServer(host, udp_port, **kwargs)
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(lambda: server, local_addr=(host, udp_port))
+    server.udp_port = transport.get_extra_info("sockname")[1]  # udp_port=0 picks a free port
+    mqtt_server = await asyncio.start_server(server.handle_mqtt, host, mqtt_port)
+    return mqtt_server, server
+
+
+async def main(host, mqtt_port, udp_port, interval, **kwargs):
+    mqtt_server, server = await serve(host, mqtt_port, udp_port, **kwargs)
+    port = mqtt_server.sockets[0].getsockname()[1]
+    print(f"stand-in MQTT broker on {host}:{port}, UDP audio on {host}:{server.udp_port}")
+    while True:
+        await asyncio.sleep(interval)
+        print(f"clients {len(server.clients)}, sessions {len(server.sessions)}, {server.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in MQTT broker and UDP audio server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--mqtt-port", type=int, default=1883)
+    parser.add_argument("--udp-port", type=int, default=8884)
+    parser.add_argument("--echo", action="store_true", help="echo uplink audio frames back to the device")
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of downlink datagrams to drop")
+    parser.add_argument("--interval", type=float, default=5)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.host, args.mqtt_port, args.udp_port, args.interval, echo=args.echo, loss=args.loss))
+    except KeyboardInterrupt:
+        pass
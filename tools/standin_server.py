@@ -0,0 +1,132 @@
+# 本地替身服务端（websockets），按小智协议的最小子集应答，用于离线压测客户端栈与服务端容量：
+# hello -> 回 hello（audio_params）；listen start/stop 之间接收上行音频（echo=True 时原样回发，用于测往返延迟）；
+# listen stop -> 回 stt，再按帧周期推送 tts 音频帧（tts start/stop 包围）；abort 打断 tts；
+# iot 描述符按 Device-Id 记住其 descriptors_hash，之后的 hello 回带该哈希，设备据此跳过重发描述符。
+# 用法: python tools/standin_server.py [--host 127.0.0.1] [--port 8765] [--tts-frames 20] [--interval 5]
+import json
+import time
+import asyncio
+import argparse
+
+import websockets
+
+SERVER_SAMPLE_RATE = 24000
+
+
+class ServerStats:
+    def __init__(self):
+        self.connections = 0
+        self.max_connections = 0
+        self.total_connections = 0
+        self.msgs_in = 0
+        self.bytes_in = 0
+        self.audio_in = 0
+        self.msgs_out = 0
+        self.bytes_out = 0
+
+    def snapshot(self):
+        return dict(self.__dict__)
+
+
+class StandinServer:
+    def __init__(self, frame_duration=60, tts_frames=20, tts_frame_bytes=180, echo=False):
+        self.frame_duration = frame_duration
+        self.echo = echo
+        self.tts_frames = tts_frames
+        self.tts_frame = bytes(tts_frame_bytes)
+        self.stats = ServerStats()
+        self.descriptors_hashes = {}  # Device-Id -> 已缓存描述符的哈希
+
+    async def _send(self, ws, message):
+        await ws.send(message)
+        self.stats.msgs_out += 1
+        self.stats.bytes_out += len(message)
+
+    async def _speak(self, ws, session_id):
+        await self._send(ws, json.dumps({"type": "stt", "text": "你好", "session_id": session_id}))
+        await self._send(ws, json.dumps({"type": "tts", "state": "start", "session_id": session_id}))
+        period = self.frame_duration / 1000
+        deadline = time.monotonic()
+        for _ in range(self.tts_frames):
+            await self._send(ws, self.tts_frame)
+            deadline += period
+            await asyncio.sleep(max(0, deadline - time.monotonic()))
+        await self._send(ws, json.dumps({"type": "tts", "state": "stop", "session_id": session_id}))
+
+    async def handle(self, ws, path=None):
+        stats = self.stats
+        stats.connections += 1
+        stats.total_connections += 1
+        stats.max_connections = max(stats.max_connections, stats.connections)
+        session_id = "session-%d" % stats.total_connections
+        request = getattr(ws, "request", None)
+        device_id = (request.headers if request else ws.request_headers).get("Device-Id")
+        speaking = None
+        try:
+            async for message in ws:
+                stats.msgs_in += 1
+                stats.bytes_in += len(message)
+                if isinstance(message, bytes):
+                    stats.audio_in += 1
+                    if self.echo:
+                        await self._send(ws, message)
+                    continue
+                data = json.loads(message)
+                kind = data.get("type")
+                if kind == "hello":
+                    hello = {
+                        "type": "hello", "transport": "websocket", "session_id": session_id,
+                        "audio_params": {"sample_rate": SERVER_SAMPLE_RATE, "frame_duration": self.frame_duration},
+                    }
+                    if device_id in self.descriptors_hashes:
+                        hello["iot"] = {"descriptors_hash": self.descriptors_hashes[device_id]}
+                    await self._send(ws, json.dumps(hello))
+                elif kind == "iot" and data.get("descriptors_hash"):
+                    self.descriptors_hashes[device_id] = data["descriptors_hash"]
+                elif kind == "listen" and data.get("state") == "stop":
+                    speaking = asyncio.create_task(self._speak(ws, session_id))
+                elif kind == "abort" and speaking:
+                    speaking.cancel()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if speaking:
+                speaking.cancel()
+            stats.connections -= 1
+
+
+async def serve(host, port, **kwargs):
+    server = StandinServer(**kwargs)
+    ws_server = await websockets.serve(server.handle, host, port, ping_interval=None, compression=None,
+                                       max_queue=None)
+    return ws_server, server
+
+
+async def main(host, port, interval, **kwargs):
+    ws_server, server = await serve(host, port, **kwargs)
+    print(f"stand-in server listening on ws://{host}:{port}")
+    last = server.stats.snapshot()
+    while True:
+        await asyncio.sleep(interval)
+        now = server.stats.snapshot()
+        rate_in = (now["msgs_in"] - last["msgs_in"]) / interval
+        rate_out = (now["msgs_out"] - last["msgs_out"]) / interval
+        print(f"connections {now['connections']} (max {now['max_connections']}), "
+              f"in {rate_in:.0f} msg/s, out {rate_out:.0f} msg/s")
+        last = now
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in WebSocket server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--frame-duration", type=int, default=60)
+    parser.add_argument("--tts-frames", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=5)
+    parser.add_argument("--echo", action="store_true", help="echo uplink audio frames back to the device")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.host, args.port, args.interval,
+                         frame_duration=args.frame_duration, tts_frames=args.tts_frames, echo=args.echo))
+    except KeyboardInterrupt:
+        pass
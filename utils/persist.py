@@ -87,6 +87,45 @@ def get_serv_version():
 def set_serv_version(value):
     _set_nvs("SERV_VERSION", value)
 
+def get_websocket_url():
+    # 音频通道的 ws:// 地址；未配置时不建立连接管理器
+    return _get_nvs("WEBSOCKET_URL", default="")
+
+def set_websocket_url(value):
+    _set_nvs("WEBSOCKET_URL", value)
+
+def get_access_token():
+    return _get_nvs("ACCESS_TOKEN", default="")
+
+def set_access_token(value):
+    _set_nvs("ACCESS_TOKEN", value)
+
+def get_transport():
+    # "websocket"（默认）或 "mqtt"（MQTT 控制通道 + 加密 UDP 音频）
+    return _get_nvs("TRANSPORT", default="websocket")
+
+def set_transport(value):
+    _set_nvs("TRANSPORT", value)
+
+_MQTT_KEYS = {
+    "endpoint": "MQTT_ENDPOINT",
+    "client_id": "MQTT_CLIENT_ID",
+    "username": "MQTT_USERNAME",
+    "password": "MQTT_PASSWORD",
+    "publish_topic": "MQTT_PUB_TOPIC",
+    "subscribe_topic": "MQTT_SUB_TOPIC",
+}
+
+def get_mqtt_config():
+    # 未配置 endpoint 时返回 None
+    config = {name: _get_nvs(key, default="") for name, key in _MQTT_KEYS.items()}
+    return config if config["endpoint"] else None
+
+def set_mqtt_config(config):
+    for name, key in _MQTT_KEYS.items():
+        if name in config:
+            _set_nvs(key, config[name])
+
 # Wi-Fi list management
 def add_wifi(ssid, password):
     wifi_list = _get_nvs("WIFI_LIST", default="").split(";")
@@ -0,0 +1,30 @@
+# MicroPython 的 ticks_* / sleep_ms 在 CPython 上不存在，这里统一提供，方便在主机上运行与测试。
+import time
+
+try:
+    ticks_ms = time.ticks_ms
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+    ticks_add = time.ticks_add
+    sleep_ms = time.sleep_ms
+    sleep_us = time.sleep_us
+except AttributeError:
+    def ticks_ms():
+        return time.monotonic_ns() // 1000000
+
+    def ticks_us():
+        return time.monotonic_ns() // 1000
+
+    def ticks_diff(end, start):
+        return end - start
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def sleep_ms(ms):
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def sleep_us(us):
+        if us > 0:
+            time.sleep(us / 1000000)
@@ -2,20 +2,29 @@ import asyncio
 import websockets
 import json
 
+DEFAULT_URL = "ws://139.155.252.64:7677"
+# websockets >= 14 的默认 connect 使用 additional_headers，更早的旧接口使用 extra_headers
+HEADERS_ARG = ("additional_headers" if int(websockets.version.version.split(".")[0]) >= 14
+               else "extra_headers")
+
+
 class WebSocketClient:
-    def __init__(self, access_token, device_mac, device_uuid):
-        self.url = "ws://139.155.252.64:7677"
+    def __init__(self, access_token, device_mac, device_uuid, url=DEFAULT_URL):
+        self.url = url
         self.headers = {
             "Authorization": f"Bearer {access_token}",
             "Protocol-Version": "1",
             "Device-Id": device_mac,
             "Client-Id": device_uuid
         }
+        self.connection = None
 
-    async def connect(self):
-        self.connection = await websockets.connect(self.url, extra_headers=self.headers)
+    async def connect(self, **kwargs):
+        # kwargs 透传给 websockets.connect（如 ping_interval、compression、open_timeout）
+        kwargs[HEADERS_ARG] = self.headers
+        self.connection = await websockets.connect(self.url, **kwargs)
 
-    async def hello(self):
+    async def hello(self, sample_rate=16000, frame_duration=60):
         # 构造握手报文
         hello_message = {
             "type": "hello",
@@ -23,9 +32,9 @@ class WebSocketClient:
             "transport": "websocket",
             "audio_params": {
                 "format": "opus",
-                "sample_rate": 16000,
+                "sample_rate": sample_rate,
                 "channels": 1,
-                "frame_duration": 60
+                "frame_duration": frame_duration
             }
         }
         # 发送握手报文
@@ -34,20 +43,34 @@ class WebSocketClient:
         response = await self.connection.recv()
         return json.loads(response)
 
+    async def send_json(self, message):
+        await self.connection.send(json.dumps(message))
+
+    async def send_audio(self, frame):
+        await self.connection.send(frame)
+
+    async def recv(self):
+        # 文本消息返回 str，音频返回 bytes
+        return await self.connection.recv()
+
     async def close(self):
-        await self.connection.close()
+        if self.connection:
+            await self.connection.close()
+            self.connection = None
 
 # 示例用法
-async def main():
+async def main(url=DEFAULT_URL):
     client = WebSocketClient(
         access_token="your_access_token",
         device_mac="your_device_mac",
-        device_uuid="your_device_uuid"
+        device_uuid="your_device_uuid",
+        url=url
     )
     await client.connect()
     response = await client.hello()
     print("Server response:", response)
     await client.close()
 
-# 如果需要运行此脚本，请取消下面的注释
-asyncio.run(main())
+if __name__ == "__main__":
+    import sys
+    asyncio.run(main(*sys.argv[1:2]))